@@ -1,15 +1,16 @@
 #!/usr/bin/env python3
 import datetime
 import sys
+import tempfile
 from importlib import metadata
 from importlib.metadata import PackageNotFoundError
 from pathlib import Path
 from typing import Optional
 
-from gopro_overlay import timeseries_process, gpmd_filters
+from gopro_overlay import timeseries_batch, gpmd_filters
 from gopro_overlay.arguments import gopro_dashboard_arguments
 from gopro_overlay.assertion import assert_file_exists
-from gopro_overlay.buffering import SingleBuffer, DoubleBuffer
+from gopro_overlay.buffering import SingleBuffer, RingBuffer
 from gopro_overlay.common import temp_file_name
 from gopro_overlay.config import Config
 from gopro_overlay.counter import ReasonCounter
@@ -17,24 +18,28 @@ from gopro_overlay.date_overlap import DateRange
 from gopro_overlay.dimensions import dimension_from
 from gopro_overlay.execution import InProcessExecution
 from gopro_overlay.ffmpeg import FFMPEG
-from gopro_overlay.ffmpeg_gopro import FFMPEGGoPro
-from gopro_overlay.ffmpeg_overlay import FFMPEGNull, FFMPEGOverlay, FFMPEGOverlayVideo
+from gopro_overlay.ffmpeg_gopro import FFMPEGGoPro, ProbeCache
+from gopro_overlay.ffmpeg_overlay import FFMPEGNull, FFMPEGOverlay, FFMPEGOverlayVideo, FFMPEGSegment, \
+    FFMPEGJoinSegments
 from gopro_overlay.ffmpeg_profile import load_ffmpeg_profile
 from gopro_overlay.font import load_font
 from gopro_overlay.framemeta_gpx import merge_gpx_with_gopro, timeseries_to_framemeta
 from gopro_overlay.geo import MapRenderer, api_key_finder, MapStyler
-from gopro_overlay.gpmf import GPS_FIXED_VALUES, GPSFix
+from gopro_overlay.geo_render import ImageTileCache, MB
 from gopro_overlay.layout import Overlay, speed_awareness_layout
 from gopro_overlay.layout_xml import layout_from_xml, load_xml_layout, Converters
 from gopro_overlay.loading import load_external, GoproLoader
 from gopro_overlay.log import log, fatal
+from gopro_overlay.metadata_cache import MetadataCache
 from gopro_overlay.point import Point
 from gopro_overlay.privacy import PrivacyZone, NoPrivacyZone
 from gopro_overlay.progresstrack import ProgressBarProgress
+from gopro_overlay.segments import Segment, SegmentProgress, split_steps, render_segments
 from gopro_overlay.timeunits import timeunits, Timeunit
 from gopro_overlay.timing import PoorTimer, Timers
 from gopro_overlay.units import units
 from gopro_overlay.widgets.profile import WidgetProfiler
+from gopro_overlay.widgets.map import prefetch
 
 
 def accepter_from_args(include, exclude):
@@ -117,8 +122,6 @@ if __name__ == "__main__":
     except OSError:
         fatal(f"Unable to load font '{args.font}' - use --font to choose a font that is installed.")
 
-    ffmpeg_gopro = FFMPEGGoPro(ffmpeg_exe)
-
     # need in this scope for now
     inputpath: Optional[Path] = None
     generate = args.generate
@@ -131,6 +134,8 @@ if __name__ == "__main__":
     cache_dir = args.cache_dir
     cache_dir.mkdir(exist_ok=True)
 
+    ffmpeg_gopro = FFMPEGGoPro(ffmpeg_exe, probes=ProbeCache(cache_dir / "ffprobe.json"))
+
     timers = Timers(printing=args.print_timings)
 
     try:
@@ -200,6 +205,7 @@ if __name__ == "__main__":
                     inputpath = assert_file_exists(args.input)
 
                     counter = ReasonCounter()
+                    gps_speed_max = units.Quantity(args.gps_speed_max, args.gps_speed_max_units)
 
                     loader = GoproLoader(
                         ffmpeg_gopro=ffmpeg_gopro,
@@ -207,9 +213,18 @@ if __name__ == "__main__":
                         flags=args.load,
                         gps_lock_filter=gpmd_filters.standard(
                             dop_max=args.gps_dop_max,
-                            speed_max=units.Quantity(args.gps_speed_max, args.gps_speed_max_units),
+                            speed_max=gps_speed_max,
                             bbox=args.gps_bbox_lon_lat,
                             report=counter.because
+                        ),
+                        cache=None if args.no_metadata_cache else MetadataCache(
+                            location=cache_dir,
+                            units=units,
+                            settings={
+                                "dop_max": args.gps_dop_max,
+                                "speed_max": gps_speed_max,
+                                "bbox": args.gps_bbox_lon_lat,
+                            }
                         )
                     )
 
@@ -258,19 +273,16 @@ if __name__ == "__main__":
             log("Processing....")
 
             with timers.timer("processing"):
-                locked_2d = lambda e: e.gpsfix in GPS_FIXED_VALUES
-                locked_3d = lambda e: e.gpsfix == GPSFix.LOCK_3D.value
-
-                frame_meta.process(timeseries_process.process_ses("point", lambda i: i.point, alpha=0.45),
-                                   filter_fn=locked_2d)
-                frame_meta.process_deltas(timeseries_process.calculate_speeds(), skip=packets_per_second * 3,
-                                          filter_fn=locked_2d)
-                frame_meta.process(timeseries_process.calculate_odo(), filter_fn=locked_2d)
-                frame_meta.process_accel(timeseries_process.calculate_accel(), skip=18 * 3)
-                frame_meta.process_deltas(timeseries_process.calculate_gradient(), skip=packets_per_second * 3,
-                                          filter_fn=locked_3d)  # hack
-                frame_meta.process(timeseries_process.process_kalman("speed", lambda e: e.speed))
-                frame_meta.process(timeseries_process.filter_locked())
+                locked_2d = timeseries_batch.locked_2d
+                locked_3d = timeseries_batch.locked_3d
+
+                timeseries_batch.process_ses(frame_meta, "point", "point", alpha=0.45, where=locked_2d)
+                timeseries_batch.calculate_speeds(frame_meta, skip=packets_per_second * 3, where=locked_2d)
+                timeseries_batch.calculate_odo(frame_meta, where=locked_2d)
+                timeseries_batch.calculate_accel(frame_meta, skip=18 * 3)
+                timeseries_batch.calculate_gradient(frame_meta, skip=packets_per_second * 3, where=locked_3d)  # hack
+                timeseries_batch.process_kalman(frame_meta, "speed", "speed")
+                timeseries_batch.filter_locked(frame_meta)
 
             # privacy zone applies everywhere, not just at start, so might not always be suitable...
             if args.privacy:
@@ -282,72 +294,59 @@ if __name__ == "__main__":
             else:
                 privacy_zone = NoPrivacyZone()
 
-            with MapRenderer(
-                    cache_dir=cache_dir,
-                    styler=MapStyler(
-                        api_key_finder=api_key_finder(config_loader, args)
-                    )
-            ).open(args.map_style) as renderer:
+            map_tiles = ImageTileCache(
+                budget=args.map_tile_memory * MB,
+                compressed_budget=args.map_tile_compressed_memory * MB
+            )
 
-                if args.profiler:
-                    profiler = WidgetProfiler()
-                else:
-                    profiler = None
+            map_renderer = MapRenderer(
+                cache_dir=cache_dir,
+                styler=MapStyler(
+                    api_key_finder=api_key_finder(config_loader, args)
+                ),
+                image_cache=map_tiles,
+                store_size=args.map_tile_store_size * MB if args.map_tile_store_size else None
+            )
 
-                if args.profile:
-                    ffmpeg_options = load_ffmpeg_profile(config_loader, args.profile)
-                else:
-                    ffmpeg_options = None
+            if args.profiler:
+                profiler = WidgetProfiler()
+            else:
+                profiler = None
 
-                if args.show_ffmpeg:
-                    redirect = None
-                else:
-                    redirect = temp_file_name(suffix=".txt")
-                    log(f"FFMPEG Output is in {redirect}")
+            if args.profile:
+                ffmpeg_options = load_ffmpeg_profile(config_loader, args.profile)
+            else:
+                ffmpeg_options = None
 
-                execution = InProcessExecution(redirect=redirect)
+            if args.show_ffmpeg:
+                redirect = None
+            else:
+                redirect = temp_file_name(suffix=".txt")
+                log(f"FFMPEG Output is in {redirect}")
 
-                output: Path = args.output
+            execution = InProcessExecution(redirect=redirect)
 
-                if generate == "none":
-                    ffmpeg = FFMPEGNull()
-                elif generate == "overlay":
-                    output.unlink(missing_ok=True)
-                    ffmpeg = FFMPEGOverlay(
-                        ffmpeg=ffmpeg_exe,
-                        output=output,
-                        options=ffmpeg_options,
-                        overlay_size=dimensions,
-                        execution=execution,
-                        creation_time=frame_meta.date_at(frame_meta.min)
-                    )
-                else:
-                    output.unlink(missing_ok=True)
-                    ffmpeg = FFMPEGOverlayVideo(
-                        ffmpeg=ffmpeg_exe,
-                        input=inputpath,
-                        output=output,
-                        options=ffmpeg_options,
-                        overlay_size=dimensions,
-                        execution=execution,
-                        creation_time=frame_meta.date_at(frame_meta.min)
-                    )
+            output: Path = args.output
 
-                draw_timer = PoorTimer("drawing frames")
+            draw_timer = PoorTimer("drawing frames")
 
-                # Draw an overlay frame every 0.1 seconds of video
-                timelapse_correction = frame_meta.duration() / video_duration
-                log(f"Timelapse Factor = {timelapse_correction:.3f}")
-                stepper = frame_meta.stepper(timeunits(seconds=0.1 * timelapse_correction))
-                progress = ProgressBarProgress("Render")
+            # Draw an overlay frame every 0.1 seconds of video
+            timelapse_correction = frame_meta.duration() / video_duration
+            log(f"Timelapse Factor = {timelapse_correction:.3f}")
+            step = timeunits(seconds=0.1 * timelapse_correction)
+            stepper = frame_meta.stepper(step)
+            frames = frame_meta if args.no_interpolation else frame_meta.resampled(step)
+            progress = ProgressBarProgress("Render")
 
-                unit_converters = Converters(
-                    speed_unit=args.units_speed,
-                    distance_unit=args.units_distance,
-                    altitude_unit=args.units_altitude,
-                    temperature_unit=args.units_temperature,
-                )
+            unit_converters = Converters(
+                speed_unit=args.units_speed,
+                distance_unit=args.units_distance,
+                altitude_unit=args.units_altitude,
+                temperature_unit=args.units_temperature,
+            )
 
+
+            def create_overlay(renderer) -> Overlay:
                 layout_creator = create_desired_layout(
                     layout=args.layout,
                     layout_xml=args.layout_xml,
@@ -362,35 +361,142 @@ if __name__ == "__main__":
                     converters=unit_converters
                 )
 
-                overlay = Overlay(framemeta=frame_meta, create_widgets=layout_creator)
+                return Overlay(framemeta=frames, create_widgets=layout_creator)
 
-                try:
-                    progress.start(len(stepper))
-                    with ffmpeg.generate() as writer:
 
-                        if args.double_buffer:
-                            log("*** NOTE: Double Buffer mode is experimental. It is believed to work fine on Linux. "
-                                "Please raise issues if you see it working or not-working. Thanks ***")
-                            buffer = DoubleBuffer(dimensions, args.bg, writer)
+            def prefetch_map_tiles(renderer, overlay: Overlay):
+                route = [e.point for e in frame_meta.items() if e.point is not None]
+                prefetch(renderer, overlay.scene.widgets(), route)
+
+
+            if args.workers > 1:
+
+                if generate != "none":
+                    output.unlink(missing_ok=True)
+
+                with tempfile.TemporaryDirectory(prefix="gopro-segments-", dir=output.absolute().parent) as tempdir:
+
+                    # fetch map tiles once, here, rather than in each segment - segments inherit what was fetched
+                    with map_renderer.open(args.map_style) as renderer:
+                        overlay = create_overlay(renderer)
+                        prefetch_map_tiles(renderer, overlay)
+
+                    # where widgets remember earlier frames, each segment advances them (cheaply - nothing is drawn)
+                    # through every frame before it, so they draw just what a serial render would
+                    warmup = len(stepper) if overlay.remembering else 0
+                    segments = split_steps(len(stepper), args.workers, warmup=warmup)
+                    segment_files = [Path(tempdir) / f"segment-{s.number:03d}.mov" for s in segments]
+
+                    log(f"Rendering {len(stepper)} frames in {len(segments)} segments")
+
+
+                    def render_segment(segment: Segment, counter: SegmentProgress):
+                        if generate == "none":
+                            segment_ffmpeg = FFMPEGNull()
                         else:
-                            buffer = SingleBuffer(dimensions, args.bg, writer)
+                            segment_ffmpeg = FFMPEGSegment(
+                                ffmpeg=ffmpeg_exe,
+                                output=segment_files[segment.number],
+                                overlay_size=dimensions,
+                                execution=InProcessExecution(
+                                    redirect=f"{redirect}.{segment.number}" if redirect else None
+                                ),
+                            )
+
+                        with map_renderer.open(args.map_style) as renderer:
+                            overlay = create_overlay(renderer)
+
+                            with segment_ffmpeg.generate() as writer:
+                                with SingleBuffer(dimensions, args.bg, writer) as buffer:
+                                    for dt, wanted in segment.frames(stepper.steps()):
+                                        if wanted:
+                                            draw_timer.time(lambda: buffer.draw(lambda frame: overlay.draw(dt, frame)))
+                                            counter.increment()
+                                        else:
+                                            overlay.advance(dt)
 
-                        with buffer:
-                            for index, dt in enumerate(stepper.steps()):
-                                progress.update(index)
-                                draw_timer.time(lambda: buffer.draw(lambda frame: overlay.draw(dt, frame)))
+                        log(f"Segment {segment.number}: {draw_timer}")
 
-                    log("Finished drawing frames. waiting for ffmpeg to catch up")
+
+                    progress.start(len(stepper))
+                    render_segments(segments, render_segment, progress)
                     progress.complete()
 
-                finally:
-                    for t in [draw_timer]:
-                        log(t)
+                    if generate != "none":
+                        log("Joining segments...")
+                        FFMPEGJoinSegments(
+                            ffmpeg=ffmpeg_exe,
+                            output=output,
+                            input=inputpath if generate == "default" else None,
+                            options=ffmpeg_options,
+                            creation_time=frame_meta.date_at(frame_meta.min)
+                        ).join(segment_files)
+
+            else:
+                with map_renderer.open(args.map_style) as renderer:
+
+                    if generate == "none":
+                        ffmpeg = FFMPEGNull()
+                    elif generate == "overlay":
+                        output.unlink(missing_ok=True)
+                        ffmpeg = FFMPEGOverlay(
+                            ffmpeg=ffmpeg_exe,
+                            output=output,
+                            options=ffmpeg_options,
+                            overlay_size=dimensions,
+                            execution=execution,
+                            creation_time=frame_meta.date_at(frame_meta.min),
+                            skip_unchanged=args.skip_unchanged_frames
+                        )
+                    else:
+                        output.unlink(missing_ok=True)
+                        ffmpeg = FFMPEGOverlayVideo(
+                            ffmpeg=ffmpeg_exe,
+                            input=inputpath,
+                            output=output,
+                            options=ffmpeg_options,
+                            overlay_size=dimensions,
+                            execution=execution,
+                            creation_time=frame_meta.date_at(frame_meta.min),
+                            skip_unchanged=args.skip_unchanged_frames
+                        )
+
+                    overlay = create_overlay(renderer)
+                    prefetch_map_tiles(renderer, overlay)
+
+                    try:
+                        progress.start(len(stepper))
+                        with ffmpeg.generate() as writer:
+
+                            if args.buffer_depth > 1:
+                                log("*** NOTE: Buffering mode is experimental. It is believed to work fine on Linux. "
+                                    "Please raise issues if you see it working or not-working. Thanks ***")
+                                buffer = RingBuffer(dimensions, args.bg, writer, depth=args.buffer_depth)
+                            else:
+                                buffer = SingleBuffer(dimensions, args.bg, writer)
+
+                            with buffer:
+                                for index, dt in enumerate(stepper.steps()):
+                                    progress.update(index)
+                                    draw_timer.time(lambda: buffer.draw(lambda frame: overlay.draw(dt, frame)))
+
+                            if isinstance(buffer, RingBuffer):
+                                log(buffer.stats())
+
+                        if map_tiles.hits or map_tiles.misses:
+                            log(map_tiles.stats())
+
+                        log("Finished drawing frames. waiting for ffmpeg to catch up")
+                        progress.complete()
+
+                    finally:
+                        for t in [draw_timer]:
+                            log(t)
 
-                    if profiler:
-                        log("\n\n*** Widget Timings ***")
-                        profiler.print()
-                        log("***\n\n")
+                        if profiler:
+                            log("\n\n*** Widget Timings ***")
+                            profiler.print()
+                            log("***\n\n")
 
     except KeyboardInterrupt:
         log("User interrupted...")
@@ -7,8 +7,9 @@ import re
 from typing import List
 
 from gopro_overlay import functional, filenaming, geocode
+from gopro_overlay.arguments import default_config_location
 from gopro_overlay.ffmpeg import FFMPEG
-from gopro_overlay.ffmpeg_gopro import FFMPEGGoPro
+from gopro_overlay.ffmpeg_gopro import FFMPEGGoPro, ProbeCache
 from gopro_overlay.gpmf.gpmf import GPMD
 from gopro_overlay.gpmf.visitors.gps import DetermineFirstLockedGPSUVisitor
 from gopro_overlay.log import log
@@ -18,6 +19,8 @@ if __name__ == "__main__":
         description="Rename a series of GoPro files by date. Does nothing (so its safe) by default.")
     parser.add_argument("--ffmpeg-dir", type=pathlib.Path,
                         help="Directory where ffmpeg/ffprobe located, default=Look in PATH")
+    parser.add_argument("--cache-dir", help="Location of caches (ffprobe results, ...)", type=pathlib.Path,
+                        default=default_config_location)
 
     parser.add_argument("file", type=pathlib.Path, nargs="+",
                         help="The files to rename, or directory/ies containing files")
@@ -55,10 +58,10 @@ if __name__ == "__main__":
 
     geocoder = geocode.GeoCode(key=args.geocode_key)
 
-    ffmpeg_gopro = FFMPEGGoPro(FFMPEG(args.ffmpeg_dir))
+    args.cache_dir.mkdir(exist_ok=True)
+    ffmpeg_gopro = FFMPEGGoPro(FFMPEG(args.ffmpeg_dir), probes=ProbeCache(args.cache_dir / "ffprobe.json"))
 
-    for file in file_list:
-        recording = ffmpeg_gopro.find_recording(file)
+    for file, recording in zip(file_list, ffmpeg_gopro.find_recordings(file_list)):
         gpmd = GPMD.parse(recording.load_data())
         found = gpmd.accept(DetermineFirstLockedGPSUVisitor())
         gps_datetime = found.packet_time
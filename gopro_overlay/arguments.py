@@ -106,12 +106,25 @@ def gopro_dashboard_arguments(args=None):
     render.add_argument("--profile",
                         help="Use ffmpeg options profile <name> from ~/gopro-graphics/ffmpeg-profiles.json")
     render.add_argument("--double-buffer", action="store_true",
-                        help="Enable HIGHLY EXPERIMENTAL double buffering mode. May speed things up. May not work at all")
+                        help="Enable HIGHLY EXPERIMENTAL double buffering mode. May speed things up. May not work at all. Same as --buffer-depth 2")
+    render.add_argument("--buffer-depth", type=int,
+                        help="Buffer up to this many drawn frames, written to ffmpeg by a separate process. "
+                             "Absorbs slow frames (e.g. map redraws). EXPERIMENTAL, default=1 - no buffering")
+    render.add_argument("--skip-unchanged-frames", action="store_true",
+                        help="Only send frames to ffmpeg that differ from the previous one, timestamping them instead. "
+                             "Faster for long recordings where the overlay rarely changes. EXPERIMENTAL")
+    render.add_argument("--no-interpolation", action="store_true",
+                        help="Draw each frame from the nearest metadata point before it, rather than from values "
+                             "interpolated to the frame time")
+    render.add_argument("--workers", type=int, default=1,
+                        help="Render using this many processes, each drawing a section of the video, which are then joined")
     render.add_argument("--ffmpeg-dir", type=pathlib.Path,
                         help="Directory where ffmpeg/ffprobe located, default=Look in PATH")
 
     loading = parser.add_argument_group("Loading", "Loading data from GoPro")
     loading.add_argument("--load", nargs="+", type=LoadFlag, action=EnumNameAction, default=set())
+    loading.add_argument("--no-metadata-cache", action="store_true",
+                         help="Don't use (or store) parsed GoPro metadata in the cache dir - always read it from the video")
 
     gpx = parser.add_argument_group("GPX", "Using GPX & Fit Files")
 
@@ -133,6 +146,14 @@ def gopro_dashboard_arguments(args=None):
 
     maps.add_argument("--map-style", choices=geo.available_map_styles(), default="osm", help="Style of map to render")
     maps.add_argument("--map-api-key", help="API Key for map provider, if required (default OSM doesn't need one)")
+    maps.add_argument("--map-tile-memory", type=int, default=512,
+                      help="Keep at most this many MB of decoded map tiles in memory")
+    maps.add_argument("--map-tile-compressed-memory", type=int, default=256,
+                      help="Also keep up to this many MB of compressed map tiles in memory, decoding them when needed, "
+                           "0 to not keep them")
+    maps.add_argument("--map-tile-store-size", type=int,
+                      help="Keep at most this many MB of map tiles in the tile store in the cache dir, removing the "
+                           "least recently used (default: no limit)")
 
     layout = parser.add_argument_group("Layout", "Controlling layout")
 
@@ -191,4 +212,22 @@ def gopro_dashboard_arguments(args=None):
     if args.use_gpx_only and args.generate != "default":
         quit("--generate cannot be combined with --use-gpx-only")
 
+    if args.workers < 1:
+        quit("--workers must be at least 1")
+
+    if args.buffer_depth is None:
+        args.buffer_depth = 2 if args.double_buffer else 1
+
+    if args.buffer_depth < 1:
+        quit("--buffer-depth must be at least 1")
+
+    if args.workers > 1 and args.buffer_depth > 1:
+        quit("--workers cannot be combined with --double-buffer or --buffer-depth")
+
+    if args.skip_unchanged_frames and (args.workers > 1 or args.buffer_depth > 1):
+        quit("--skip-unchanged-frames cannot be combined with --workers, --double-buffer or --buffer-depth")
+
+    if args.profiler and args.workers > 1:
+        quit("--profiler cannot be combined with --workers")
+
     return args
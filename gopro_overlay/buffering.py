@@ -1,10 +1,12 @@
 import ctypes
+import dataclasses
 import io
 import multiprocessing
 import os
+import time
 from io import BufferedWriter
 from multiprocessing.shared_memory import SharedMemory
-from typing import Callable, Any, Tuple
+from typing import Callable, Any, Tuple, List
 
 from PIL import Image, ImageDraw
 
@@ -17,15 +19,26 @@ class DrawBuffer:
         raise NotImplementedError()
 
 
+def raw_image(dimensions: Dimension, buffer) -> Image.Image:
+    image = Image.frombuffer("RGBA", (dimensions.x, dimensions.y), buffer, "raw", "RGBA", 0, 1)
+    image.readonly = 0
+    return image
+
+
 class SingleBuffer(DrawBuffer):
+    """Draw every frame into the same image, whose memory is written straight to ffmpeg, without copying it"""
+
     def __init__(self, size: Dimension, background: Tuple, writer: BufferedWriter):
-        self.supplier = SimpleFrameSupplier(size, background)
+        self.blank = SimpleFrameSupplier(size, background).drawing_frame().tobytes()
+        self.buffer = bytearray(self.blank)
+        self.memory = memoryview(self.buffer)
+        self.image = raw_image(size, self.buffer)
         self.writer = writer
 
     def draw(self, f: Callable[[Image.Image], Any]):
-        image = self.supplier.drawing_frame()
-        f(image)
-        self.writer.write(image.tobytes())
+        self.buffer[:] = self.blank
+        f(self.image)
+        self.writer.write(self.memory)
 
     def __enter__(self):
         return self
@@ -34,29 +47,15 @@ class SingleBuffer(DrawBuffer):
         pass
 
 
-class SerialisedWriter(io.BufferedWriter):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.lock = multiprocessing.Lock()
-
-    def write(self, __buffer) -> int:
-        with self.lock:
-            try:
-                return super().write(__buffer)
-            finally:
-                super().flush()
-
-
-cond_timeout = 1.0
+poll_timeout = 1.0
 
 
-def raw_image(dimensions: Dimension, buffer) -> Image.Image:
-    image = Image.frombuffer("RGBA", (dimensions.x, dimensions.y), buffer, "raw", "RGBA", 0, 1)
-    image.readonly = 0
-    return image
+class Frame:
+    """One slot of a RingBuffer, an image held in shared memory
 
+    Frames don't synchronise themselves - the RingBuffer ensures a slot is only drawn once it has been written.
+    """
 
-class Frame:
     def __init__(self, shm: SharedMemory, quit: multiprocessing.Value, size: Dimension, background: Tuple, count: int):
         self.shm = shm
         self.size = size
@@ -70,47 +69,19 @@ class Frame:
         self.image = raw_image(size, self.memory)
         self.im_draw = ImageDraw.ImageDraw(self.image)
 
-        self.active = multiprocessing.Lock()
-        self.can_draw = multiprocessing.Condition(self.active)
-        self.can_write = multiprocessing.Condition(self.active)
-
         self.ctypes_buffer = ctypes.c_char.from_buffer(self.memory)
 
-        self.drawn_frame_number = multiprocessing.Value(ctypes.c_long)
-        self.drawn_frame_number.value = -1
-
-        self.written_frame_number = multiprocessing.Value(ctypes.c_long)
-        self.written_frame_number.value = -1
-
         self.clear()
 
-    def wake(self):
-        with self.can_draw:
-            self.can_draw.notify()
-        with self.can_write:
-            self.can_write.notify()
-
     def clear(self):
         ctypes.memset(ctypes.byref(self.ctypes_buffer), 0x00, self.buffer_size)
         if self.background != (0, 0, 0, 0):
             self.im_draw.rectangle((0, 0, self.size.x, self.size.y), self.background)
 
     def draw(self, f: Callable[[Image.Image], None]) -> bool:
-        with self.can_draw:
-            while not self.can_draw.wait_for(
-                    predicate=lambda: self.quit.value == 1 or self.written_frame_number.value == self.drawn_frame_number.value,
-                    timeout=cond_timeout):
-                pass
-
-        if self.drawn_frame_number.value == self.written_frame_number.value:
-            f(self.image)
-
-        self.drawn_frame_number.value += 1
-        with self.can_write:
-            self.can_write.notify()
-
         if self.quit.value == 1:
             return False
+        f(self.image)
         return True
 
     def copy(self) -> Image.Image:
@@ -123,78 +94,128 @@ class Frame:
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.wake()
         del self.ctypes_buffer
         self.image.close()
         self.memory = None
 
-    def write(self, writer: io.BytesIO) -> bool:
-        with self.can_write:
-            while not self.can_write.wait_for(
-                    predicate=lambda: self.quit.value == 1 or self.drawn_frame_number.value > self.written_frame_number.value,
-                    timeout=cond_timeout):
-                pass
+    def write(self, writer: io.BytesIO):
+        writer.write(self.memory)
+        self.clear()
 
-        if self.drawn_frame_number.value > self.written_frame_number.value:
-            writer.write(self.memory)
-            self.clear()
-            self.written_frame_number.value += 1
 
-            with self.can_draw:
-                self.can_draw.notify()
+@dataclasses.dataclass(frozen=True)
+class BufferStats:
+    depth: int
+    frames: int
+    occupancy: List[int]
+    draw_stall: float
+    write_stall: float
 
-        if self.quit.value == 1:
-            return False
-        return True
+    def __str__(self):
+        occupancy = ", ".join(f"{full}:{count}" for full, count in enumerate(self.occupancy) if count)
+        return (f"RingBuffer(Depth: {self.depth}, Frames: {self.frames}, "
+                f"Draw Stall: {self.draw_stall:.5f}s, Write Stall: {self.write_stall:.5f}s, "
+                f"Occupancy: [{occupancy}])")
 
 
-def p_writer(frame: Frame, writer: io.BytesIO):
+def p_writer(frames: List[Frame], quit: multiprocessing.Value, filled: multiprocessing.Semaphore,
+             free: multiprocessing.Semaphore, written: multiprocessing.Value, write_stall: multiprocessing.Value,
+             writer: io.BytesIO):
+    """Write frames to ffmpeg, strictly in the order they were drawn"""
     try:
         while True:
-            if not frame.write(writer):
-                break
+            started = time.perf_counter()
+            while not filled.acquire(timeout=poll_timeout):
+                if quit.value == 1:
+                    return
+            write_stall.value += time.perf_counter() - started
+
+            slot = written.value % len(frames)
+            frames[slot].write(writer)
+            written.value += 1
+
+            free.release()
     except KeyboardInterrupt:
         pass
+    finally:
+        writer.flush()
 
 
-class DoubleBuffer(DrawBuffer):
-    def __init__(self, size: Dimension, background: Tuple, writer: BufferedWriter):
+class RingBuffer(DrawBuffer):
+    """Draw frames into a ring of shared memory slots, while a single separate process writes them to ffmpeg
+
+    The drawing side only ever updates `drawn`, and the writer only ever updates `written`, so neither needs a lock -
+    slots are handed between the two by a pair of semaphores. Short spikes in drawing time are absorbed while
+    there are full slots still waiting to be written.
+    """
+
+    def __init__(self, size: Dimension, background: Tuple, writer: BufferedWriter, depth: int = 2):
+        if depth < 1:
+            raise ValueError(f"Buffer depth must be at least 1, not {depth}")
+
+        self.depth = depth
         shm_name = f"gopro.{os.getpid()}"
         buffer_size = (size.x * size.y * 4)
-        shm_size = buffer_size * 2
-        self.shm = SharedMemory(create=True, name=shm_name, size=shm_size)
+        self.shm = SharedMemory(create=True, name=shm_name, size=buffer_size * depth)
         self.quit = multiprocessing.Value(ctypes.c_int)
 
-        self.frame0 = Frame(self.shm, self.quit, size, background, 0)
-        self.frame1 = Frame(self.shm, self.quit, size, background, 1)
+        self.frames = [Frame(self.shm, self.quit, size, background, slot) for slot in range(depth)]
 
-        writer = SerialisedWriter(writer)
+        self.free = multiprocessing.Semaphore(depth)
+        self.filled = multiprocessing.Semaphore(0)
 
-        self.worker1 = multiprocessing.Process(target=p_writer, args=(self.frame0, writer))
-        self.worker1.start()
-        self.worker2 = multiprocessing.Process(target=p_writer, args=(self.frame1, writer))
-        self.worker2.start()
+        self.drawn = 0
+        self.written = multiprocessing.Value(ctypes.c_long, 0, lock=False)
+        self.write_stall = multiprocessing.Value(ctypes.c_double, 0.0, lock=False)
 
-        self.counter = 0
+        self.occupancy = [0] * (depth + 1)
+        self.draw_stall = 0.0
+
+        self.worker = multiprocessing.Process(
+            target=p_writer,
+            args=(self.frames, self.quit, self.filled, self.free, self.written, self.write_stall, writer)
+        )
+        self.worker.start()
 
     def draw(self, f: Callable[[Image.Image], Any]):
-        current_frame = self.frame0 if self.counter % 2 == 0 else self.frame1
-        current_frame.draw(lambda image: f(image))
-        self.counter += 1
+        self.occupancy[min(self.depth, self.drawn - self.written.value)] += 1
+
+        if not self.free.acquire(block=False):
+            started = time.perf_counter()
+            while not self.free.acquire(timeout=poll_timeout):
+                if not self.worker.is_alive():
+                    raise IOError("Buffer writer process has exited")
+            self.draw_stall += time.perf_counter() - started
+
+        self.frames[self.drawn % self.depth].draw(f)
+        self.drawn += 1
+        self.filled.release()
+
+    def stats(self) -> BufferStats:
+        return BufferStats(
+            depth=self.depth,
+            frames=self.drawn,
+            occupancy=list(self.occupancy),
+            draw_stall=self.draw_stall,
+            write_stall=self.write_stall.value,
+        )
 
     def __enter__(self):
         return self
 
-    def __exit__(self, *args):
-        self.quit.value = 1
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            # let the writer drain every drawn frame, before asking it to stop
+            for _ in range(self.depth):
+                if not self.free.acquire(timeout=poll_timeout * 10):
+                    break
 
-        self.frame0.__exit__(*args)
-        self.frame1.__exit__(*args)
+        self.quit.value = 1
+        self.worker.join(timeout=poll_timeout * 2)
 
-        self.worker1.join(timeout=1.0)
-        self.worker2.join(timeout=1.0)
+        for frame in self.frames:
+            frame.__exit__(exc_type, exc_val, exc_tb)
 
-        del self.frame0
-        del self.frame1
+        del self.frames
 
         self.shm.unlink()
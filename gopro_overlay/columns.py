@@ -0,0 +1,597 @@
+import dataclasses
+import datetime
+import math
+from typing import Dict, List, Optional, Any, Callable, Tuple
+
+import numpy as np
+import pint
+
+from gopro_overlay.entry import Entry
+from gopro_overlay.gpmf.visitors.cori import Orientation
+from gopro_overlay.point import Point, PintPoint3, Quaternion, Point3
+
+
+def _is_int(v) -> bool:
+    return type(v) is int
+
+
+def _is_number(v) -> bool:
+    return type(v) is int or type(v) is float
+
+
+def _scalar_quantity(v) -> bool:
+    return isinstance(v, pint.Quantity) and _is_number(v.magnitude)
+
+
+_makers: Dict[Tuple[type, Any], Callable[[Any], pint.Quantity]] = {}
+
+
+def quantity_maker(quantity, units) -> Callable[[Any], pint.Quantity]:
+    """Makes Quantities in the given units from magnitudes - as quantity(magnitude, units) does, but without pint
+    checking, every time, what it has been given - which takes most of the time of making one"""
+    key = (quantity, units)
+    maker = _makers.get(key, None)
+    if maker is None:
+        new = object.__new__
+
+        def fast(magnitude):
+            q = new(quantity)
+            q._magnitude = magnitude
+            q._units = units
+            return q
+
+        def slow(magnitude):
+            return quantity(magnitude, units)
+
+        # only if it makes exactly what pint would (pint might, one day, keep more in a Quantity)
+        maker = fast if vars(fast(1.5)) == vars(slow(1.5)) else slow
+        _makers[key] = maker
+    return maker
+
+
+class Column:
+    """Values of one metric, for each row"""
+
+    def get(self, row: int):
+        raise NotImplementedError()
+
+    def set(self, row: int, value) -> bool:
+        """Store value, returning False if it can't be held by this column"""
+        raise NotImplementedError()
+
+    def take(self, rows: np.ndarray) -> 'Column':
+        raise NotImplementedError()
+
+    def __len__(self):
+        raise NotImplementedError()
+
+
+class ObjectColumn(Column):
+
+    def __init__(self, values: List[Any]):
+        self.values = values
+
+    def get(self, row: int):
+        return self.values[row]
+
+    def set(self, row: int, value) -> bool:
+        self.values[row] = value
+        return True
+
+    def take(self, rows: np.ndarray) -> 'ObjectColumn':
+        return ObjectColumn([self.values[r] for r in rows])
+
+    def __len__(self):
+        return len(self.values)
+
+
+class NumericColumn(Column):
+    """Numbers, or pint Quantities, held in one array, with the units (if any) kept once for the whole column"""
+
+    def __init__(self, values: np.ndarray, present: np.ndarray, quantity=None, units=None):
+        self.values = values
+        self.present = present
+        self.quantity = quantity
+        self.units = units
+        self._make = quantity_maker(quantity, units) if quantity is not None else None
+
+    @staticmethod
+    def build(values: List[Any]) -> Optional['NumericColumn']:
+        present = [v for v in values if v is not None]
+        if not present:
+            return None
+
+        first = present[0]
+        if _scalar_quantity(first):
+            # _units is pint's (hashable, cheaply comparable) container, .units would make a new Unit each time
+            quantity, units = type(first), first._units
+            if not all(type(v) is quantity and _is_number(v.magnitude) and v._units == units for v in present):
+                return None
+            magnitudes = [v.magnitude if v is not None else 0 for v in values]
+        elif _is_number(first):
+            quantity, units = None, None
+            if not all(_is_number(v) for v in present):
+                return None
+            magnitudes = [v if v is not None else 0 for v in values]
+        else:
+            return None
+
+        dtype = np.int64 if all(_is_int(m) for m in magnitudes) else np.float64
+
+        try:
+            array = np.array(magnitudes, dtype=dtype)
+        except OverflowError:
+            return None
+
+        return NumericColumn(
+            values=array,
+            present=np.array([v is not None for v in values], dtype=bool),
+            quantity=quantity,
+            units=units
+        )
+
+    def get(self, row: int):
+        if not self.present[row]:
+            return None
+        value = self.values[row].item()
+        return value if self._make is None else self._make(value)
+
+    def _accepts(self, value) -> bool:
+        if self.quantity is None:
+            magnitude = value if _is_number(value) else None
+        elif type(value) is self.quantity and _is_number(value.magnitude) and value._units == self.units:
+            magnitude = value.magnitude
+        else:
+            magnitude = None
+
+        if magnitude is None:
+            return False
+        if self.values.dtype == np.int64 and not _is_int(magnitude):
+            self.values = self.values.astype(np.float64)
+        return True
+
+    def set(self, row: int, value) -> bool:
+        if value is None:
+            self.present[row] = False
+            return True
+        if not self._accepts(value):
+            return False
+        self.values[row] = value if self.quantity is None else value.magnitude
+        self.present[row] = True
+        return True
+
+    def to_objects(self) -> ObjectColumn:
+        return ObjectColumn([self.get(row) for row in range(len(self))])
+
+    def take(self, rows: np.ndarray) -> 'NumericColumn':
+        return NumericColumn(self.values[rows], self.present[rows], self.quantity, self.units)
+
+    def __len__(self):
+        return len(self.values)
+
+
+class CompositeColumn(Column):
+    """Objects made, only when asked for, from columns of their parts - e.g. Points from columns of lat and lon"""
+
+    def __init__(self, build: Callable[..., Any], parts: List[Column], present: np.ndarray):
+        self.build = build
+        self.parts = parts
+        self.present = present
+
+    def get(self, row: int):
+        if not self.present[row]:
+            return None
+        return self.build(*[part.get(row) for part in self.parts])
+
+    def set(self, row: int, value) -> bool:
+        if value is None:
+            self.present[row] = False
+            return True
+        return False
+
+    def to_objects(self) -> ObjectColumn:
+        return ObjectColumn([self.get(row) for row in range(len(self))])
+
+    def take(self, rows: np.ndarray) -> 'CompositeColumn':
+        return CompositeColumn(self.build, [part.take(rows) for part in self.parts], self.present[rows])
+
+    def __len__(self):
+        return len(self.present)
+
+
+def column_of(values: List[Any]) -> Column:
+    numeric = NumericColumn.build(values)
+    return numeric if numeric is not None else ObjectColumn(values)
+
+
+def _absent(like: Column, rows: int) -> Column:
+    """A column of the same kind as the given one, with no values"""
+    if isinstance(like, NumericColumn):
+        return NumericColumn(np.zeros(rows, dtype=like.values.dtype), np.zeros(rows, dtype=bool),
+                             like.quantity, like.units)
+    if isinstance(like, CompositeColumn):
+        return CompositeColumn(like.build, [_absent(part, rows) for part in like.parts], np.zeros(rows, dtype=bool))
+    return ObjectColumn([None] * rows)
+
+
+def _joined(a: Column, b: Column) -> Column:
+    """The rows of a, then those of b - kept as arrays where they're of the same kind, and units"""
+    if isinstance(a, NumericColumn) and isinstance(b, NumericColumn) \
+            and a.quantity is b.quantity and a.units == b.units:
+        return NumericColumn(np.concatenate([a.values, b.values]), np.concatenate([a.present, b.present]),
+                             a.quantity, a.units)
+    if isinstance(a, CompositeColumn) and isinstance(b, CompositeColumn) \
+            and a.build is b.build and len(a.parts) == len(b.parts):
+        return CompositeColumn(a.build, [_joined(p, q) for p, q in zip(a.parts, b.parts)],
+                               np.concatenate([a.present, b.present]))
+    if isinstance(a, ObjectColumn) and isinstance(b, ObjectColumn):
+        return ObjectColumn(a.values + b.values)
+    return column_of([a.get(row) for row in range(len(a))] + [b.get(row) for row in range(len(b))])
+
+
+@dataclasses.dataclass(frozen=True)
+class Codec:
+    """How to take an object apart into numbers (or Quantities), and put it back together"""
+    kind: type
+    parts: Callable[[Any], Tuple]
+    build: Callable[..., Any]
+    # can objects in between two others be made from parts in between theirs? (not for angles, which wrap around)
+    linear: bool = True
+
+
+codecs: Dict[str, Codec] = {
+    "point": Codec(Point, lambda p: (p.lat, p.lon), Point),
+    "pintpoint3": Codec(PintPoint3, lambda p: (p.x, p.y, p.z), PintPoint3),
+    "quaternion": Codec(Quaternion, lambda q: (q.w, q.v.x, q.v.y, q.v.z), lambda w, x, y, z: Quaternion(w, Point3(x, y, z)),
+                        linear=False),
+    "orientation": Codec(Orientation, lambda o: (o.roll, o.pitch, o.yaw), Orientation, linear=False),
+}
+
+
+def decompose(column: Column) -> Optional[Tuple[str, CompositeColumn]]:
+    """The column as columns of the parts of its objects, with the name of their codec - or None, if they can't be"""
+    if isinstance(column, CompositeColumn):
+        if not all(isinstance(part, NumericColumn) for part in column.parts):
+            return None
+        for name, codec in codecs.items():
+            if codec.build is column.build:
+                return name, column
+        return None
+
+    if not isinstance(column, ObjectColumn):
+        return None
+
+    values = column.values
+    present = [v for v in values if v is not None]
+    if not present:
+        return None
+
+    for name, codec in codecs.items():
+        if all(type(v) is codec.kind for v in present):
+            break
+    else:
+        return None
+
+    decomposed = [codec.parts(v) if v is not None else None for v in values]
+    parts = []
+    for index in range(len(codec.parts(present[0]))):
+        part = NumericColumn.build([d[index] if d is not None else None for d in decomposed])
+        if part is None or part.present.sum() != len(present):
+            return None
+        parts.append(part)
+
+    return name, CompositeColumn(codec.build, parts, np.array([v is not None for v in values], dtype=bool))
+
+
+def _blend(values: np.ndarray, before: np.ndarray, after: np.ndarray, position: np.ndarray,
+           between: np.ndarray) -> np.ndarray:
+    start = values[before].astype(np.float64)
+    return np.where(between, start + (values[after] - start) * position, start)
+
+
+# a whole turn, in each of the units that angles (headings, bearings) can be in - they wrap around
+_turns = {"degree": 360.0, "radian": 2 * math.pi}
+
+
+def _blend_angle(values: np.ndarray, before: np.ndarray, after: np.ndarray, position: np.ndarray,
+                 between: np.ndarray, present: np.ndarray, turn: float) -> np.ndarray:
+    """As _blend, but the short way round - 359° to 1° passes through 0°, not 180° - staying in the same range
+    (0..360, or -180..180) as the values"""
+    start = values[before].astype(np.float64)
+    half = turn / 2
+    arc = (values[after] - start + half) % turn - half
+    blended = start + arc * position
+    wrapped = (blended + half) % turn - half if np.any(values[present] < 0) else blended % turn
+    return np.where(between, wrapped, start)
+
+
+def _is_count(column: NumericColumn) -> bool:
+    """Plain numbers, or dimensionless Quantities (e.g. units.number), rather than measurements"""
+    return column.quantity is None or column.quantity(1, column.units).dimensionless
+
+
+def _resample(column: Column, before: np.ndarray, after: np.ndarray, position: np.ndarray,
+              between: np.ndarray) -> Column:
+    if isinstance(column, NumericColumn):
+        if column.values.dtype == np.int64 and _is_count(column):
+            # counts, flags and enums - there's nothing in between
+            return column.take(before)
+        both = between & column.present[before] & column.present[after]
+        turn = _turns.get(str(column.units)) if column.quantity is not None else None
+        if turn is not None:
+            blended = _blend_angle(column.values, before, after, position, both, column.present, turn)
+        else:
+            blended = _blend(column.values, before, after, position, both)
+        return NumericColumn(blended, column.present[before], column.quantity, column.units)
+
+    decomposed = decompose(column)
+    if decomposed is None or not codecs[decomposed[0]].linear:
+        return column.take(before)
+
+    composite = decomposed[1]
+    both = between & composite.present[before] & composite.present[after]
+    return CompositeColumn(
+        composite.build,
+        [NumericColumn(_blend(part.values, before, after, position, both), part.present[before],
+                       part.quantity, part.units) for part in composite.parts],
+        composite.present[before]
+    )
+
+
+class DatetimeColumn:
+    """Datetimes as integer microseconds since the epoch, when they all share a timezone"""
+
+    def __init__(self, micros: Optional[np.ndarray], epoch: Optional[datetime.datetime], objects: Optional[List]):
+        self.micros = micros
+        self.epoch = epoch
+        self.objects = objects
+
+    @staticmethod
+    def build(values: List[datetime.datetime]) -> 'DatetimeColumn':
+        if values and all(type(v) is datetime.datetime for v in values):
+            tz = values[0].tzinfo
+            if all(v.tzinfo is tz for v in values):
+                epoch = datetime.datetime(1970, 1, 1, tzinfo=tz)
+                return DatetimeColumn(
+                    micros=np.array([(v - epoch) // datetime.timedelta(microseconds=1) for v in values],
+                                    dtype=np.int64),
+                    epoch=epoch,
+                    objects=None
+                )
+        return DatetimeColumn(micros=None, epoch=None, objects=list(values))
+
+    def get(self, row: int) -> datetime.datetime:
+        if self.objects is not None:
+            return self.objects[row]
+        return self.epoch + datetime.timedelta(microseconds=int(self.micros[row]))
+
+    def seconds_between(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """(dt[b] - dt[a]).total_seconds(), for each pair of rows"""
+        if self.objects is not None:
+            return np.array([(self.objects[j] - self.objects[i]).total_seconds()
+                             for i, j in zip(a.tolist(), b.tolist())], dtype=np.float64)
+        return (self.micros[b] - self.micros[a]) / 1_000_000
+
+    def take(self, rows: np.ndarray) -> 'DatetimeColumn':
+        if self.objects is not None:
+            return DatetimeColumn(None, None, [self.objects[r] for r in rows])
+        return DatetimeColumn(self.micros[rows], self.epoch, None)
+
+    def joined(self, other: 'DatetimeColumn') -> 'DatetimeColumn':
+        """These datetimes, then the other's"""
+        if self.objects is None and other.objects is None and self.epoch.tzinfo is other.epoch.tzinfo:
+            return DatetimeColumn(np.concatenate([self.micros, other.micros]), self.epoch, None)
+        return DatetimeColumn.build([self.get(row) for row in range(len(self))] +
+                                    [other.get(row) for row in range(len(other))])
+
+    def __len__(self):
+        return len(self.objects) if self.objects is not None else len(self.micros)
+
+    def resample(self, before: np.ndarray, after: np.ndarray, position: np.ndarray) -> 'DatetimeColumn':
+        if self.objects is not None:
+            return DatetimeColumn(None, None, [
+                self.objects[b] + (self.objects[a] - self.objects[b]) * p
+                for b, a, p in zip(before.tolist(), after.tolist(), position.tolist())
+            ])
+        start = self.micros[before]
+        micros = start + np.rint((self.micros[after] - start) * position).astype(np.int64)
+        return DatetimeColumn(micros, self.epoch, None)
+
+
+class ColumnStore:
+    """Rows of metadata, sorted by frame time, held column by column"""
+
+    def __init__(self, times: np.ndarray, dts: DatetimeColumn, columns: Dict[str, Column]):
+        self.times = times
+        self.dts = dts
+        self.columns = columns
+
+    @staticmethod
+    def empty() -> 'ColumnStore':
+        return ColumnStore(np.zeros(0, dtype=np.int64), DatetimeColumn.build([]), {})
+
+    @staticmethod
+    def from_entries(times: List[int], entries: List[Entry]) -> 'ColumnStore':
+        order = np.argsort(np.array(times, dtype=np.int64), kind="stable")
+        times = [times[i] for i in order]
+        entries = [entries[i] for i in order]
+
+        keys = {}
+        for e in entries:
+            keys.update(dict.fromkeys(e.items.keys()))
+
+        return ColumnStore(
+            times=np.array(times, dtype=np.int64),
+            dts=DatetimeColumn.build([e.dt for e in entries]),
+            columns={k: column_of([e.items.get(k, None) for e in entries]) for k in keys}
+        )
+
+    def __len__(self):
+        return len(self.times)
+
+    def value(self, key: str, row: int):
+        column = self.columns.get(key, None)
+        return column.get(row) if column is not None else None
+
+    def numeric(self, key: str) -> Optional[NumericColumn]:
+        column = self.columns.get(key, None)
+        return column if isinstance(column, NumericColumn) else None
+
+    def assign(self, key: str, rows: np.ndarray, magnitudes: np.ndarray, unit=None):
+        """Store many values at once - magnitudes of Quantities in the given (pint) unit, or plain numbers"""
+        if len(rows) == 0:
+            return
+        quantity, units = (None, None) if unit is None else (type(1 * unit), unit._units)
+
+        column = self.columns.get(key, None)
+        if column is None:
+            column = NumericColumn(np.zeros(len(self), dtype=magnitudes.dtype), np.zeros(len(self), dtype=bool),
+                                   quantity, units)
+            self.columns[key] = column
+
+        if isinstance(column, NumericColumn) and column.quantity is quantity and column.units == units:
+            if column.values.dtype != magnitudes.dtype:
+                column.values = column.values.astype(np.float64)
+            column.values[rows] = magnitudes
+            column.present[rows] = True
+        else:
+            for row, magnitude in zip(rows.tolist(), magnitudes.tolist()):
+                self.set(key, row, magnitude if quantity is None else quantity(magnitude, units))
+
+    def clear(self, key: str, rows: np.ndarray):
+        column = self.columns.get(key, None)
+        if isinstance(column, NumericColumn):
+            column.present[rows] = False
+        elif column is not None:
+            for row in rows.tolist():
+                column.set(row, None)
+
+    def set(self, key: str, row: int, value):
+        column = self.columns.get(key, None)
+        if column is None:
+            if value is None:
+                return
+            values = [None] * len(self)
+            values[row] = value
+            self.columns[key] = column_of(values)
+        elif not column.set(row, value):
+            column = column.to_objects()
+            column.set(row, value)
+            self.columns[key] = column
+
+    def items(self, row: int) -> Dict[str, Any]:
+        items = {}
+        for key, column in self.columns.items():
+            value = column.get(row)
+            if value is not None:
+                items[key] = value
+        return items
+
+    def entry(self, row: int) -> Entry:
+        return Entry(self.dts.get(row), **self.items(row))
+
+    def interpolated(self, a: int, b: int, position: float) -> Entry:
+        """An entry position (0..1) of the way from row a to row b - as Entry.interpolate would make"""
+        items = {}
+        for key, column in self.columns.items():
+            if isinstance(column, NumericColumn):
+                if column.present[a] and column.present[b]:
+                    start = column.values[a].item()
+                    value = start + (column.values[b].item() - start) * position
+                    items[key] = value if column._make is None else column._make(value)
+            else:
+                start, end = column.get(a), column.get(b)
+                if start is not None and end is not None:
+                    items[key] = start + ((end - start) * position)
+
+        start = self.dts.get(a)
+        return Entry(start + (self.dts.get(b) - start) * position, **items)
+
+    def resampled(self, times: np.ndarray, max_gap: int) -> 'ColumnStore':
+        """Rows at the given times, each with values part way between those of the rows either side of it - all
+        rows made at once, a column at a time.
+
+        Where the rows either side are more than max_gap apart, or the time is before the first row or after the last,
+        the values of the nearest row before (or the first row) are kept, as FrameMeta.get would give them. Whole
+        numbers that aren't measurements (counts, flags, packet numbers), and objects that can't be taken apart into
+        numbers - or are angles - are always kept, not interpolated. Headings and bearings (in degrees or radians) go
+        the short way round. A value that's missing in the next row is kept too, rather than being dropped.
+        """
+        times = np.asarray(times, dtype=np.int64)
+        last = len(self) - 1
+
+        found = np.searchsorted(self.times, times)
+        exact = self.times[np.minimum(found, last)] == times
+        after = np.where(exact, found, np.minimum(found, last))
+        before = np.where(exact, found, np.maximum(found - 1, 0))
+
+        span = self.times[after] - self.times[before]
+        between = (span > 0) & (span <= max_gap)
+        position = np.where(between, (times - self.times[before]) / np.where(span > 0, span, 1), 0.0)
+
+        return ColumnStore(
+            times=times,
+            dts=self.dts.resample(before, after, position),
+            columns={k: _resample(c, before, after, position, between) for k, c in self.columns.items()}
+        )
+
+    def merged(self, other: 'ColumnStore') -> 'ColumnStore':
+        """The rows of both, in time order - rows of the other replace any here at the same time"""
+        if len(self) == 0:
+            return other
+        if len(other) == 0:
+            return self
+
+        replaced = np.isin(self.times, other.times)
+        kept = self.take(np.flatnonzero(~replaced)) if replaced.any() else self
+
+        columns = {}
+        for key in dict.fromkeys([*kept.columns.keys(), *other.columns.keys()]):
+            a, b = kept.columns.get(key, None), other.columns.get(key, None)
+            columns[key] = _joined(
+                a if a is not None else _absent(b, len(kept)),
+                b if b is not None else _absent(a, len(other))
+            )
+
+        store = ColumnStore(np.concatenate([kept.times, other.times]), kept.dts.joined(other.dts), columns)
+        if len(kept) and kept.times[-1] > other.times[0]:
+            store = store.take(np.argsort(store.times, kind="stable"))
+        return store
+
+    def take(self, rows: np.ndarray) -> 'ColumnStore':
+        return ColumnStore(
+            times=self.times[rows],
+            dts=self.dts.take(rows),
+            columns={k: c.take(rows) for k, c in self.columns.items()}
+        )
+
+
+class EntryView(Entry):
+    """Looks like an Entry, but reads (and writes) a row of a ColumnStore"""
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store: ColumnStore, row: int):
+        self._store = store
+        self._row = row
+
+    @property
+    def dt(self) -> datetime.datetime:
+        return self._store.dts.get(self._row)
+
+    @property
+    def items(self) -> Dict[str, Any]:
+        return self._store.items(self._row)
+
+    def update(self, **kwargs):
+        for k, v in kwargs.items():
+            self._store.set(k, self._row, v)
+
+    def __getattr__(self, item):
+        # not for dunders, or the slots above, if not yet set (as when unpickling)
+        if item[0] == "_":
+            raise AttributeError(item)
+        column = self._store.columns.get(item, None)
+        return column.get(self._row) if column is not None else None
+
+    def interpolate(self, other: Entry, dt: datetime.datetime):
+        return self._store.entry(self._row).interpolate(other, dt)
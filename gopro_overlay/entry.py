@@ -5,15 +5,19 @@ from gopro_overlay.log import log
 
 
 class Entry:
+    __slots__ = ("dt", "items")
 
     def __init__(self, dt: datetime.datetime, **kwargs):
         self.dt = dt
-        self.items = {k: v for k, v in dict(**kwargs).items() if v is not None}
+        self.items = {k: v for k, v in kwargs.items() if v is not None}
 
     def update(self, **kwargs):
         self.items.update(**kwargs)
 
     def __getattr__(self, item):
+        # not for dunders, or slots not yet set (as when unpickling)
+        if item.startswith("__") or item in Entry.__slots__:
+            raise AttributeError(item)
         return self.items.get(item, None)
 
     def __str__(self):
@@ -1,27 +1,148 @@
 from __future__ import annotations
 
+import contextlib
 import datetime
 import itertools
 import json
 import os
 import pathlib
 import subprocess
+import threading
 from array import array
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Dict, List
 
+from gopro_overlay import mp4
 from gopro_overlay.common import temporary_file
 from gopro_overlay.dimensions import Dimension
 from gopro_overlay.ffmpeg import FFMPEG
+from gopro_overlay.log import log
 from gopro_overlay.progresstrack import ProgressBarProgress
 from gopro_overlay.timeunits import timeunits, Timeunit
 
 
+_video_selector = lambda s: s["codec_type"] == "video" and s["disposition"]["default"] == 1
+_audio_selector = lambda s: s["codec_type"] == "audio"
+_data_selector = lambda s: s["codec_type"] == "data" and s["codec_tag_string"] == "gpmd"
+
+
+def _first_and_only(what, l, p):
+    matches = list(filter(p, l))
+    if not matches:
+        raise IOError(f"Unable to find {what} in ffprobe output")
+    if len(matches) > 1:
+        raise IOError(f"Multiple matching streams for {what} in ffprobe output")
+    return matches[0]
+
+
+def _only_if_present(what, l, p):
+    matches = list(filter(p, l))
+    if matches:
+        return _first_and_only(what, l, p)
+
+
+class ProbeCache:
+    """What ffprobe said about each file, by path, size and modification time - kept in memory, and, if given a
+    location, in a json file there too.
+
+    New probes are written out together, at the end of a batch - the file is read again just before, so probes
+    saved by another process meanwhile are kept, and entries for files that have since changed or been deleted are
+    dropped."""
+
+    def __init__(self, location: Optional[Path] = None):
+        self.location = location
+        self.lock = threading.Lock()
+        self.probes: Optional[Dict[str, dict]] = None if location is not None else {}
+        self.pending: Dict[str, dict] = {}
+        self.batches = 0
+
+    @staticmethod
+    def key(filepath: Path, sr: os.stat_result) -> str:
+        return f"{Path(filepath).absolute()}|{sr.st_size}|{sr.st_mtime}"
+
+    @staticmethod
+    def _current(key: str) -> bool:
+        path = key.rsplit("|", 2)[0]
+        try:
+            return ProbeCache.key(Path(path), os.stat(path)) == key
+        except FileNotFoundError:
+            # gone from a directory that's still there - but a card that's been taken out may come back
+            return not os.path.isdir(os.path.dirname(path))
+        except OSError:
+            return True
+
+    def _read(self) -> Dict[str, dict]:
+        try:
+            with open(self.location) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            log(f"Ignoring unreadable ffprobe cache {self.location} - {e}")
+        return {}
+
+    def _loaded(self) -> Dict[str, dict]:
+        if self.probes is None:
+            self.probes = self._read()
+        return self.probes
+
+    def get(self, key: str) -> Optional[dict]:
+        with self.lock:
+            return self._loaded().get(key, None)
+
+    def put(self, key: str, probe: dict):
+        with self.lock:
+            self._loaded()[key] = probe
+            self.pending[key] = probe
+            if self.batches == 0:
+                self._save()
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Puts made inside are saved once, when the (outermost) batch ends"""
+        with self.lock:
+            self.batches += 1
+        try:
+            yield self
+        finally:
+            with self.lock:
+                self.batches -= 1
+                if self.batches == 0:
+                    self._save()
+
+    def _save(self):
+        if self.location is None or not self.pending:
+            self.pending = {}
+            return
+
+        pending, self.pending = self.pending, {}
+        saved = self._read()
+        superseded = {key.rsplit("|", 2)[0] for key in pending}
+
+        probes = {
+            key: probe for key, probe in saved.items()
+            if key not in pending and key.rsplit("|", 2)[0] not in superseded and self._current(key)
+        }
+        probes.update(pending)
+
+        try:
+            temp = self.location.with_name(f".{self.location.name}.{os.getpid()}.{threading.get_ident()}")
+            with open(temp, "w") as f:
+                json.dump(probes, f)
+            os.replace(temp, self.location)
+        except OSError as e:
+            log(f"Unable to save ffprobe cache {self.location} - {e}")
+
+        self.probes = {**self.probes, **probes}
+
+
 class FFMPEGGoPro:
 
-    def __init__(self, exe: FFMPEG):
+    def __init__(self, exe: FFMPEG, probes: Optional[ProbeCache] = None):
         self.exe = exe
+        self.probes = probes if probes is not None else ProbeCache()
 
     def join_files(self, filepaths, output):
         """only for joining parts of same trip"""
@@ -50,6 +171,11 @@ class FFMPEGGoPro:
             )
 
     def find_frame_duration(self, filepath, data_stream_number):
+        try:
+            return mp4.find_track(filepath, data_stream_number, b"gpmd").frame_duration()
+        except (IOError, ValueError):
+            pass
+
         ffprobe_output = str(self.exe.ffprobe().invoke(
             ["-hide_banner",
              "-print_format", "json",
@@ -66,7 +192,7 @@ class FFMPEGGoPro:
 
         return duration
 
-    def find_recording(self, filepath: Path, stat=os.stat) -> GoproRecording:
+    def _probe(self, filepath: Path) -> dict:
         ffprobe_output = str(self.exe.ffprobe().invoke(
             [
                 "-hide_banner",
@@ -76,27 +202,26 @@ class FFMPEGGoPro:
             ]
         ).stdout)
 
-        ffprobe_json = json.loads(ffprobe_output)
+        streams = json.loads(ffprobe_output)["streams"]
+
+        data = _only_if_present("metadata stream", streams, _data_selector)
 
-        video_selector = lambda s: s["codec_type"] == "video" and s["disposition"]["default"] == 1
-        audio_selector = lambda s: s["codec_type"] == "audio"
-        data_selector = lambda s: s["codec_type"] == "data" and s["codec_tag_string"] == "gpmd"
+        return {
+            "streams": streams,
+            "frame_duration": self.find_frame_duration(filepath, int(data["index"])) if data else None
+        }
 
-        def first_and_only(what, l, p):
-            matches = list(filter(p, l))
-            if not matches:
-                raise IOError(f"Unable to find {what} in ffprobe output")
-            if len(matches) > 1:
-                raise IOError(f"Multiple matching streams for {what} in ffprobe output")
-            return matches[0]
+    def find_recording(self, filepath: Path, stat=os.stat) -> GoproRecording:
+        sr = stat(filepath)
 
-        def only_if_present(what, l, p):
-            matches = list(filter(p, l))
-            if matches:
-                return first_and_only(what, l, p)
+        key = ProbeCache.key(filepath, sr)
+        probe = self.probes.get(key)
+        if probe is None:
+            probe = self._probe(filepath)
+            self.probes.put(key, probe)
 
-        streams = ffprobe_json["streams"]
-        video = first_and_only("video stream", streams, video_selector)
+        streams = probe["streams"]
+        video = _first_and_only("video stream", streams, _video_selector)
 
         avg_frame_rate_fraction = video["avg_frame_rate"].split("/")
         video_stream = VideoStream(
@@ -108,21 +233,19 @@ class FFMPEGGoPro:
             frame_rate_denominator=int(avg_frame_rate_fraction[1]),
         )
 
-        audio = only_if_present("audio stream", streams, audio_selector)
+        audio = _only_if_present("audio stream", streams, _audio_selector)
         audio_stream = None
         if audio:
             audio_stream = AudioStream(stream=int(audio["index"]))
 
-        data = only_if_present("metadata stream", streams, data_selector)
+        data = _only_if_present("metadata stream", streams, _data_selector)
 
         if data:
-            data_stream_number = int(data["index"])
-
             data_stream = DataStream(
-                stream=data_stream_number,
+                stream=int(data["index"]),
                 frame_count=int(data["nb_frames"]),
                 timebase=int(data["time_base"].split("/")[1]),
-                frame_duration=self.find_frame_duration(filepath, data_stream_number)
+                frame_duration=probe["frame_duration"]
             )
         else:
             data_stream = None
@@ -130,12 +253,17 @@ class FFMPEGGoPro:
         return GoproRecording(
             ffmpeg=self.exe,
             location=filepath,
-            file=filestat(filepath, stat=stat),
+            file=_filestat_of(sr),
             audio=audio_stream,
             video=video_stream,
             data=data_stream
         )
 
+    def find_recordings(self, filepaths: List[Path], workers: int = 8) -> List[GoproRecording]:
+        """find_recording for many files, running a few ffprobes at once - saving what they said just once"""
+        with self.probes.batch(), ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            return list(pool.map(self.find_recording, filepaths))
+
     def load_frame(self, filepath: Path, at_time: Timeunit) -> Optional[bytes]:
         if filepath.exists():
             cmd = ["-hide_banner",
@@ -183,8 +311,10 @@ class FileStat:
 
 
 def filestat(filepath: Path, stat=os.stat) -> FileStat:
-    sr = stat(filepath)
+    return _filestat_of(stat(filepath))
+
 
+def _filestat_of(sr: os.stat_result) -> FileStat:
     return FileStat(
         length=sr.st_size,
         ctime=datetime.datetime.fromtimestamp(sr.st_ctime, tz=datetime.timezone.utc),
@@ -202,9 +332,14 @@ class GoproRecording:
     video: VideoStream
     data: Optional[DataStream]
 
-    def load_data(self) -> bytes:
+    def load_data(self) -> bytearray:
         track = self.data.stream
         if track:
+            try:
+                return mp4.read_track(self.location, mp4.find_track(self.location, track, b"gpmd"), workers=4)
+            except (IOError, ValueError):
+                pass
+
             cmd = [
                 "-hide_banner",
                 '-y',
@@ -227,7 +362,7 @@ class GoproRecording:
                 result = self.ffmpeg.stream(cmd, cb=update, timeout=datetime.timedelta(seconds=45))
                 if result != 0:
                     raise IOError(f"ffmpeg failed code: {result}")
-                return bytes(arr)
+                return arr
             finally:
                 progress.complete()
 
@@ -3,11 +3,15 @@ from __future__ import annotations
 import contextlib
 import datetime
 from pathlib import Path
+from typing import List
 
+from gopro_overlay.common import temporary_file
 from gopro_overlay.dimensions import Dimension
 from gopro_overlay.execution import InProcessExecution
 from gopro_overlay.ffmpeg import FFMPEG
 from gopro_overlay.functional import flatten
+from gopro_overlay.log import log
+from gopro_overlay.matroska import UnchangedFrameSkippingWriter
 
 
 class FFMPEGOptions:
@@ -25,6 +29,31 @@ class FFMPEGOptions:
         self.output = options
 
 
+def raw_input_options(overlay_size: Dimension, skip_unchanged: bool):
+    if skip_unchanged:
+        # size, pixel format and timestamps are in the stream
+        return ["-f", "matroska", "-i", "-"]
+    return [
+        "-f", "rawvideo",
+        "-framerate", "10.0",
+        "-s", f"{overlay_size.x}x{overlay_size.y}",
+        "-pix_fmt", "rgba",
+        "-i", "-",
+    ]
+
+
+@contextlib.contextmanager
+def frame_writer(exe: FFMPEG, execution, cmd, overlay_size: Dimension, skip_unchanged: bool):
+    with contextlib.contextmanager(exe.execute)(execution, cmd) as stream:
+        if skip_unchanged:
+            writer = UnchangedFrameSkippingWriter(stream, overlay_size)
+            yield writer
+            writer.finish()
+            log(writer)
+        else:
+            yield stream
+
+
 class FFMPEGNull:
 
     def __init__(self):
@@ -44,7 +73,8 @@ class FFMPEGOverlay:
             overlay_size: Dimension,
             options: FFMPEGOptions = None,
             execution=None,
-            creation_time: datetime.datetime = None
+            creation_time: datetime.datetime = None,
+            skip_unchanged: bool = False
     ):
         self.exe = ffmpeg
         self.output = output
@@ -52,6 +82,7 @@ class FFMPEGOverlay:
         self.creation_time = creation_time if creation_time else datetime.datetime.now()
         self.execution = execution if execution else InProcessExecution()
         self.options = options if options else FFMPEGOptions()
+        self.skip_unchanged = skip_unchanged
 
     @contextlib.contextmanager
     def generate(self):
@@ -59,18 +90,15 @@ class FFMPEGOverlay:
             "-hide_banner",
             "-y",
             self.options.general,
-            "-f", "rawvideo",
-            "-framerate", "10.0",
-            "-s", f"{self.overlay_size.x}x{self.overlay_size.y}",
-            "-pix_fmt", "rgba",
-            "-i", "-",
+            raw_input_options(self.overlay_size, self.skip_unchanged),
             "-r", "30",
             self.options.output,
             "-metadata", f"creation_time={self.creation_time.isoformat()}",
             str(self.output)
         ])
 
-        yield from self.exe.execute(self.execution, cmd)
+        with frame_writer(self.exe, self.execution, cmd, self.overlay_size, self.skip_unchanged) as writer:
+            yield writer
 
 
 class FFMPEGOverlayVideo:
@@ -83,7 +111,8 @@ class FFMPEGOverlayVideo:
             overlay_size: Dimension,
             options: FFMPEGOptions = None,
             execution=None,
-            creation_time: datetime.datetime = None
+            creation_time: datetime.datetime = None,
+            skip_unchanged: bool = False
     ):
         self.exe = ffmpeg
         self.output = output
@@ -92,6 +121,7 @@ class FFMPEGOverlayVideo:
         self.overlay_size = overlay_size
         self.creation_time = creation_time if creation_time else datetime.datetime.now()
         self.execution = execution if execution else InProcessExecution()
+        self.skip_unchanged = skip_unchanged
 
     @contextlib.contextmanager
     def generate(self):
@@ -100,18 +130,92 @@ class FFMPEGOverlayVideo:
             self.options.general,
             self.options.input,
             "-i", str(self.input),
+            raw_input_options(self.overlay_size, self.skip_unchanged),
+            "-filter_complex", self.options.filter_complex,
+            self.options.output,
+            "-metadata", f"creation_time={self.creation_time.isoformat()}",
+            str(self.output)
+        ])
+
+        with frame_writer(self.exe, self.execution, cmd, self.overlay_size, self.skip_unchanged) as writer:
+            yield writer
+
+
+class FFMPEGSegment:
+    """Write one part of a segmented render to a lossless intermediate file, with alpha, to be joined later"""
+
+    def __init__(self, ffmpeg: FFMPEG, output: Path, overlay_size: Dimension, execution=None):
+        self.exe = ffmpeg
+        self.output = output
+        self.overlay_size = overlay_size
+        self.execution = execution if execution else InProcessExecution()
+
+    @contextlib.contextmanager
+    def generate(self):
+        cmd = flatten([
+            "-hide_banner",
+            "-y",
+            "-loglevel", "info",
             "-f", "rawvideo",
             "-framerate", "10.0",
             "-s", f"{self.overlay_size.x}x{self.overlay_size.y}",
             "-pix_fmt", "rgba",
             "-i", "-",
+            "-vcodec", "qtrle",
+            str(self.output)
+        ])
+
+        yield from self.exe.execute(self.execution, cmd)
+
+
+class FFMPEGJoinSegments:
+    """Join segments created by FFMPEGSegment, optionally overlaying them onto the input video"""
+
+    def __init__(
+            self,
+            ffmpeg: FFMPEG,
+            output: Path,
+            input: Path = None,
+            options: FFMPEGOptions = None,
+            creation_time: datetime.datetime = None
+    ):
+        self.exe = ffmpeg
+        self.output = output
+        self.input = input
+        self.options = options if options else FFMPEGOptions()
+        self.creation_time = creation_time if creation_time else datetime.datetime.now()
+
+    def command(self, segment_list: Path):
+        segments = ["-f", "concat", "-safe", "0", "-i", str(segment_list)]
+
+        if self.input is None:
+            return flatten([
+                "-hide_banner",
+                "-y",
+                self.options.general,
+                segments,
+                "-r", "30",
+                self.options.output,
+                "-metadata", f"creation_time={self.creation_time.isoformat()}",
+                str(self.output)
+            ])
+
+        return flatten([
+            "-y",
+            self.options.general,
+            self.options.input,
+            "-i", str(self.input),
+            segments,
             "-filter_complex", self.options.filter_complex,
             self.options.output,
             "-metadata", f"creation_time={self.creation_time.isoformat()}",
             str(self.output)
         ])
 
-        yield from self.exe.execute(
-            self.execution,
-            cmd
-        )
+    def join(self, segments: List[Path]):
+        with temporary_file(suffix=".txt") as segment_list:
+            with open(segment_list, "w") as f:
+                for segment in segments:
+                    f.write(f"file '{segment.absolute()}'\n")
+
+            self.exe.run(self.command(Path(segment_list)))
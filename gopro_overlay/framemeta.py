@@ -1,8 +1,11 @@
-import bisect
 import datetime
+import math
 from datetime import timedelta
-from typing import Callable, List, MutableMapping
+from typing import Callable, List, Dict, Optional, Mapping
 
+import numpy as np
+
+from gopro_overlay.columns import ColumnStore, EntryView
 from gopro_overlay.entry import Entry
 from gopro_overlay.log import log
 from gopro_overlay.timeunits import Timeunit, timeunits
@@ -24,9 +27,18 @@ def find_best_alignment(duration: Timeunit, samples: int):
 
 
 class Window:
+    """A moving view of `samples` values, spaced evenly over `duration`, around a given time.
+
+    Samples are kept in a ring, by the time they were taken, so when the view moves along, only the samples that
+    have newly come into view need to be fetched - the ring holds a bit more than one view, so memory stays bounded.
+
+    Times are handled inside as integer microseconds - view_at() takes them that way too, for callers that have them.
+    """
 
     def __init__(self, ts, duration: Timeunit, samples, key=lambda e: 1, missing=None):
         self.ts = ts
+        # newly needed samples are (mostly) later than the last ones
+        self.cursor = ts.cursor() if hasattr(ts, "cursor") else None
         self.duration = duration
         self.samples = samples
         alignment = find_best_alignment(duration, samples)
@@ -36,39 +48,60 @@ class Window:
 
         self.last_time = None
         self.last_view = None
-        self.cache = {}
         self.version = 0
 
+        self._tick_us = self.tick.us
+        self._half_us = (duration / 2).us
+
+        # all sample times are the same distance from a multiple of this, so it can number the ring slots
+        self.spacing = math.gcd(self.tick.us, timeunits(millis=100).us, (duration / 2).us)
+        slots = (duration.us + 2 * self.tick.us) // self.spacing + 1
+        self.ring_times = [None] * slots
+        self.ring_values = [None] * slots
+
     def view(self, at: Timeunit):
+        return self.view_at(at.us)
 
-        if self.last_time is not None and abs(at - self.last_time) < self.tick:
+    def view_at(self, us: int):
+        """As view(), given the time in microseconds"""
+        last = self.last_time
+        if last is not None and abs(us - last) < self._tick_us:
             return self.last_view
 
-        return self._view_recalc(at)
+        return self._view_recalc(us)
 
-    def _view_recalc(self, at: Timeunit):
+    def _entry(self, us: int) -> Entry:
+        if self.cursor is not None:
+            return self.cursor.at(us)
+        return self.ts.get(Timeunit(us))
 
-        at = at.align(timeunits(millis=100))
+    def _sample(self, us: int, slot: int):
+        value = self.key(self._entry(us))
+        if value is None:
+            value = self.missing
 
-        start = at - self.duration / 2
-        end = at + self.duration / 2
+        self.ring_times[slot] = us
+        self.ring_values[slot] = value
+        return value
 
-        current = start
+    def _view_recalc(self, us: int):
+        at = (us // 100_000) * 100_000
 
-        data = []
+        start = at - self._half_us
+        end = at + self._half_us
+
+        ts_min, ts_max = self.ts.min.us, self.ts.max.us
+        missing = self.missing
+        spacing, ring_times, ring_values = self.spacing, self.ring_times, self.ring_values
+        slots = len(ring_times)
 
-        while current < end:
-            if current < self.ts.min or current > self.ts.max:
-                data.append(self.missing)
+        data = []
+        for t in range(start, end, self._tick_us):
+            if t < ts_min or t > ts_max:
+                data.append(missing)
             else:
-                entry = self.cache[current] if current in self.cache else self.cache.setdefault(current,
-                                                                                                self.ts.get(current))
-                value = self.key(entry)
-                if value is not None:
-                    data.append(value)
-                else:
-                    data.append(self.missing)
-            current += self.tick
+                slot = (t // spacing) % slots
+                data.append(ring_values[slot] if ring_times[slot] == t else self._sample(t, slot))
 
         self.version += 1
         self.last_time = at
@@ -84,34 +117,145 @@ class Stepper:
         self._step = step
 
     def __len__(self):
-        max_ms = self._framemeta.framelist[-1]
-        steps = int(max_ms / self._step) + 1
-        return steps
+        return len(self.micros())
+
+    def micros(self) -> range:
+        """The times of the steps, in microseconds"""
+        return range(0, self._framemeta.max.us + 1, self._step.us)
 
     def steps(self):
-        end = self._framemeta.framelist[-1]
-        running = timeunits(millis=0)
-        while running <= end:
-            yield running
-            running += self._step
+        for us in self.micros():
+            yield Timeunit(us)
 
 
 max_distance = timeunits(seconds=6)
 
 
+class Cursor:
+    """Reads a FrameMeta at times that mostly move forwards, as the frames of a video do.
+
+    Each read starts from where the last one was, so moving on a frame is a step or two along the times, rather than
+    a search of all of them - going backwards, or a long way forwards, is a binary search."""
+
+    # steps forward to try before searching
+    lookahead = 8
+
+    def __init__(self, framemeta: 'FrameMeta'):
+        self._framemeta = framemeta
+        self._store = None
+        self._times: List[int] = []
+        self._row = 0
+
+    def _sync(self):
+        framemeta = self._framemeta
+        framemeta.check_modified()
+        if framemeta.store is not self._store:
+            self._store = framemeta.store
+            self._times = self._store.times.tolist()
+            self._row = 0
+
+    def _seek(self, us: int) -> int:
+        """The row the time would go in, as searchsorted would say"""
+        times = self._times
+        row = self._row
+
+        if row > 0 and times[row - 1] >= us:
+            row = int(np.searchsorted(self._store.times, us))
+        else:
+            end = min(row + self.lookahead, len(times))
+            while row < end and times[row] < us:
+                row += 1
+            if row == end and row < len(times) and times[row] < us:
+                row = int(np.searchsorted(self._store.times, us))
+
+        self._row = row
+        return row
+
+    def get(self, frame_time: Timeunit) -> Entry:
+        """As FrameMeta.get"""
+        return self.at(frame_time.us)
+
+    def at(self, us: int) -> Entry:
+        """As get(), given the frame time in microseconds"""
+        self._sync()
+        row = self._seek(us)
+        times = self._times
+
+        # the usual cases, without going back to the framemeta
+        if row < len(times):
+            if times[row] == us:
+                return EntryView(self._store, row)
+            if row > 0 and us - times[row - 1] <= max_distance.us:
+                return EntryView(self._store, row - 1)
+
+        return self._framemeta._entry(us, row)
+
+    def interpolated(self, frame_time: Timeunit) -> Entry:
+        """The entry at the frame time, with values in between those of the entries either side of it"""
+        self._sync()
+        us = frame_time.us
+        row = self._seek(us)
+        times = self._times
+
+        if row == 0 or row == len(times) or times[row] == us:
+            return self._framemeta._entry(us, row)
+
+        before, after = times[row - 1], times[row]
+        return self._store.interpolated(row - 1, row, (us - before) / (after - before))
+
+
+class Frames(Mapping):
+    """Entries of a FrameMeta, by frame time"""
+
+    def __init__(self, framemeta: 'FrameMeta'):
+        self._framemeta = framemeta
+
+    def __getitem__(self, item: Timeunit) -> Entry:
+        row = self._framemeta._row_of(item)
+        if row is None:
+            raise KeyError(item)
+        return self._framemeta[row]
+
+    def __iter__(self):
+        return iter(self._framemeta.framelist)
+
+    def __len__(self):
+        return len(self._framemeta)
+
+
 class FrameMeta:
+    """Metadata entries, by frame time.
+
+    Entries are added as Entry objects, but stored column by column - each metric in a single array, with its units
+    held once - entries are read back (and updated) through views onto a row.
+    """
+
     def __init__(self, packets_per_second=18):
         self.modified = False
         self.pps = packets_per_second
-        self.framelist: List[Timeunit] = []
-        self.frames: MutableMapping[Timeunit, Entry] = {}
+        self.pending: Dict[int, Entry] = {}
+        self.store = ColumnStore.empty()
 
     def __len__(self):
         self.check_modified()
-        return len(self.framelist)
+        return len(self.store)
 
-    def __getitem__(self, item):
-        return self.frames[self.framelist[item]]
+    def __getitem__(self, item) -> Entry:
+        self.check_modified()
+        if item < 0:
+            item += len(self.store)
+        if not 0 <= item < len(self.store):
+            raise IndexError(item)
+        return EntryView(self.store, item)
+
+    @property
+    def frames(self) -> Mapping[Timeunit, Entry]:
+        return Frames(self)
+
+    @property
+    def framelist(self) -> List[Timeunit]:
+        self.check_modified()
+        return [Timeunit(us) for us in self.store.times.tolist()]
 
     def packets_per_second(self):
         return self.pps
@@ -121,12 +265,13 @@ class FrameMeta:
         return Stepper(self, step)
 
     def add(self, at_time: Timeunit, entry):
-        self.frames[at_time] = entry
+        self.pending[at_time.us] = entry
         self.modified = True
 
     def clone(self) -> 'FrameMeta':
-        fm = FrameMeta()
-        [fm.add(t, e) for t, e in self.frames.items()]
+        self.check_modified()
+        fm = FrameMeta(packets_per_second=self.pps)
+        fm.store = self.store.take(np.arange(len(self.store)))
         return fm
 
     def date_at(self, t: Timeunit) -> datetime.datetime:
@@ -135,63 +280,79 @@ class FrameMeta:
     @property
     def min(self) -> Timeunit:
         self.check_modified()
-        return self.framelist[0]
+        return Timeunit(self.store.times[0])
 
     @property
     def max(self) -> Timeunit:
         self.check_modified()
-        return self.framelist[-1]
+        return Timeunit(self.store.times[-1])
 
     @property
     def mid(self):
         return self.min + ((self.max - self.min) / 2)
 
     def _update(self):
-        self.framelist = sorted(list(self.frames.keys()))
+        if self.pending:
+            added = ColumnStore.from_entries(list(self.pending.keys()), list(self.pending.values()))
+            self.store = self.store.merged(added)
+            self.pending = {}
         self.modified = False
 
     def check_modified(self):
         if self.modified:
             self._update()
 
-    def get(self, frame_time: Timeunit) -> Entry:
+    def _row_of(self, frame_time: Timeunit) -> Optional[int]:
         self.check_modified()
+        row = int(np.searchsorted(self.store.times, frame_time.us))
+        if row < len(self.store) and self.store.times[row] == frame_time.us:
+            return row
+        return None
 
-        if frame_time in self.frames:
-            return self.frames[frame_time]
+    def get(self, frame_time: Timeunit) -> Entry:
+        self.check_modified()
+        return self._entry(frame_time.us, int(np.searchsorted(self.store.times, frame_time.us)))
 
-        return self._get_closest(frame_time)
+    def _entry(self, us: int, row: int) -> Entry:
+        """The entry for a frame time, given the row that the time would go in, as searchsorted would say"""
+        times = self.store.times
 
-    def _get_closest(self, frame_time) -> Entry:
+        if row < len(times) and times[row] == us:
+            return EntryView(self.store, row)
 
-        if frame_time < self.min:
-            log(f"Request for data at time {frame_time}, before start of metadata, returning first item")
-            return self.frames[self.framelist[0]]
+        if row == 0:
+            log(f"Request for data at time {Timeunit(us)}, before start of metadata, returning first item")
+            return self[0]
 
-        if frame_time > self.max:
-            log(f"Request for data at time {frame_time}, after end of metadata, returning last item")
-            return self.frames[self.framelist[-1]]
+        if row == len(times):
+            log(f"Request for data at time {Timeunit(us)}, after end of metadata, returning last item")
+            return self[-1]
 
-        later_idx = bisect.bisect_left(self.framelist, frame_time)
-        earlier_idx = later_idx - 1
+        delta = us - int(times[row - 1])
 
-        earlier_time = self.framelist[earlier_idx]
-        earlier_item = self.frames[earlier_time]
+        if delta > max_distance.us:
+            log(f"Closest item to wanted time {Timeunit(us)} is {Timeunit(delta)} away")
 
-        delta = frame_time - earlier_time
+        return self[row - 1]
 
-        if delta > max_distance:
-            log(f"Closest item to wanted time {frame_time} is {delta} away")
+    def cursor(self) -> 'Cursor':
+        return Cursor(self)
 
-        return earlier_item
+    def resampled(self, step: Timeunit) -> 'FrameMeta':
+        """A FrameMeta with an entry at every step of stepper(step), each interpolated between the entries either
+        side of it (where they're close enough), so a frame is drawn from its own entry, rather than the one before"""
+        self.check_modified()
+        fm = FrameMeta(packets_per_second=self.pps)
+        fm.store = self.store.resampled(np.arange(0, self.max.us + 1, step.us, dtype=np.int64), max_distance.us)
+        return fm
 
     def items(self, step: timedelta = timedelta(seconds=0)):
         self.check_modified()
 
         last_dt = datetime.datetime(year=1900, month=1, day=1, tzinfo=datetime.timezone.utc)
 
-        for pts in self.framelist:
-            entry = self.frames[pts]
+        for row in range(len(self.store)):
+            entry = EntryView(self.store, row)
             entry_dt = entry.dt
 
             if entry_dt >= last_dt + step:
@@ -199,39 +360,33 @@ class FrameMeta:
 
                 yield entry
 
-    def process_deltas(self, processor, skip=1, filter_fn: Callable[[Entry], bool] = lambda e: True):
+    def _pairs(self, skip):
         self.check_modified()
-        diffs = list(zip(self.framelist, self.framelist[skip:]))
+        for row in range(len(self.store) - skip):
+            yield EntryView(self.store, row), EntryView(self.store, row + skip)
 
-        for a, b in diffs:
-            entry_a = self.frames[a]
-            entry_b = self.frames[b]
+    def process_deltas(self, processor, skip=1, filter_fn: Callable[[Entry], bool] = lambda e: True):
+        for entry_a, entry_b in self._pairs(skip):
             if filter_fn(entry_a) and filter_fn(entry_b):
                 updates = processor(entry_a, entry_b, skip)
                 if updates:
                     entry_a.update(**updates)
 
     def process_accel(self, processor, skip=1, filter_fn: Callable[[Entry], bool] = lambda e: True):
-        self.check_modified()
-        diffs = list(zip(self.framelist, self.framelist[skip:]))
-
-        for a, b in diffs:
-            entry_a = self.frames[a]
-            entry_b = self.frames[b]
+        for entry_a, entry_b in self._pairs(skip):
             if filter_fn(entry_a) and filter_fn(entry_b):
                 updates = processor(entry_a, entry_b, skip)
                 if updates:
                     entry_b.update(**updates)
-    
+
     def process(self, processor, filter_fn: Callable[[Entry], bool] = lambda e: True):
         self.check_modified()
-        for pts in self.framelist:
-            entry = self.frames[pts]
+        for row in range(len(self.store)):
+            entry = EntryView(self.store, row)
             if filter_fn(entry):
                 updates = processor(entry)
                 if updates:
                     entry.update(**updates)
 
     def duration(self):
-        self.check_modified()
-        return self.framelist[-1]
+        return self.max
@@ -2,17 +2,17 @@ import contextlib
 import itertools
 import os
 import pathlib
-from functools import partial
-from typing import Optional, Tuple, List, Dict
+from typing import Optional, Tuple, List, Dict, Iterable
 
 import geotiler
-from geotiler.cache import caching_downloader
+from geotiler.map import Tile
 from geotiler.provider import MapProvider
 from geotiler.tile.io import fetch_tiles
-from sqlitedict import SqliteDict
+from PIL.Image import Image
 
 from gopro_overlay.config import Config
-from gopro_overlay.geo_render import my_render_map
+from gopro_overlay.geo_render import my_render_map, cache, TileKey, ImageTileCache, render_tiles
+from gopro_overlay.tile_store import TileStore
 
 
 class PrefixMapStyleConfig:
@@ -181,32 +181,60 @@ def attrs_for_style(name):
     raise KeyError(f"Unknown map style: {name}")
 
 
-def sqlite_downloader(db: SqliteDict):
-    def get_key(key):
-        return db.get(key, None)
+def store_downloader(store: TileStore, style: str, batch: int = 64):
+    """Tiles from the store, where it has them, fetching the rest, and storing them (batch at a time) as they come.
 
-    def set_key(key, value):
-        if value:
-            db.setdefault(key, value)
+    The tiles' offsets are their keys, as given by render_tiles and prefetch"""
 
-    return partial(caching_downloader, get_key, set_key, fetch_tiles)
+    async def download(tiles: List[Tile], num_workers: int, **kwargs):
+        tiles = list(tiles)
+        stored = store.get_many(style, [t.offset for t in tiles])
 
+        for t in tiles:
+            if t.offset in stored:
+                yield t._replace(img=stored[t.offset])
 
-def sqlite_caching_renderer(provider: MapProvider, db: SqliteDict):
-    def render(map, tiles=None, **kwargs):
-        map.provider = provider
-        return my_render_map(map, tiles, downloader=sqlite_downloader(db), **kwargs)
+        fetched = []
+        async for t in fetch_tiles([t for t in tiles if t.offset not in stored], num_workers, **kwargs):
+            if t.img:
+                fetched.append((t.offset, t.img))
+                if len(fetched) >= batch:
+                    store.put_many(style, fetched)
+                    fetched = []
+            yield t
 
-    return render
+        store.put_many(style, fetched)
 
+    return download
 
-def memory_caching_renderer(provider: MapProvider):
-    def render(map, tiles=None, **kwargs):
-        map.provider = provider
 
-        return my_render_map(map, tiles, downloader=fetch_tiles)
+class TileRenderer:
+    """Renders maps from tiles fetched by the downloader - and can fetch the tiles for a whole route beforehand"""
 
-    return render
+    def __init__(self, provider: MapProvider, downloader, image_cache: ImageTileCache = cache):
+        self.provider = provider
+        self.downloader = downloader
+        self.image_cache = image_cache
+
+    def __call__(self, map, tiles=None, **kwargs):
+        map.provider = self.provider
+        return my_render_map(map, tiles, downloader=self.downloader, image_cache=self.image_cache, **kwargs)
+
+    def tiles(self, zoom: int, coords: List[Tuple[int, int]]) -> Dict[Tuple[int, int], Image]:
+        return render_tiles(self.provider, self.downloader, self.image_cache, zoom, coords)
+
+    def prefetch(self, tiles: Iterable[TileKey]) -> int:
+        return self.image_cache.prefetch(self.provider, self.downloader, tiles,
+                                         num_workers=max(1, self.provider.limit))
+
+
+def store_caching_renderer(provider: MapProvider, store: TileStore, style: str,
+                           image_cache: ImageTileCache = cache) -> TileRenderer:
+    return TileRenderer(provider, store_downloader(store, style), image_cache)
+
+
+def memory_caching_renderer(provider: MapProvider, image_cache: ImageTileCache = cache) -> TileRenderer:
+    return TileRenderer(provider, fetch_tiles, image_cache)
 
 
 class NullKeyFinder:
@@ -295,9 +323,12 @@ class MapStyler:
 
 class MapRenderer:
 
-    def __init__(self, cache_dir: pathlib.Path, styler: MapStyler):
+    def __init__(self, cache_dir: pathlib.Path, styler: MapStyler, image_cache: ImageTileCache = cache,
+                 store_size: Optional[int] = None):
         self.cache_dir = cache_dir
         self.styler = styler
+        self.image_cache = image_cache
+        self.store_size = store_size
 
     @contextlib.contextmanager
     def open(self, style: str = "osm"):
@@ -307,10 +338,7 @@ class MapRenderer:
         map = MapProvider(attrs, key)
 
         if attrs.get("cache", True):
-            with SqliteDict(
-                    filename=str(self.cache_dir.joinpath("tilecache.sqlite")),
-                    autocommit=True
-            ) as db:
-                yield sqlite_caching_renderer(map, db)
+            with TileStore(self.cache_dir.joinpath("tilestore.sqlite"), max_size=self.store_size) as store:
+                yield store_caching_renderer(map, store, style, self.image_cache)
         else:
-            yield memory_caching_renderer(map)
+            yield memory_caching_renderer(map, self.image_cache)
@@ -1,11 +1,14 @@
 import asyncio
 import io
 import itertools
-from typing import List
+from collections import OrderedDict
+from typing import List, Tuple, Iterable, Set, Optional, Callable, Any, Dict
 
 import PIL
+import numpy as np
 from PIL.Image import Image
 from geotiler.map import _find_top_left_tile, _tile_coords, _tile_offsets, Tile
+from geotiler.provider import MapProvider
 from geotiler.tile.img import _error_image
 
 from gopro_overlay.log import log
@@ -14,81 +17,290 @@ from gopro_overlay.log import log
 # Attempt at re-implementing the rendering part of geotiler with a view on performance
 # Use downloader as per geotiler
 
+# zoom, x, y
+TileKey = Tuple[int, int, int]
+
+
+def tile_url(provider: MapProvider, coord: Tuple[int, int], zoom: int) -> str:
+    # geotiler cycles through the subdomains, so the same tile gets a different url (and cache key) each time
+    subdomains = provider.subdomains or ("",)
+    return provider.url.format(
+        subdomain=subdomains[(coord[0] + coord[1]) % len(subdomains)],
+        x=coord[0], y=coord[1], z=zoom,
+        ext=provider.extension,
+        api_key=provider.api_key,
+    )
+
+
+def map_tiles(map) -> Set[TileKey]:
+    """The tiles that rendering this map will use"""
+    coord, offset = _find_top_left_tile(map)
+    return {(map.zoom, x, y) for x, y in _tile_coords(map, coord, offset)}
+
+
+def tiles_around(lons: np.ndarray, lats: np.ndarray, zoom: int, size: int, tile_size: int = 256,
+                 margin: int = 0) -> Set[TileKey]:
+    """The tiles of square maps, size pixels across, centred on each of the locations (and margin tiles more)"""
+    scale = (2 ** zoom) * tile_size
+    x = (lons + 180.0) / 360.0 * scale
+    y = (1.0 - np.arcsinh(np.tan(np.radians(lats))) / np.pi) / 2.0 * scale
+
+    half = size / 2
+    ranges = np.unique(np.stack([
+        np.floor((x - half) / tile_size), np.floor((x + half) / tile_size),
+        np.floor((y - half) / tile_size), np.floor((y + half) / tile_size),
+    ], axis=1).astype(np.int64), axis=0)
+
+    tiles = set()
+    for x0, x1, y0, y1 in ranges.tolist():
+        tiles.update(
+            (zoom, tx, ty) for tx in range(x0 - margin, x1 + margin + 1) for ty in range(y0 - margin, y1 + margin + 1)
+        )
+    return tiles
+
+
+class BudgetCache:
+    """Least recently used values are dropped once their total size goes over the budget (of bytes)"""
+
+    def __init__(self, budget: int, size: Callable[[Any], int]):
+        self.budget = budget
+        self.size = size
+        self.items = OrderedDict()
+        self.used = 0
+        self.evictions = 0
+
+    def get(self, key):
+        value = self.items.get(key, None)
+        if value is not None:
+            self.items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if key in self.items:
+            self.used -= self.size(self.items.pop(key))
+        self.items[key] = value
+        self.used += self.size(value)
+        while self.used > self.budget and len(self.items) > 1:
+            _, evicted = self.items.popitem(last=False)
+            self.used -= self.size(evicted)
+            self.evictions += 1
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _image_size(image: Image) -> int:
+    return image.width * image.height * len(image.getbands())
+
+
+MB = 1024 * 1024
+
+
 class ImageTileCache:
+    """
+    Decoded tiles, to a budget of bytes, with the least recently used dropped first.
+
+    The compressed tiles (as downloaded) can be kept too, to a budget of their own. They're a fraction of the size,
+    so many more of them fit, and a tile dropped from the decoded cache is decoded again, rather than fetched again.
+    """
+
+    def __init__(self, budget: int = 512 * MB, compressed_budget: Optional[int] = 256 * MB):
+        self.decoded = BudgetCache(budget, _image_size)
+        self.compressed = BudgetCache(compressed_budget, len) if compressed_budget else None
+        self.hits = 0
+        self.decodes = 0
+        self.misses = 0
 
-    def __init__(self):
-        self.cache = {}
+    @property
+    def evictions(self) -> int:
+        return self.decoded.evictions + (self.compressed.evictions if self.compressed is not None else 0)
 
-    async def do_async_download(self, downloader, tiles: List[Tile]):
-        gen = downloader(tiles, 1)
+    def stats(self) -> str:
+        return f"Map tiles: hits={self.hits} decodes={self.decodes} misses={self.misses} " \
+               f"evictions={self.evictions} decoded={len(self.decoded)} ({self.decoded.used // MB}MB)" + \
+            (f" compressed={len(self.compressed)} ({self.compressed.used // MB}MB)" if self.compressed is not None
+             else "")
+
+    async def do_async_download(self, downloader, tiles: List[Tile], num_workers: int = 1):
+        gen = downloader(tiles, num_workers)
         l = []
         async for g in gen:
             l.append(g)
         return l
 
-    def do_download(self, downloader, tiles: List[Tile]) -> List[Tile]:
-        task = self.do_async_download(downloader, tiles)
-        loop = asyncio.get_event_loop()
-        return loop.run_until_complete(task)
+    def do_download(self, downloader, tiles: List[Tile], num_workers: int = 1) -> List[Tile]:
+        # a loop of its own each time - prefetching happens before rendering processes are forked
+        return asyncio.run(self.do_async_download(downloader, tiles, num_workers))
 
     def as_image(self, data):
         f = io.BytesIO(data)
         return PIL.Image.open(f).convert('RGBA')
 
-    def populate(self, downloader, tiles: List[Tile], error_image):
+    def _decode(self, url: str, data: Optional[bytes], error_image) -> Image:
+        if data is None:
+            return error_image
+        try:
+            return self.as_image(data)
+        except OSError as e:
+            # somehow the image data is invalid...
+            log(f"Unable to load image data from {url} - {e}")
+            return error_image
 
-        # Populate image directly for those we know already
-        def c(t):
-            if t.url in self.cache:
-                return t._replace(img=self.cache[t.url])
-            return t
+    def _known(self, url: str, error_image) -> Optional[Image]:
+        image = self.decoded.get(url)
+        if image is not None:
+            self.hits += 1
+            return image
+
+        if self.compressed is not None:
+            data = self.compressed.get(url)
+            if data is not None:
+                self.decodes += 1
+                image = self._decode(url, data, error_image)
+                self.decoded.put(url, image)
+                return image
 
-        tiles = [c(t) for t in tiles]
+        return None
+
+    def _download(self, downloader, tiles: List[Tile], num_workers: int) -> List[Tile]:
+        self.misses += len(tiles)
+        return self.do_download(downloader, tiles, num_workers) if tiles else []
+
+    def populate(self, downloader, tiles: List[Tile], error_image, num_workers: int = 1):
+
+        # Populate image directly for those we know already
+        tiles = [t._replace(img=self._known(t.url, error_image)) for t in tiles]
 
         have = [t for t in tiles if t.img is not None]
         have_not = [t for t in tiles if t.img is None]
 
         # Now use existing download to download
-        downloaded = self.do_download(downloader, have_not)
+        downloaded = self._download(downloader, have_not, num_workers)
 
         converted = []
 
         for d in downloaded:
-            if d.img is None:
-                img = error_image
-            else:
-                try:
-                    img = self.as_image(d.img)
-                except OSError as e:
-                    # somehow the image data is invalid...
-                    log(f"Unable to load image data from {d.url} - {e}")
-                    img = error_image
-
-            self.cache[d.url] = img
+            if d.img is not None and self.compressed is not None:
+                self.compressed.put(d.url, d.img)
+
+            img = self._decode(d.url, d.img, error_image)
+            self.decoded.put(d.url, img)
             converted.append(d._replace(img=img))
 
         return list(itertools.chain(have, converted))
 
+    def prefetch(self, provider: MapProvider, downloader, keys: Iterable[TileKey], num_workers: int) -> int:
+        """Fetch the tiles now, (num_workers connections at a time) so rendering won't wait for them.
+
+        If compressed tiles are kept, they're only decoded when first drawn - otherwise they're decoded now"""
+        urls = {tile_url(provider, (x, y), zoom): (zoom, x, y) for zoom, x, y in keys}
+        wanted = [
+            Tile(url, key, None, None) for url, key in sorted(urls.items())
+            if url not in self.decoded and (self.compressed is None or url not in self.compressed)
+        ]
+
+        if self.compressed is None:
+            self.populate(downloader, wanted, _error_image(provider.tile_width, provider.tile_height), num_workers)
+        else:
+            for d in self._download(downloader, wanted, num_workers):
+                if d.img is not None:
+                    self.compressed.put(d.url, d.img)
+
+        return len(wanted)
+
 
 cache = ImageTileCache()
 
 
-def my_render_map(map, tiles, downloader, **kwargs):
-    tile_url = map.provider.tile_url
+def render_tiles(provider: MapProvider, downloader, image_cache: ImageTileCache, zoom: int,
+                 coords: List[Tuple[int, int]]) -> Dict[Tuple[int, int], Image]:
+    # a tile's offset is its key - so downloaders can store tiles by zoom, x, y rather than by url
+    tiles = [Tile(tile_url(provider, c, zoom), (zoom,) + tuple(c), None, None) for c in coords]
+    tiles = image_cache.populate(downloader, tiles, _error_image(provider.tile_width, provider.tile_height))
+    return {t.offset[1:]: t.img for t in tiles}
 
+
+def map_origin(map) -> Tuple[int, int]:
+    """Where the top left of the map image is, in pixels, at the map's zoom, from the top left of the world"""
     coord, offset = _find_top_left_tile(map)
-    coords = _tile_coords(map, coord, offset)
-    offsets = _tile_offsets(map, offset)
-    urls = (tile_url(c, map.zoom) for c in coords)
-    tiles = list((Tile(u, o, None, None) for u, o in zip(urls, offsets)))
+    return coord[0] * map.provider.tile_width - offset[0], coord[1] * map.provider.tile_height - offset[1]
+
+
+class TileMosaic:
+    """
+    Tiles pasted together around a moving view, optionally with a margin of spare tiles on each side.
+
+    While the view stays inside the mosaic it is just a region of it. When the view moves out, the mosaic moves along,
+    keeping the tiles it already has, and pasting in only those that have come into view. (A margin means it moves
+    less often, but fetches tiles that may never be seen)
+    """
 
+    def __init__(self, tiles: Callable[[int, List[Tuple[int, int]]], Dict[Tuple[int, int], Image]], zoom: int,
+                 margin: int = 0, tile_size: int = 256):
+        self.tiles = tiles
+        self.zoom = zoom
+        self.margin = margin
+        self.tile_size = tile_size
+        self.image = None
+        # first and last (inclusive) tile of the mosaic, across and down
+        self.extent = None
+
+    def _covers(self, extent) -> bool:
+        return self.extent is not None and \
+            self.extent[0] <= extent[0] and self.extent[1] <= extent[1] and \
+            self.extent[2] >= extent[2] and self.extent[3] >= extent[3]
+
+    def _move(self, extent):
+        ts = self.tile_size
+        x0, y0, x1, y1 = extent
+        image = PIL.Image.new("RGBA", ((x1 - x0 + 1) * ts, (y1 - y0 + 1) * ts))
+
+        kept = set()
+        if self.extent is not None:
+            ox0, oy0, ox1, oy1 = self.extent
+            ix0, iy0, ix1, iy1 = max(x0, ox0), max(y0, oy0), min(x1, ox1), min(y1, oy1)
+            if ix0 <= ix1 and iy0 <= iy1:
+                image.paste(
+                    self.image.crop(((ix0 - ox0) * ts, (iy0 - oy0) * ts, (ix1 - ox0 + 1) * ts, (iy1 - oy0 + 1) * ts)),
+                    ((ix0 - x0) * ts, (iy0 - y0) * ts)
+                )
+                kept = {(x, y) for x in range(ix0, ix1 + 1) for y in range(iy0, iy1 + 1)}
+
+        wanted = [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1) if (x, y) not in kept]
+        for (x, y), tile in self.tiles(self.zoom, wanted).items():
+            image.paste(tile, ((x - x0) * ts, (y - y0) * ts))
+
+        self.image = image
+        self.extent = extent
+
+    def view(self, left: int, top: int, size: int) -> Tuple[Image, Tuple[int, int]]:
+        """The mosaic, and where in it a view of size pixels square at left, top (world pixels at the zoom) is"""
+        ts = self.tile_size
+        needed = (left // ts, top // ts, (left + size - 1) // ts, (top + size - 1) // ts)
+
+        if not self._covers(needed):
+            m = self.margin
+            self._move((needed[0] - m, needed[1] - m, needed[2] + m, needed[3] + m))
+
+        return self.image, (left - self.extent[0] * ts, top - self.extent[1] * ts)
+
+
+def my_render_map(map, tiles, downloader, image_cache: Optional[ImageTileCache] = None, **kwargs):
     provider = map.provider
+    image_cache = image_cache if image_cache is not None else cache
+
+    coord, offset = _find_top_left_tile(map)
+    coords = list(_tile_coords(map, coord, offset))
+    offsets = _tile_offsets(map, offset)
 
-    tiles = cache.populate(downloader, tiles, _error_image(provider.tile_width, provider.tile_height))
+    images = render_tiles(provider, downloader, image_cache, map.zoom, coords)
 
     image = PIL.Image.new('RGBA', tuple(map.size))
 
-    for tile in tiles:
-        image.paste(tile.img, tile.offset)
+    for c, o in zip(coords, offsets):
+        image.paste(images[c], o)
 
     return image
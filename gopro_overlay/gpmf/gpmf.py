@@ -1,10 +1,16 @@
 import dataclasses
 import datetime
 import itertools
+import mmap
+import os
 import struct
+from collections.abc import Sequence
 from enum import Enum
+from pathlib import Path
 from typing import List, TypeVar, Optional
 
+import numpy as np
+
 from gopro_overlay.log import log
 from gopro_overlay.timeunits import timeunits
 
@@ -12,24 +18,33 @@ T = TypeVar("T")
 
 
 class GPMD:
+    """GPMF metadata, read in place from a buffer - items are only decoded when a visitor asks for them"""
 
-    def __init__(self, items):
-        self._items = items
+    def __init__(self, data):
+        self._parser = GPMDParser(data)
+        self._headers = list(self._parser.headers())
 
     def __len__(self):
-        return len(self._items)
+        return len(self._headers)
 
     def __getitem__(self, key):
-        return self._items[key]
+        return self._parser.item_at(*self._headers[key])
 
     def accept(self, visitor: T) -> T:
-        for item in self._items:
-            item.accept(visitor)
+        self._parser.accept(visitor)
         return visitor
 
     @staticmethod
-    def parse(data: bytes) -> 'GPMD':
-        return GPMD(list(GPMDParser(data).items()))
+    def parse(data) -> 'GPMD':
+        return GPMD(data)
+
+    @staticmethod
+    def load(path: Path) -> 'GPMD':
+        """Memory-map an extracted data track, rather than reading it all in"""
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return GPMD.parse(b"")
+            return GPMD.parse(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
 
 
 GPMDStruct = struct.Struct('>4sBBH')
@@ -106,7 +121,7 @@ def _interpret_string(item, **kwargs):
 
 
 def _interpret_gps_timestamp(item, **kwargs) -> Optional[datetime.datetime]:
-    date_string = item.rawdata.decode('utf-8', errors='replace')
+    date_string = str(item.rawdata, encoding='utf-8', errors='replace')
     try:
         return datetime.datetime.strptime(
             date_string,
@@ -137,23 +152,72 @@ def _interpret_list(item, **kwargs):
     return _struct_mapping_for(item).unpack_from(item.rawdata)
 
 
-def _interpret_element(item, scale, types=None):
-    if types is None:
-        single = _struct_mapping_for(item, repeat=1)
-        mapping = _struct_mapping_for(item, repeat=item.size // single.size)
-    else:
-        mapping = _struct_mapping_for_type(types)
+numpy_type_mappings = {'L': '>u4',
+                       's': '>i2',
+                       'S': '>u2',
+                       'f': '>f4',
+                       'l': '>i4',
+                       'B': 'u1',
+                       'J': '>u8'
+                       }
 
-    repeat = item.repeat
 
-    if repeat > 1 and len(scale) == 1:
+def _decode_samples(item, types=None) -> np.ndarray:
+    """The unscaled fields of each repeat of an item, decoded all at once, as a (repeat x fields) array"""
+    if types is None:
+        dtype = np.dtype(numpy_type_mappings[item.type_char])
+        fields = item.size // dtype.itemsize
+        if fields * dtype.itemsize == item.size:
+            return np.frombuffer(item.rawdata, dtype=dtype, count=item.repeat * fields).reshape(item.repeat, fields)
+        types = [item.type_char] * fields
+
+    dtypes = [np.dtype(numpy_type_mappings[t]) for t in types]
+    record = np.dtype({
+        "names": [f"f{i}" for i in range(len(dtypes))],
+        "formats": dtypes,
+        "offsets": list(itertools.accumulate([d.itemsize for d in dtypes], initial=0))[:-1],
+        "itemsize": item.size
+    })
+    records = np.frombuffer(item.rawdata, dtype=record, count=item.repeat)
+    return np.column_stack([records[name].astype(np.float64) for name in record.names])
+
+
+def _interpret_array(item, scale, types=None) -> np.ndarray:
+    """The scaled samples of an item, as a (repeat x fields) array of floats"""
+    if item.repeat > 1 and len(scale) == 1:
         scale = list(itertools.repeat(scale[0], item.size))
 
-    def unpack_single(r):
-        unscaled = mapping.unpack_from(item.rawdata[r * item.size: (r + 1) * item.size])
-        return [float(x) / float(y) for x, y in zip(unscaled, scale)]
+    unscaled = _decode_samples(item, types)
+    fields = min(unscaled.shape[1], len(scale))
+    return unscaled[:, :fields].astype(np.float64) / np.array(scale[:fields], dtype=np.float64)
+
 
-    return [unpack_single(r) for r in range(repeat)]
+class Samples(Sequence):
+    """Samples of an item, held as an array, only made into objects (XYZ, VECTOR...) as they're asked for"""
+
+    def __init__(self, array: np.ndarray, kind):
+        self.array = array
+        self.kind = kind
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Samples(self.array[index], self.kind)
+        return self.kind(*self.array[index].tolist())
+
+    def __iter__(self):
+        kind = self.kind
+        for row in self.array.tolist():
+            yield kind(*row)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+
+def _interpret_element(item, scale, types=None):
+    return _interpret_array(item, scale, types).tolist()
 
 
 def _interpret_gps5(item, **kwargs) -> List[GPS5]:
@@ -172,16 +236,16 @@ def _interpret_type(item, **kwargs) -> List[str]:
     return list(_interpret_string(item, **kwargs))
 
 
-def _interpret_xyz(item, **kwargs) -> List[XYZ]:
-    return [XYZ(*it) for it in _interpret_element(item, **kwargs)]
+def _interpret_xyz(item, **kwargs) -> Samples:
+    return Samples(_interpret_array(item, **kwargs), XYZ)
 
 
-def _interpret_vector(item, **kwargs) -> List[VECTOR]:
-    return [VECTOR(*it) for it in _interpret_element(item, **kwargs)]
+def _interpret_vector(item, **kwargs) -> Samples:
+    return Samples(_interpret_array(item, **kwargs), VECTOR)
 
 
-def _interpret_quaternion(item, **kwargs) -> List[QUATERNION]:
-    return [QUATERNION(*it) for it in _interpret_element(item, **kwargs)]
+def _interpret_quaternion(item, **kwargs) -> Samples:
+    return Samples(_interpret_array(item, **kwargs), QUATERNION)
 
 
 def _interpret_gps_lock(item, **kwargs) -> GPSFix:
@@ -233,9 +297,10 @@ def interpret_item(item, **kwargs):
 
 class GPMDContainer:
 
-    def __init__(self, fourcc, size, repeat, padded_length, items):
+    def __init__(self, fourcc, size, repeat, padded_length, parser: 'GPMDParser', start: int):
         self.fourcc = fourcc
-        self.items = items
+        self._parser = parser
+        self._start = start
         self._size = size
         self._repeat = repeat
         self._padded_length = padded_length
@@ -248,8 +313,15 @@ class GPMDContainer:
                f", Length(Bytes): {self._padded_length}" \
                f", Item Types {[i.fourcc for i in self.items]}"
 
+    def _headers(self):
+        return self._parser.headers(self._start, self._start + self._padded_length)
+
     def __len__(self):
-        return len(self.items)
+        return sum(1 for _ in self._headers())
+
+    @property
+    def items(self):
+        return [self._parser.item_at(*header) for header in self._headers()]
 
     @property
     def bytecount(self):
@@ -257,7 +329,7 @@ class GPMDContainer:
 
     @property
     def itemset(self):
-        return set([i.fourcc for i in self.items])
+        return self._parser.contents(self._start, self._start + self._padded_length)
 
     def with_type(self, fourcc):
         return [i for i in self.items if i.fourcc == fourcc]
@@ -269,8 +341,7 @@ class GPMDContainer:
             container_visitor = getattr(visitor, method)(self, self.itemset)
 
             if container_visitor is not None:
-                for i in self.items:
-                    i.accept(container_visitor)
+                self._parser.accept(container_visitor, self._start, self._start + self._padded_length)
 
                 container_visitor.v_end()
 
@@ -323,7 +394,7 @@ class GPMDItem:
             rawdatas = "null"
         else:
             rawdata = ' '.join(format(x, '02x') for x in self.rawdata)
-            rawdatas = self.rawdata[0:50]
+            rawdatas = bytes(self.rawdata[0:50])
 
         return f"GPMDItem: {self.fourcc}" \
                f", Type={self.type_char}" \
@@ -333,47 +404,73 @@ class GPMDItem:
                f" [{rawdata}] [{rawdatas}]"
 
 
-class GPMDParser:
+# (fourcc, type) -> name of the visitor method for it
+_visitor_methods = {}
 
-    def __init__(self, data: bytes):
-        self.data = data
 
-    def items(self):
-        offset = 0
-        while offset < len(self.data):
-            item = self.from_bytes(self.data, offset)
-            yield item
-            offset += item.bytecount
-
-    def from_bytes(self, data: bytes, offset: int):
-        fourcc, type_char_code, size, repeat = GPMDStruct.unpack_from(data, offset=offset)
-        fourcc = fourcc.decode()
-        length = size * repeat
-        padded_length = GPMDParser.extend(length)
+class GPMDParser:
+    """Walks the KLV items in a buffer, in place.
 
-        if type_char_code != 0 and padded_length >= 0:
-            s = struct.Struct('>' + str(padded_length) + 's')
-            rawdata, = s.unpack_from(data, offset=offset + 8)
+    Items are views onto the buffer, so nothing is copied, and a container's children are only read when
+    something asks for them. The item types in each container are remembered, as visitors are told them
+    for every container they might enter.
+    """
 
-            return GPMDItem(fourcc, type_char_code, size, repeat, padded_length, rawdata)
+    def __init__(self, data):
+        if isinstance(data, memoryview) and data.format == "B":
+            self.data = data
         else:
-            offset += GPMDStruct.size
-            child_data = data[offset:padded_length + offset]
-
-            children = []
-
-            child_offset = 0
-
-            while child_offset < len(child_data):
-                child = self.from_bytes(child_data, child_offset)
-                children.append(child)
-                child_offset += child.bytecount
-
-            return GPMDContainer(fourcc, size, repeat, padded_length, children)
+            self.data = memoryview(data).cast("B")
+        self._contents = {}
+        self._itemsets = {}
+
+    def headers(self, start=0, end=None):
+        """(offset, fourcc, type, size, repeat, padded length) of each item in a range, skipping over contents"""
+        data = self.data
+        unpack_from = GPMDStruct.unpack_from
+        offset, end = start, len(data) if end is None else min(end, len(data))
+        while offset < end:
+            fourcc, type_char_code, size, repeat = unpack_from(data, offset)
+            padded_length = (size * repeat + 3) & ~3
+            yield offset, fourcc, type_char_code, size, repeat, padded_length
+            offset += 8 + padded_length
+
+    def contents(self, start, end) -> frozenset:
+        """The types of the items in a range - containers with the same contents share the same set"""
+        itemset = self._contents.get(start, None)
+        if itemset is None:
+            itemset = frozenset([fourcc.decode() for fourcc in set([h[1] for h in self.headers(start, end)])])
+            itemset = self._itemsets.setdefault(itemset, itemset)
+            self._contents[start] = itemset
+        return itemset
+
+    def item_at(self, offset, fourcc, type_char_code, size, repeat, padded_length):
+        fourcc = fourcc.decode()
+        start = offset + GPMDStruct.size
+        end = start + padded_length
+
+        if type_char_code != 0:
+            if end > len(self.data):
+                raise struct.error(f"Item {fourcc} at {offset} needs {padded_length} bytes, "
+                                   f"only {len(self.data) - start} remain")
+            return GPMDItem(fourcc, type_char_code, size, repeat, padded_length, self.data[start:end])
+        else:
+            return GPMDContainer(fourcc, size, repeat, padded_length, self, start)
+
+    def items(self, start=0, end=None):
+        for header in self.headers(start, end):
+            yield self.item_at(*header)
+
+    def accept(self, visitor, start=0, end=None):
+        """Send the items in a range to the visitor - items it has no method for aren't even created"""
+        for header in self.headers(start, end):
+            key = header[1:3]
+            method = _visitor_methods.get(key, None)
+            if method is None:
+                method = _visitor_methods.setdefault(key, ("vic_" if header[2] == 0 else "vi_") + header[1].decode())
+            if hasattr(visitor, method):
+                self.item_at(*header).accept(visitor)
 
     @staticmethod
     def extend(n, base=4):
-        i = n
-        while i % base != 0:
-            i += 1
-        return i
+        return (n + base - 1) // base * base
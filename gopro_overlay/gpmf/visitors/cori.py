@@ -1,6 +1,6 @@
 import dataclasses
 import datetime
-from typing import List, Optional
+from typing import List, Optional, Sequence
 
 from pint import Quantity
 
@@ -14,7 +14,7 @@ from gopro_overlay.timeunits import Timeunit
 
 @dataclasses.dataclass(frozen=True)
 class CORIComponents:
-    orientations: List[QUATERNION]
+    orientations: Sequence[QUATERNION]
     timestamp: Timeunit
     samples: int
 
@@ -26,8 +26,8 @@ class Orientation:
     yaw: Quantity
 
 
-def euler_to_orientation(e: EulerRadians, units) -> Orientation:
-    radians = units.radians
+def euler_to_orientation(e: EulerRadians, units, radians=None) -> Orientation:
+    radians = units.radians if radians is None else radians
     return Orientation(
         roll=units.Quantity(e.roll, radians),
         pitch=units.Quantity(e.pitch, radians),
@@ -40,6 +40,8 @@ class CORIComponentConverter:
     def __init__(self, frame_calculator: PacketTimeCalculator, units, on_item):
         self._frame_calculator = frame_calculator
         self._units = units
+        self._number = units.number
+        self._radians = units.radians
         self._on_item = on_item
         self._total_samples = 0
 
@@ -69,13 +71,14 @@ class CORIComponentConverter:
                 sample_frame_timestamp,
                 Entry(
                     dt=point_datetime,
-                    timestamp=self._units.Quantity(sample_frame_timestamp.millis(), self._units.number),
-                    packet=self._units.Quantity(counter, self._units.number),
-                    packet_index=self._units.Quantity(index, self._units.number),
+                    timestamp=self._units.Quantity(sample_frame_timestamp.millis(), self._number),
+                    packet=self._units.Quantity(counter, self._number),
+                    packet_index=self._units.Quantity(index, self._number),
                     cori=quat,
                     ori=euler_to_orientation(
                         e=quat.euler(),
-                        units=self._units
+                        units=self._units,
+                        radians=self._radians
                     ),
                 )
             )
@@ -1,6 +1,6 @@
 import dataclasses
 import datetime
-from typing import List
+from typing import Sequence
 
 from gopro_overlay.entry import Entry
 from gopro_overlay.gpmf import VECTOR
@@ -9,7 +9,7 @@ from gopro_overlay.point import PintPoint3
 
 @dataclasses.dataclass(frozen=True)
 class GRAVComponents:
-    vectors: List[VECTOR]
+    vectors: Sequence[VECTOR]
     timestamp: int
     samples: int
 
@@ -48,9 +48,9 @@ class GRAVComponentConverter:
                 sample_frame_timestamp,
                 Entry(
                     dt=point_datetime,
-                    timestamp=self._units.Quantity(sample_frame_timestamp.millis(), self._units.number),
-                    packet=self._units.Quantity(counter, self._units.number),
-                    packet_index=self._units.Quantity(index, self._units.number),
+                    timestamp=self._units.Quantity(sample_frame_timestamp.millis(), unit),
+                    packet=self._units.Quantity(counter, unit),
+                    packet_index=self._units.Quantity(index, unit),
                     grav=grav_vector,
                 )
             )
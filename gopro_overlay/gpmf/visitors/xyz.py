@@ -1,6 +1,6 @@
 import dataclasses
 import datetime
-from typing import List
+from typing import Sequence
 
 from gopro_overlay.entry import Entry
 from gopro_overlay.gpmf import XYZ
@@ -35,7 +35,7 @@ class XYZComponents:
     orin: ORIN
     siun: str
     temp: int
-    points: List[XYZ]
+    points: Sequence[XYZ]
 
 
 class XYZStreamVisitor:
@@ -100,6 +100,7 @@ class XYZComponentConverter:
         self._on_item = on_item
         self._frame_calculator = frame_calculator
         self._units = units
+        self._number = units.number
         self._total_samples = 0
 
     # This only converts 1 in 10 of the XYZ Items - they run at 200Hz, and that's too much for our needs.
@@ -111,13 +112,12 @@ class XYZComponentConverter:
         )
 
         if components.siun == units_acceleration:
-            unit = "m/s^2"
+            unit = self._units.Unit("m/s^2")
         else:
             raise IOError(f"Unsupported units {components.siun}")
 
-        for index, point in enumerate(components.points):
-            if index % 10 != 0:
-                continue
+        for index in range(0, len(components.points), 10):
+            point = components.points[index]
             sample_frame_timestamp, _ = sample_time_calculator(index)
 
             point_datetime = datetime.datetime.fromtimestamp(sample_frame_timestamp.millis() / 1000,
@@ -128,9 +128,9 @@ class XYZComponentConverter:
                 sample_frame_timestamp,
                 Entry(
                     dt=point_datetime,
-                    timestamp=self._units.Quantity(sample_frame_timestamp.millis(), self._units.number),
-                    packet=self._units.Quantity(counter, self._units.number),
-                    packet_index=self._units.Quantity(index, self._units.number),
+                    timestamp=self._units.Quantity(sample_frame_timestamp.millis(), self._number),
+                    packet=self._units.Quantity(counter, self._number),
+                    packet_index=self._units.Quantity(index, self._number),
                     accl=PintPoint3(
                         x=self._units.Quantity(correct_orientation.x, unit),
                         y=self._units.Quantity(correct_orientation.y, unit),
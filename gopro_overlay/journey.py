@@ -77,7 +77,11 @@ class Journey:
         lat = self.lat if self.lat else self.badlat
         lon = self.lon if self.lon else self.badlon
 
-        if math.dist([lat.min, lon.min], [lat.max, lon.max]) < MIN_BOX_SIZE:
-            return BoundingBox(Point(lat.min, lon.min), Point(lat.min + MIN_BOX_SIZE, lon.min + MIN_BOX_SIZE))
+        return bounding_box(lat.min, lon.min, lat.max, lon.max)
 
-        return BoundingBox(Point(lat.min, lon.min), Point(lat.max, lon.max))
+
+def bounding_box(min_lat, min_lon, max_lat, max_lon) -> BoundingBox:
+    if math.dist([min_lat, min_lon], [max_lat, max_lon]) < MIN_BOX_SIZE:
+        return BoundingBox(Point(min_lat, min_lon), Point(min_lat + MIN_BOX_SIZE, min_lon + MIN_BOX_SIZE))
+
+    return BoundingBox(Point(min_lat, min_lon), Point(max_lat, max_lon))
@@ -95,11 +95,22 @@ class Overlay:
     def __init__(self, framemeta: FrameMeta, create_widgets: Callable):
         self.scene = Scene(create_widgets(self.entry))
         self.framemeta = framemeta
+        # frames are drawn in time order, so each is found by moving on from the last
+        self.cursor = framemeta.cursor()
         self._entry = None
+        # widgets that draw differently depending on the frames before - they can keep up with frames not drawn
+        self.remembering = [w for w in self.scene.widgets() if hasattr(w, "advance")]
 
     def entry(self):
         return self._entry
 
+    def advance(self, pts):
+        """Move on through the frame at pts without drawing it, leaving widgets as they would be had it been drawn"""
+        if self.remembering:
+            self._entry = self.cursor.get(pts)
+            for w in self.remembering:
+                w.advance()
+
     def draw(self, pts, image: Image.Image) -> Image.Image:
-        self._entry = self.framemeta.get(pts)
+        self._entry = self.cursor.get(pts)
         return self.scene.draw(image)
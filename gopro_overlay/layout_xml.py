@@ -30,7 +30,7 @@ from .widgets.gradient_bar import GradientBar
 from .widgets.map import MovingJourneyMap, Circuit
 from .widgets.profile import WidgetProfiler
 from .widgets.rpm_bar import RPMBarWidget
-from .widgets.widgets import simple_icon, Translate, Composite, Frame, Widget
+from .widgets.widgets import simple_icon, Translate, Composite, Frame, Widget, Static
 from .widgets.custom_calc import CustomCalcWidget
 from .widgets.gforce import GForceCircle
 from .widgets.lap_times_table import LapTimesTable
@@ -280,15 +280,15 @@ def metric_accessor_from(name: str) -> Callable[[Entry], Optional[pint.Quantity]
         "hr": lambda e: e.hr,
         "cadence": lambda e: e.cad,
         "power": lambda e: e.power,
-        "speed": lambda e: e.speed if e.speed is not None else e.cspeed,
+        "speed": lambda e: v if (v := e.speed) is not None else e.cspeed,
         "cspeed": lambda e: e.cspeed,
         "accel": lambda e: e.accel,
         "temp": lambda e: e.atemp,
         "exhaust_temp": lambda e: e.exhaust_temp,
-        "gradient": lambda e: e.grad if e.grad is not None else e.cgrad,
+        "gradient": lambda e: v if (v := e.grad) is not None else e.cgrad,
         "cgrad": lambda e: e.cgrad,
         "alt": lambda e: e.alt,
-        "odo": lambda e: e.odo if e.odo is not None else e.codo,
+        "odo": lambda e: v if (v := e.odo) is not None else e.codo,
         "codo": lambda e: e.codo,
         "dist": lambda e: e.dist,
         "azi": lambda e: e.azi,
@@ -308,15 +308,15 @@ def metric_accessor_from(name: str) -> Callable[[Entry], Optional[pint.Quantity]
         "gear.front": lambda e: e.gear_front,
         "gear.rear": lambda e: e.gear_rear,
 
-        "accl.x": lambda e: e.accl.x if e.accl else None,
-        "accl.y": lambda e: e.accl.y if e.accl else None,
-        "accl.z": lambda e: e.accl.z if e.accl else None,
-        "grav.x": lambda e: e.grav.x if e.grav else None,
-        "grav.y": lambda e: e.grav.y if e.grav else None,
-        "grav.z": lambda e: e.grav.z if e.grav else None,
-        "ori.pitch": lambda e: e.ori.pitch if e.ori else None,
-        "ori.roll": lambda e: e.ori.roll if e.ori else None,
-        "ori.yaw": lambda e: e.ori.yaw if e.ori else None,
+        "accl.x": lambda e: v.x if (v := e.accl) else None,
+        "accl.y": lambda e: v.y if (v := e.accl) else None,
+        "accl.z": lambda e: v.z if (v := e.accl) else None,
+        "grav.x": lambda e: v.x if (v := e.grav) else None,
+        "grav.y": lambda e: v.y if (v := e.grav) else None,
+        "grav.z": lambda e: v.z if (v := e.grav) else None,
+        "ori.pitch": lambda e: v.pitch if (v := e.ori) else None,
+        "ori.roll": lambda e: v.roll if (v := e.ori) else None,
+        "ori.yaw": lambda e: v.yaw if (v := e.ori) else None,
         "lat": lambda e: units.Quantity(e.point.lat, units.location),
         "lon": lambda e: units.Quantity(e.point.lon, units.location),
         "sdps": lambda e: e.sdps, # Vaaka cadence sensor distance-per-stroke field
@@ -478,15 +478,17 @@ class Widgets:
         if element.text is None:
             raise IOError("Text components should have the text in the element like <component...>Text</component>")
 
-        return text(
-            at=at(element),
-            value=lambda: element.text,
-            font=self._font(element, "size", d=16),
-            align=attrib(element, "align", d="left"),
-            direction=attrib(element, "direction", d="ltr"),
-            fill=rgbattr(element, "rgb", d=(255, 255, 255)),
-            stroke=rgbattr(element, "outline", d=(0, 0, 0)),
-            stroke_width=iattrib(element, "outline_width", d=2),
+        return Static(
+            text(
+                at=at(element),
+                value=lambda: element.text,
+                font=self._font(element, "size", d=16),
+                align=attrib(element, "align", d="left"),
+                direction=attrib(element, "direction", d="ltr"),
+                fill=rgbattr(element, "rgb", d=(255, 255, 255)),
+                stroke=rgbattr(element, "outline", d=(0, 0, 0)),
+                stroke_width=iattrib(element, "outline_width", d=2),
+            )
         )
 
     @allow_attributes({"x", "y", "size", "zoom", "corner_radius", "opacity", "rotate"})
@@ -573,7 +575,7 @@ class Widgets:
         return Translate(
             at=at(element),
             widget=SimpleChart(
-                value=lambda: window.view(timeunits(millis=entry().timestamp.magnitude)),
+                value=lambda: window.view_at(int(entry().timestamp.magnitude * 1000)),
                 font=title,
                 filled=battrib(element, "filled", d=True),
                 height=iattrib(element, "height", d=64),
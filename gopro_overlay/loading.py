@@ -10,6 +10,7 @@ from gopro_overlay.framemeta import FrameMeta
 from gopro_overlay.framemeta_gpmd import LoadFlag, parse_gopro
 from gopro_overlay.gpmd_filters import GPSLockFilter, NullGPSLockFilter
 from gopro_overlay.log import fatal
+from gopro_overlay.metadata_cache import MetadataCache
 from gopro_overlay.timeseries import Timeseries
 
 
@@ -35,13 +36,21 @@ class GoproLoader:
                  ffmpeg_gopro: FFMPEGGoPro,
                  units,
                  flags: Optional[Set[LoadFlag]] = None,
-                 gps_lock_filter: GPSLockFilter = NullGPSLockFilter()):
+                 gps_lock_filter: GPSLockFilter = NullGPSLockFilter(),
+                 cache: Optional[MetadataCache] = None):
         self.ffmpeg_gopro = ffmpeg_gopro
         self.units = units
         self.filter = gps_lock_filter
         self.flags = flags if flags is not None else None
+        self.cache = cache
 
     def load(self, file: Path) -> GoPro:
+        if self.cache is not None:
+            cached = self.cache.load(file, self.flags, self.ffmpeg_gopro.exe)
+            if cached is not None:
+                recording, frame_meta = cached
+                return GoPro(recording=recording, framemeta=frame_meta)
+
         recording = self.ffmpeg_gopro.find_recording(file)
 
         if not recording.data:
@@ -56,6 +65,9 @@ class GoproLoader:
                 gps_lock_filter=self.filter
             )
 
+            if self.cache is not None:
+                self.cache.save(recording, self.flags, frame_meta)
+
             return GoPro(recording=recording, framemeta=frame_meta)
 
         except TimeoutExpired:
@@ -0,0 +1,159 @@
+import struct
+
+from gopro_overlay.dimensions import Dimension
+
+# Just enough of Matroska (EBML) to stream timestamped raw RGBA frames to ffmpeg.
+# See https://www.matroska.org/technical/elements.html
+
+EBML = 0x1A45DFA3
+EBML_VERSION = 0x4286
+EBML_READ_VERSION = 0x42F7
+EBML_MAX_ID_LENGTH = 0x42F2
+EBML_MAX_SIZE_LENGTH = 0x42F3
+DOC_TYPE = 0x4282
+DOC_TYPE_VERSION = 0x4287
+DOC_TYPE_READ_VERSION = 0x4285
+
+SEGMENT = 0x18538067
+INFO = 0x1549A966
+TIMESTAMP_SCALE = 0x2AD7B1
+MUXING_APP = 0x4D80
+WRITING_APP = 0x5741
+
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+TRACK_NUMBER = 0xD7
+TRACK_UID = 0x73C5
+TRACK_TYPE = 0x83
+FLAG_LACING = 0x9C
+CODEC_ID = 0x86
+VIDEO = 0xE0
+PIXEL_WIDTH = 0xB0
+PIXEL_HEIGHT = 0xBA
+COLOUR_SPACE = 0x2EB524
+
+CLUSTER = 0x1F43B675
+CLUSTER_TIMESTAMP = 0xE7
+SIMPLE_BLOCK = 0xA3
+
+UNKNOWN_SIZE = b"\x01\xff\xff\xff\xff\xff\xff\xff"
+
+# SimpleBlock timestamps are signed 16 bit, relative to their cluster
+max_cluster_ms = 30_000
+
+
+def encode_id(element_id: int) -> bytes:
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, "big")
+
+
+def encode_size(size: int) -> bytes:
+    for length in range(1, 9):
+        if size < (1 << (7 * length)) - 1:
+            return ((1 << (7 * length)) | size).to_bytes(length, "big")
+    raise ValueError(f"Element size {size} is too large")
+
+
+def element(element_id: int, payload: bytes) -> bytes:
+    return encode_id(element_id) + encode_size(len(payload)) + payload
+
+
+def uint(element_id: int, value: int) -> bytes:
+    return element(element_id, value.to_bytes(max(1, (value.bit_length() + 7) // 8), "big"))
+
+
+def string(element_id: int, value: str) -> bytes:
+    return element(element_id, value.encode("ascii"))
+
+
+def header(size: Dimension) -> bytes:
+    return b"".join([
+        element(EBML, b"".join([
+            uint(EBML_VERSION, 1),
+            uint(EBML_READ_VERSION, 1),
+            uint(EBML_MAX_ID_LENGTH, 4),
+            uint(EBML_MAX_SIZE_LENGTH, 8),
+            string(DOC_TYPE, "matroska"),
+            uint(DOC_TYPE_VERSION, 4),
+            uint(DOC_TYPE_READ_VERSION, 2),
+        ])),
+        encode_id(SEGMENT), UNKNOWN_SIZE,
+        element(INFO, b"".join([
+            uint(TIMESTAMP_SCALE, 1_000_000),
+            string(MUXING_APP, "gopro-dashboard"),
+            string(WRITING_APP, "gopro-dashboard"),
+        ])),
+        element(TRACKS, element(TRACK_ENTRY, b"".join([
+            uint(TRACK_NUMBER, 1),
+            uint(TRACK_UID, 1),
+            uint(TRACK_TYPE, 1),
+            uint(FLAG_LACING, 0),
+            string(CODEC_ID, "V_UNCOMPRESSED"),
+            element(VIDEO, b"".join([
+                uint(PIXEL_WIDTH, size.x),
+                uint(PIXEL_HEIGHT, size.y),
+                element(COLOUR_SPACE, b"RGBA"),
+            ])),
+        ]))),
+    ])
+
+
+class UnchangedFrameSkippingWriter:
+    """Stream raw RGBA frames to ffmpeg as variable frame rate Matroska, only sending frames that have changed
+
+    Frames are timestamped by their position in the stream, so ffmpeg just keeps showing the previous frame
+    until a different one arrives.
+    """
+
+    def __init__(self, stream, size: Dimension, frame_duration_ms: int = 100):
+        self.stream = stream
+        self.frame_duration_ms = frame_duration_ms
+        self.frame_size = size.x * size.y * 4
+
+        self.frames = 0
+        self.sent = 0
+        self.previous = None
+        self.previous_sent_at = None
+        self.cluster_ms = None
+
+        self.stream.write(header(size))
+        self.stream.flush()
+
+    def _send(self, frame, at_ms: int):
+        if self.cluster_ms is None or at_ms - self.cluster_ms > max_cluster_ms:
+            self.cluster_ms = at_ms
+            self.stream.write(encode_id(CLUSTER) + UNKNOWN_SIZE + uint(CLUSTER_TIMESTAMP, at_ms))
+
+        block_header = b"\x81" + struct.pack(">hB", at_ms - self.cluster_ms, 0x80)
+
+        self.stream.write(encode_id(SIMPLE_BLOCK) + encode_size(len(block_header) + len(frame)) + block_header)
+        self.stream.write(frame)
+
+    def write(self, frame) -> int:
+        if len(frame) != self.frame_size:
+            raise ValueError(f"Frame is {len(frame)} bytes, expected {self.frame_size}")
+
+        at_ms = self.frames * self.frame_duration_ms
+        self.frames += 1
+
+        if self.previous is not None and self.previous == frame:
+            return len(frame)
+
+        self.previous = bytes(frame)
+        self.previous_sent_at = at_ms
+        self._send(self.previous, at_ms)
+        self.sent += 1
+        return len(frame)
+
+    def flush(self):
+        self.stream.flush()
+
+    def finish(self):
+        """Send the final frame again, if it was skipped, so the stream lasts as long as the frames written"""
+        last_ms = (self.frames - 1) * self.frame_duration_ms
+        if self.previous is not None and self.previous_sent_at != last_ms:
+            self._send(self.previous, last_ms)
+            self.previous_sent_at = last_ms
+        self.stream.flush()
+
+    def __str__(self):
+        return f"Frames: {self.frames}, Sent: {self.sent}, Skipped as unchanged: {self.frames - self.sent}"
@@ -0,0 +1,238 @@
+import dataclasses
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Optional, Set, Tuple, Dict, Any, List
+
+import numpy as np
+import pint
+
+from gopro_overlay.__version__ import __version__
+from gopro_overlay.columns import ColumnStore, DatetimeColumn, NumericColumn, CompositeColumn, Column, codecs, decompose
+from gopro_overlay.dimensions import Dimension
+from gopro_overlay.ffmpeg import FFMPEG
+from gopro_overlay.ffmpeg_gopro import GoproRecording, VideoStream, AudioStream, DataStream, filestat
+from gopro_overlay.framemeta import FrameMeta
+from gopro_overlay.framemeta_gpmd import LoadFlag
+from gopro_overlay.log import log
+from gopro_overlay.timeunits import Timeunit
+
+FORMAT = 1
+SAMPLE_SIZE = 1024 * 1024
+
+
+class Uncacheable(Exception):
+    pass
+
+
+def fingerprint(file: Path) -> Dict[str, Any]:
+    """Identifies the content of a (large) file, without reading all of it"""
+    st = os.stat(file)
+    digest = hashlib.sha256()
+    with open(file, "rb") as f:
+        digest.update(f.read(SAMPLE_SIZE))
+        if st.st_size > SAMPLE_SIZE:
+            f.seek(max(SAMPLE_SIZE, st.st_size - SAMPLE_SIZE))
+            digest.update(f.read(SAMPLE_SIZE))
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sample": digest.hexdigest()}
+
+
+def _streams_to_json(recording: GoproRecording) -> Dict[str, Any]:
+    video = recording.video
+    return {
+        "video": {
+            "stream": video.stream,
+            "dimension": [video.dimension.x, video.dimension.y],
+            "duration": video.duration.us,
+            "frame_count": video.frame_count,
+            "frame_rate_numerator": video.frame_rate_numerator,
+            "frame_rate_denominator": video.frame_rate_denominator,
+        },
+        "audio": dataclasses.asdict(recording.audio) if recording.audio is not None else None,
+        "data": dataclasses.asdict(recording.data) if recording.data is not None else None,
+    }
+
+
+def _streams_from_json(j: Dict[str, Any]) -> Tuple[VideoStream, Optional[AudioStream], Optional[DataStream]]:
+    video = j["video"]
+    return (
+        VideoStream(
+            stream=video["stream"],
+            dimension=Dimension(*video["dimension"]),
+            duration=Timeunit(video["duration"]),
+            frame_count=video["frame_count"],
+            frame_rate_numerator=video["frame_rate_numerator"],
+            frame_rate_denominator=video["frame_rate_denominator"],
+        ),
+        AudioStream(**j["audio"]) if j["audio"] is not None else None,
+        DataStream(**j["data"]) if j["data"] is not None else None,
+    )
+
+
+class MetadataCache:
+    """Parsed GoPro metadata, stored under the cache dir, keyed by the content of the source file (and the
+    settings used to parse it), so the same file doesn't need to be probed, extracted and parsed every time"""
+
+    def __init__(self, location: Path, units, settings: Optional[Dict[str, Any]] = None):
+        self.location = location
+        self.units = units
+        self.settings = settings if settings is not None else {}
+
+    def key(self, file: Path, flags: Optional[Set[LoadFlag]]) -> str:
+        flags = flags if flags is not None else set(LoadFlag)
+        description = {
+            "format": FORMAT,
+            "version": __version__,
+            "file": fingerprint(file),
+            "flags": sorted(f.name for f in flags),
+            "settings": {k: repr(v) for k, v in self.settings.items()},
+        }
+        return hashlib.sha256(json.dumps(description, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _dir(self, key: str) -> Path:
+        return self.location / "metadata" / key
+
+    def load(self, file: Path, flags: Optional[Set[LoadFlag]], ffmpeg: FFMPEG) -> Optional[
+        Tuple[GoproRecording, FrameMeta]]:
+        entry = self._dir(self.key(file, flags))
+        manifest = entry / "manifest.json"
+        if not manifest.exists():
+            return None
+
+        try:
+            with open(manifest) as f:
+                j = json.load(f)
+
+            video, audio, data = _streams_from_json(j["streams"])
+            recording = GoproRecording(
+                ffmpeg=ffmpeg, location=file, file=filestat(file), audio=audio, video=video, data=data
+            )
+
+            framemeta = FrameMeta(packets_per_second=j["packets_per_second"])
+            framemeta.store = self._read_store(entry, j)
+        except (OSError, ValueError, KeyError) as e:
+            log(f"Unable to use cached metadata in {entry} - {e}")
+            return None
+
+        return recording, framemeta
+
+    def save(self, recording: GoproRecording, flags: Optional[Set[LoadFlag]], framemeta: FrameMeta):
+        entry = self._dir(self.key(recording.location, flags))
+        if entry.exists():
+            return
+
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        temp = Path(tempfile.mkdtemp(dir=entry.parent, prefix=".incoming-"))
+        try:
+            manifest = self._write_store(temp, framemeta)
+            manifest["packets_per_second"] = framemeta.packets_per_second()
+            manifest["streams"] = _streams_to_json(recording)
+
+            with open(temp / "manifest.json", "w") as f:
+                json.dump(manifest, f)
+
+            os.rename(temp, entry)
+        except Uncacheable as e:
+            log(f"Not caching metadata for {recording.location} - {e}")
+        except OSError as e:
+            log(f"Unable to cache metadata in {entry} - {e}")
+        finally:
+            if temp.exists():
+                shutil.rmtree(temp, ignore_errors=True)
+
+    # --- writing
+
+    def _write_store(self, path: Path, framemeta: FrameMeta) -> Dict[str, Any]:
+        framemeta.check_modified()
+        store = framemeta.store
+
+        dts = store.dts
+        if dts.objects is not None or not isinstance(dts.epoch.tzinfo, datetime.timezone):
+            raise Uncacheable("dates don't share a fixed timezone")
+
+        np.save(path / "times.npy", store.times)
+        np.save(path / "dts.npy", dts.micros)
+
+        columns = []
+        for index, (name, column) in enumerate(store.columns.items()):
+            spec = self._write_column(path, str(index), column)
+            if spec is not None:
+                spec["name"], spec["prefix"] = name, str(index)
+                columns.append(spec)
+
+        return {
+            "tz": dts.epoch.utcoffset().total_seconds(),
+            "columns": columns,
+        }
+
+    def _write_numeric(self, path: Path, prefix: str, column: NumericColumn) -> Dict[str, Any]:
+        if column.quantity is None:
+            units = None
+        elif column.quantity is self.units.Quantity:
+            units = dict(column.units)
+        else:
+            raise Uncacheable("quantity from another unit registry")
+
+        np.save(path / f"{prefix}.values.npy", column.values)
+        np.save(path / f"{prefix}.present.npy", column.present)
+        return {"kind": "numeric", "units": units}
+
+    def _write_column(self, path: Path, prefix: str, column: Column) -> Optional[Dict[str, Any]]:
+        if isinstance(column, NumericColumn):
+            return self._write_numeric(path, prefix, column)
+
+        if isinstance(column, CompositeColumn):
+            column = column.to_objects()
+
+        present = [v for v in column.values if v is not None]
+        if not present:
+            return None
+
+        decomposed = decompose(column)
+        if decomposed is None:
+            raise Uncacheable(f"don't know how to store {type(present[0]).__name__} as columns")
+
+        name, composite = decomposed
+        parts = [self._write_numeric(path, f"{prefix}.{index}", part) for index, part in enumerate(composite.parts)]
+
+        np.save(path / f"{prefix}.present.npy", composite.present)
+        return {"kind": name, "parts": parts}
+
+    # --- reading
+
+    def _read_numeric(self, path: Path, prefix: str, spec: Dict[str, Any]) -> NumericColumn:
+        units = spec["units"]
+        return NumericColumn(
+            values=np.load(path / f"{prefix}.values.npy", mmap_mode="c"),
+            present=np.load(path / f"{prefix}.present.npy", mmap_mode="c"),
+            quantity=self.units.Quantity if units is not None else None,
+            units=pint.util.UnitsContainer(units) if units is not None else None
+        )
+
+    def _read_column(self, path: Path, prefix: str, spec: Dict[str, Any]) -> Column:
+        if spec["kind"] == "numeric":
+            return self._read_numeric(path, prefix, spec)
+
+        return CompositeColumn(
+            build=codecs[spec["kind"]].build,
+            parts=[self._read_numeric(path, f"{prefix}.{i}", part) for i, part in enumerate(spec["parts"])],
+            present=np.load(path / f"{prefix}.present.npy", mmap_mode="c")
+        )
+
+    def _read_store(self, path: Path, manifest: Dict[str, Any]) -> ColumnStore:
+        tz = datetime.timezone(datetime.timedelta(seconds=manifest["tz"]))
+        columns: List[Dict[str, Any]] = manifest["columns"]
+
+        return ColumnStore(
+            times=np.load(path / "times.npy", mmap_mode="c"),
+            dts=DatetimeColumn(
+                micros=np.load(path / "dts.npy", mmap_mode="c"),
+                epoch=datetime.datetime(1970, 1, 1, tzinfo=tz),
+                objects=None
+            ),
+            columns={spec["name"]: self._read_column(path, spec["prefix"], spec) for spec in columns}
+        )
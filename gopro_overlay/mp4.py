@@ -0,0 +1,227 @@
+"""
+Just enough of an ISO BMFF (MP4/MOV) reader to find the samples of one track, and read them straight from the file,
+rather than having ffmpeg copy them out. Only the box headers and the sample tables (moov) are read, plus the
+samples themselves - a few MB of a multi-GB file.
+"""
+import dataclasses
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple, BinaryIO
+
+import numpy as np
+
+
+@dataclasses.dataclass(frozen=True)
+class Box:
+    fourcc: bytes
+    start: int
+    header: int
+    size: int
+
+    @property
+    def content(self) -> int:
+        return self.start + self.header
+
+    @property
+    def end(self) -> int:
+        return self.start + self.size
+
+
+def _box_at(read, offset: int, end: int) -> Optional[Box]:
+    header = read(offset, 8)
+    if len(header) < 8:
+        return None
+    size, fourcc = struct.unpack(">I4s", header)
+    header_size = 8
+    if size == 1:
+        large = read(offset + 8, 8)
+        if len(large) < 8:
+            return None
+        size = struct.unpack(">Q", large)[0]
+        header_size = 16
+    elif size == 0:
+        size = end - offset
+    if size < header_size or offset + size > end:
+        raise ValueError(f"Corrupt MP4 box '{fourcc!r}' at {offset}")
+    return Box(fourcc, offset, header_size, size)
+
+
+def boxes(read, start: int, end: int) -> Iterator[Box]:
+    offset = start
+    while offset + 8 <= end:
+        box = _box_at(read, offset, end)
+        if box is None:
+            return
+        yield box
+        offset = box.end
+
+
+def _file_reader(f: BinaryIO):
+    def read(offset: int, length: int) -> bytes:
+        f.seek(offset)
+        return f.read(length)
+
+    return read
+
+
+def _buffer_reader(buffer: bytes):
+    def read(offset: int, length: int) -> bytes:
+        return buffer[offset:offset + length]
+
+    return read
+
+
+def _child(buffer: bytes, box: Box, fourcc: bytes) -> Box:
+    for child in boxes(_buffer_reader(buffer), box.content, box.end):
+        if child.fourcc == fourcc:
+            return child
+    raise ValueError(f"No '{fourcc.decode()}' in '{box.fourcc.decode()}'")
+
+
+def _table(buffer: bytes, box: Box, columns: int = 1, dtype: str = ">u4", skip: int = 0) -> np.ndarray:
+    # full box: version+flags, (anything else), entry count, entries
+    count = struct.unpack_from(">I", buffer, box.content + 4 + skip)[0]
+    table = np.frombuffer(buffer, dtype=dtype, count=count * columns, offset=box.content + 8 + skip)
+    return table.astype(np.int64).reshape(-1, columns) if columns > 1 else table.astype(np.int64)
+
+
+@dataclasses.dataclass(frozen=True)
+class Track:
+    """Where the samples of a track are, and how long they last"""
+    index: int
+    handler: bytes
+    codec: bytes
+    timescale: int
+    sizes: np.ndarray
+    offsets: np.ndarray
+    durations: np.ndarray
+
+    def frame_duration(self) -> int:
+        return int(self.durations[0])
+
+    def ranges(self) -> List[Tuple[int, int]]:
+        """(offset, length) of the samples, with adjacent samples joined together"""
+        if len(self.sizes) == 0:
+            return []
+        ends = self.offsets + self.sizes
+        breaks = np.flatnonzero(self.offsets[1:] != ends[:-1]) + 1
+        starts = np.concatenate(([0], breaks))
+        stops = np.concatenate((breaks, [len(self.sizes)]))
+        return [
+            (int(self.offsets[a]), int(ends[b - 1] - self.offsets[a]))
+            for a, b in zip(starts.tolist(), stops.tolist())
+        ]
+
+
+def _track(buffer: bytes, index: int, trak: Box) -> Track:
+    mdia = _child(buffer, trak, b"mdia")
+
+    mdhd = _child(buffer, mdia, b"mdhd")
+    version = buffer[mdhd.content]
+    timescale = struct.unpack_from(">I", buffer, mdhd.content + (20 if version == 1 else 12))[0]
+
+    hdlr = _child(buffer, mdia, b"hdlr")
+    handler = bytes(buffer[hdlr.content + 8:hdlr.content + 12])
+
+    stbl = _child(buffer, _child(buffer, mdia, b"minf"), b"stbl")
+
+    stsd = _child(buffer, stbl, b"stsd")
+    codec = bytes(buffer[stsd.content + 12:stsd.content + 16])
+
+    stts = _table(buffer, _child(buffer, stbl, b"stts"), columns=2)
+    durations = np.repeat(stts[:, 1], stts[:, 0])
+
+    stsz = _child(buffer, stbl, b"stsz")
+    sample_size, sample_count = struct.unpack_from(">II", buffer, stsz.content + 4)
+    if sample_size:
+        sizes = np.full(sample_count, sample_size, dtype=np.int64)
+    else:
+        sizes = _table(buffer, stsz, skip=4)
+
+    try:
+        chunk_offsets = _table(buffer, _child(buffer, stbl, b"stco"))
+    except ValueError:
+        chunk_offsets = _table(buffer, _child(buffer, stbl, b"co64"), dtype=">u8")
+
+    stsc = _table(buffer, _child(buffer, stbl, b"stsc"), columns=3)
+
+    # stsc has runs of chunks with the same number of samples, given by the first chunk (1-based) of each run
+    run_starts = stsc[:, 0] - 1
+    run_lengths = np.diff(np.concatenate((run_starts, [len(chunk_offsets)])))
+    samples_per_chunk = np.repeat(stsc[:, 1], run_lengths)
+
+    chunk_of_sample = np.repeat(np.arange(len(chunk_offsets)), samples_per_chunk)[:len(sizes)]
+    if len(chunk_of_sample) != len(sizes):
+        raise ValueError("MP4 sample tables don't agree")
+
+    position = np.cumsum(sizes) - sizes
+    first_in_chunk = np.concatenate(([0], np.cumsum(samples_per_chunk)))[chunk_of_sample]
+    offsets = chunk_offsets[chunk_of_sample] + position - position[first_in_chunk]
+
+    return Track(
+        index=index,
+        handler=handler,
+        codec=codec,
+        timescale=timescale,
+        sizes=sizes,
+        offsets=offsets,
+        durations=durations,
+    )
+
+
+def read_moov(f: BinaryIO) -> bytes:
+    read = _file_reader(f)
+    f.seek(0, 2)
+    end = f.tell()
+    for box in boxes(read, 0, end):
+        if box.fourcc == b"moov":
+            return read(box.start, box.size)
+    raise ValueError("No 'moov' box - not an MP4 file?")
+
+
+def tracks(moov: bytes) -> List[Track]:
+    top = _box_at(_buffer_reader(moov), 0, len(moov))
+    return [
+        _track(moov, index, box)
+        for index, box in enumerate(b for b in boxes(_buffer_reader(moov), top.content, top.end) if b.fourcc == b"trak")
+    ]
+
+
+def find_track(filepath: Path, index: int, codec: bytes) -> Track:
+    with open(filepath, "rb") as f:
+        try:
+            found = tracks(read_moov(f))
+        except struct.error as e:
+            raise ValueError(f"Corrupt MP4 file {filepath}: {e}")
+    if index >= len(found) or found[index].codec != codec:
+        raise ValueError(f"Stream {index} of {filepath} is not '{codec.decode()}'")
+    return found[index]
+
+
+def _read_into(filepath: Path, buffer: memoryview, ranges: List[Tuple[int, int, int]]):
+    with open(filepath, "rb") as f:
+        for offset, length, position in ranges:
+            f.seek(offset)
+            if f.readinto(buffer[position:position + length]) != length:
+                raise IOError(f"Unexpected end of file reading {filepath} at {offset}")
+
+
+def read_track(filepath: Path, track: Track, workers: int = 1) -> bytearray:
+    """The samples of the track, one after another, as ffmpeg -codec copy -f rawvideo would give them"""
+    ranges = track.ranges()
+    positions = np.cumsum([0] + [length for _, length in ranges]).tolist()
+    data = bytearray(positions[-1])
+    view = memoryview(data)
+
+    work = [(offset, length, position) for (offset, length), position in zip(ranges, positions)]
+
+    if workers > 1 and len(work) > 1:
+        share = -(-len(work) // workers)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(lambda w: _read_into(filepath, view, w),
+                          [work[i:i + share] for i in range(0, len(work), share)]))
+    else:
+        _read_into(filepath, view, work)
+
+    return data
@@ -1,3 +1,4 @@
+import numpy as np
 from geographiclib.geodesic import Geodesic
 
 from .units import units
@@ -16,6 +17,15 @@ class PrivacyZone:
         )
         return actual <= self.dist
 
+    def enclosed(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        """Which of the locations does it enclose"""
+        dist = self.dist.to("m").magnitude
+        inverse = Geodesic.WGS84.Inverse
+        return np.array([
+            abs(inverse(self.point.lat, self.point.lon, lat, lon)['s12']) <= dist
+            for lat, lon in zip(lats.tolist(), lons.tolist())
+        ], dtype=bool)
+
     def __str__(self):
         return f"PrivacyZone: {self.dist} around {self.point}"
 
@@ -23,3 +33,6 @@ class PrivacyZone:
 class NoPrivacyZone:
     def encloses(self, point):
         return False
+
+    def enclosed(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        return np.zeros(len(lats), dtype=bool)
@@ -28,23 +28,45 @@ SOFTWARE.
 """
 from math import sqrt
 
+import numpy as np
 
-def distance(a, b):
-    return sqrt((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2)
 
+def rdp_indices(points: np.ndarray, epsilon: float) -> np.ndarray:
+    """The indices of the (n, 2) points that rdp would keep.
 
-def point_line_distance(point, start, end):
-    if start == end:
-        return distance(point, start)
-    else:
-        n = abs(
-            (end[0] - start[0]) * (start[1] - point[1]) -
-            (start[0] - point[0]) * (end[1] - start[1])
-        )
-        d = sqrt(
-            (end[0] - start[0]) ** 2 + (end[1] - start[1]) ** 2
-        )
-        return n / d
+    Works through a stack of spans, rather than recursing, so long tracks can't reach the recursion limit, and finds
+    the furthest point of each span with numpy."""
+    n = len(points)
+    if n <= 2:
+        return np.arange(n)
+
+    points = np.asarray(points, dtype=np.float64)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+
+    spans = [(0, n - 1)]
+    while spans:
+        first, last = spans.pop()
+        if last - first < 2:
+            continue
+
+        start, end = points[first], points[last]
+        inner = points[first + 1:last]
+        dx, dy = end - start
+
+        if dx == 0 and dy == 0:
+            distances = np.hypot(inner[:, 0] - start[0], inner[:, 1] - start[1])
+        else:
+            distances = np.abs(dx * (start[1] - inner[:, 1]) - (start[0] - inner[:, 0]) * dy) / sqrt(dx * dx + dy * dy)
+
+        index = int(np.argmax(distances))
+        if distances[index] >= epsilon:
+            index += first + 1
+            keep[index] = True
+            spans.append((index, last))
+            spans.append((first, index))
+
+    return np.flatnonzero(keep)
 
 
 def rdp(points, epsilon):
@@ -55,17 +77,4 @@ def rdp(points, epsilon):
     if len(points) <= 2:
         return points
 
-    dmax = 0.0
-    index = 0
-    for i in range(1, len(points) - 1):
-        d = point_line_distance(points[i], points[0], points[-1])
-        if d > dmax:
-            index = i
-            dmax = d
-
-    if dmax >= epsilon:
-        results = rdp(points[:index + 1], epsilon)[:-1] + rdp(points[index:], epsilon)
-    else:
-        results = [points[0], points[-1]]
-
-    return results
+    return [points[i] for i in rdp_indices(np.array(points, dtype=np.float64), epsilon).tolist()]
@@ -0,0 +1,151 @@
+"""
+The route of a journey - the locations with a GPS fix - worked out once for each FrameMeta, and shared by all the
+widgets that draw it, rather than each going through every entry for itself.
+"""
+import weakref
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from gopro_overlay.columns import ColumnStore, CompositeColumn, NumericColumn
+from gopro_overlay.gpmf import GPS_FIXED_VALUES
+from gopro_overlay.journey import Journey, bounding_box
+from gopro_overlay.point import Point, BoundingBox
+from gopro_overlay.rdp import rdp_indices
+
+
+class Route:
+    """
+    Locations as arrays of lat and lon, and the bounding box of the journey.
+
+    Projections of the locations onto a map are kept, by the map's extent, size and zoom, so drawing the route on the
+    same map again costs nothing.
+    """
+
+    def __init__(self, lats: np.ndarray, lons: np.ndarray, bbox: Optional[BoundingBox]):
+        self.lats = lats
+        self.lons = lons
+        self._bbox = bbox
+        self._outside = {}
+        self._projections = {}
+        self._simplified = {}
+
+    def __len__(self):
+        return len(self.lats)
+
+    @property
+    def bounding_box(self) -> BoundingBox:
+        if self._bbox is None:
+            raise ValueError("No locations in route")
+        return self._bbox
+
+    @property
+    def locations(self) -> List[Point]:
+        return [Point(lat, lon) for lat, lon in zip(self.lats.tolist(), self.lons.tolist())]
+
+    def outside(self, privacy_zone) -> 'Route':
+        """The route without the locations the privacy zone encloses"""
+        route = self._outside.get(privacy_zone, None)
+        if route is None:
+            enclosed = privacy_zone.enclosed(self.lats, self.lons)
+            if enclosed.any():
+                route = Route(self.lats[~enclosed], self.lons[~enclosed], self._bbox)
+            else:
+                route = self
+            self._outside[privacy_zone] = route
+        return route
+
+    def project(self, map) -> np.ndarray:
+        """(n, 2) positions of the locations on the map image - as map.rev_geocode would give them"""
+        key = (tuple(map.extent), tuple(map.size), map.zoom)
+        projected = self._projections.get(key, None)
+        if projected is None:
+            provider = map.provider
+            scale = 2 ** map.zoom
+
+            def world(lons, lats):
+                x = (lons + 180.0) / 360.0 * scale * provider.tile_width
+                y = (1.0 - np.arcsinh(np.tan(np.radians(lats))) / np.pi) / 2.0 * scale * provider.tile_height
+                return x, y
+
+            cx, cy = world(*map.center)
+            x, y = world(self.lons, self.lats)
+            projected = np.stack([x - cx + map.size[0] / 2, y - cy + map.size[1] / 2], axis=1)
+            self._projections[key] = projected
+        return projected
+
+    def pixels(self, map, epsilon: Optional[float] = None) -> List[Tuple[float, float]]:
+        """The route drawn on the map - simplified with rdp, if given an epsilon (in pixels)"""
+        projected = self.project(map)
+        if epsilon is not None:
+            key = (tuple(map.extent), tuple(map.size), map.zoom, epsilon)
+            kept = self._simplified.get(key, None)
+            if kept is None:
+                kept = rdp_indices(projected, epsilon)
+                self._simplified[key] = kept
+            projected = projected[kept]
+        return [(x, y) for x, y in projected.tolist()]
+
+
+def _route(lats: np.ndarray, lons: np.ndarray, located: np.ndarray, fixed: np.ndarray) -> Route:
+    # as Journey - the bounding box of the fixed locations, or of all of them, if none are fixed
+    boxed = located & fixed if (located & fixed).any() else located
+    bbox = bounding_box(
+        float(lats[boxed].min()), float(lons[boxed].min()), float(lats[boxed].max()), float(lons[boxed].max())
+    ) if boxed.any() else None
+
+    chosen = located & fixed
+    return Route(lats[chosen], lons[chosen], bbox)
+
+
+def _from_store(store: ColumnStore) -> Route:
+    rows = len(store)
+
+    column = store.columns.get("point", None)
+    if isinstance(column, CompositeColumn) and all(isinstance(p, NumericColumn) for p in column.parts):
+        lats, lons = [p.values.astype(np.float64) for p in column.parts]
+        located = column.present & column.parts[0].present & column.parts[1].present
+    else:
+        points = [column.get(row) for row in range(rows)] if column is not None else [None] * rows
+        located = np.array([p is not None and p.lat is not None and p.lon is not None for p in points], dtype=bool)
+        lats = np.array([p.lat if ok else np.nan for p, ok in zip(points, located.tolist())], dtype=np.float64)
+        lons = np.array([p.lon if ok else np.nan for p, ok in zip(points, located.tolist())], dtype=np.float64)
+
+    fix = store.numeric("gpsfix")
+    if fix is not None:
+        fixed = fix.present & np.isin(fix.values, list(GPS_FIXED_VALUES))
+    else:
+        fixed = np.array([store.value("gpsfix", row) in GPS_FIXED_VALUES for row in range(rows)], dtype=bool)
+
+    return _route(lats, lons, located.astype(bool), fixed)
+
+
+def _from_journey(timeseries) -> Route:
+    journey = Journey()
+    timeseries.process(journey.accept)
+
+    lats = np.array([p.lat for p in journey.locations], dtype=np.float64)
+    lons = np.array([p.lon for p in journey.locations], dtype=np.float64)
+    try:
+        bbox = journey.bounding_box
+    except ValueError:
+        bbox = None
+    return Route(lats, lons, bbox)
+
+
+_routes = weakref.WeakKeyDictionary()
+
+
+def route_of(framemeta) -> Route:
+    """The route of the framemeta - made once (until the framemeta changes), and shared"""
+    if hasattr(framemeta, "check_modified"):
+        framemeta.check_modified()
+    store = getattr(framemeta, "store", None)
+
+    known = _routes.get(framemeta, None)
+    if known is not None and known[0] is store:
+        return known[1]
+
+    route = _from_store(store) if store is not None else _from_journey(framemeta)
+    _routes[framemeta] = (store, route)
+    return route
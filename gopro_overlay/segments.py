@@ -0,0 +1,118 @@
+import ctypes
+import dataclasses
+import multiprocessing
+import time
+from typing import List, Callable, Iterable, Iterator, Tuple, TypeVar
+
+from gopro_overlay.log import log
+from gopro_overlay.progresstrack import ProgressTracker
+
+T = TypeVar("T")
+
+
+@dataclasses.dataclass(frozen=True)
+class Segment:
+    """A contiguous range of steps [start, end) of the render timeline.
+
+    Steps from warmup up to start are advanced through, but not drawn, so that widgets which keep state between frames
+    (moving maps, charts, lap timers...) are in the same state as they would have been in a serial render.
+    """
+    number: int
+    warmup: int
+    start: int
+    end: int
+
+    def __len__(self):
+        return self.end - self.start
+
+    def wants(self, index: int) -> bool:
+        return self.start <= index < self.end
+
+    def warming(self, index: int) -> bool:
+        return self.warmup <= index < self.start
+
+    def frames(self, steps: Iterable[T]) -> Iterator[Tuple[T, bool]]:
+        """The steps of the whole timeline that this segment needs, each with whether it is drawn, or only advanced
+        through"""
+        for index, step in enumerate(steps):
+            if index >= self.end:
+                break
+            if self.warming(index):
+                yield step, False
+            elif self.wants(index):
+                yield step, True
+
+
+def split_steps(steps: int, count: int, warmup: int = 0) -> List[Segment]:
+    if count < 1:
+        raise ValueError(f"Need at least one segment, not {count}")
+
+    count = max(1, min(count, steps))
+    size, remainder = divmod(steps, count)
+
+    segments = []
+    start = 0
+    for number in range(count):
+        end = start + size + (1 if number < remainder else 0)
+        segments.append(Segment(number=number, warmup=max(0, start - warmup), start=start, end=end))
+        start = end
+
+    return segments
+
+
+class SegmentProgress:
+    """Counts frames rendered across all worker processes"""
+
+    def __init__(self, context):
+        self.value = context.Value(ctypes.c_long, 0)
+
+    def increment(self):
+        with self.value.get_lock():
+            self.value.value += 1
+
+    @property
+    def count(self):
+        return self.value.value
+
+
+def render_segments(segments: List[Segment],
+                    render: Callable[[Segment, SegmentProgress], None],
+                    progress: ProgressTracker,
+                    poll: float = 0.5):
+    """Render each segment in its own process.
+
+    Processes are forked, rather than spawned, so that loaded metadata doesn't need to be pickled - each worker builds
+    its own layout (and map renderer) from what it inherits from the parent.
+    """
+    try:
+        context = multiprocessing.get_context("fork")
+    except ValueError:
+        raise IOError("Rendering with multiple workers is not supported on this platform") from None
+
+    counter = SegmentProgress(context)
+
+    processes = [
+        context.Process(target=render, args=(segment, counter), name=f"segment-{segment.number}")
+        for segment in segments
+    ]
+
+    for p in processes:
+        p.start()
+
+    try:
+        while any(p.is_alive() for p in processes):
+            progress.update(counter.count)
+            time.sleep(poll)
+    except KeyboardInterrupt:
+        for p in processes:
+            p.terminate()
+        raise
+    finally:
+        for p in processes:
+            p.join()
+
+    failed = [p.name for p in processes if p.exitcode != 0]
+    if failed:
+        raise IOError(f"Rendering failed in {failed}")
+
+    log(f"All {len(segments)} segments rendered")
@@ -0,0 +1,235 @@
+"""
+Map tiles, as downloaded, in an SQLite database laid out like MBTiles - but holding many styles, keyed by
+style, zoom, x, y.
+
+The database is in WAL mode, so any number of rendering processes can read it while another writes, and tiles are
+read and written in batches, a transaction each, rather than a commit per tile.
+
+Rows are numbered as the tile servers number them, from the north. MBTiles files number them from the south, so rows
+are flipped on import and export.
+"""
+import contextlib
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from gopro_overlay.geo_render import TileKey
+
+SCHEMA = """
+BEGIN IMMEDIATE;
+CREATE TABLE IF NOT EXISTS tiles (
+    style TEXT NOT NULL,
+    zoom_level INTEGER NOT NULL,
+    tile_column INTEGER NOT NULL,
+    tile_row INTEGER NOT NULL,
+    tile_data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    used INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS tiles_key ON tiles (style, zoom_level, tile_column, tile_row);
+CREATE INDEX IF NOT EXISTS tiles_used ON tiles (used, size);
+
+-- the size of all the tiles, kept up to date as they change, so it needn't be added up again each time
+CREATE TABLE IF NOT EXISTS totals (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TRIGGER IF NOT EXISTS tiles_added AFTER INSERT ON tiles BEGIN
+    UPDATE totals SET value = value + NEW.size WHERE name = 'size';
+END;
+CREATE TRIGGER IF NOT EXISTS tiles_removed AFTER DELETE ON tiles BEGIN
+    UPDATE totals SET value = value - OLD.size WHERE name = 'size';
+END;
+CREATE TRIGGER IF NOT EXISTS tiles_resized AFTER UPDATE OF size ON tiles BEGIN
+    UPDATE totals SET value = value - OLD.size + NEW.size WHERE name = 'size';
+END;
+INSERT OR IGNORE INTO totals (name, value)
+    SELECT 'size', CAST(TOTAL(size) AS INTEGER) FROM tiles WHERE NOT EXISTS (SELECT 1 FROM totals WHERE name = 'size');
+COMMIT;
+"""
+
+MBTILES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS {db}.metadata (name TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS {db}.tiles (
+    zoom_level INTEGER NOT NULL,
+    tile_column INTEGER NOT NULL,
+    tile_row INTEGER NOT NULL,
+    tile_data BLOB NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS {db}.tile_index ON tiles (zoom_level, tile_column, tile_row);
+"""
+
+# keys per query - three parameters each, well inside SQLite's limit on parameters
+BATCH = 300
+
+
+def _flip(zoom: int, row: int) -> int:
+    return (1 << zoom) - 1 - row
+
+
+def _format(data: bytes) -> str:
+    return "jpg" if data[:3] == b"\xff\xd8\xff" else "png"
+
+
+class TileStore:
+    """
+    Map tiles in an SQLite database, read and written in batches.
+
+    If max_size (bytes) is given, the least recently used tiles are removed once the tiles take more than that. This
+    means recording when tiles are used, so reads write too - without it, reads are only reads.
+    """
+
+    def __init__(self, path: Path, max_size: Optional[int] = None, timeout: float = 30.0):
+        self.path = path
+        self.max_size = max_size
+        # transactions are begun explicitly, so reads don't take write locks
+        self.db = sqlite3.connect(str(path), timeout=timeout, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        # safe in WAL mode - a crash may lose the last transactions, but won't corrupt the database
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        # so the rows that INSERT OR REPLACE removes are taken off the size too
+        self.db.execute("PRAGMA recursive_triggers=ON")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @contextlib.contextmanager
+    def _transaction(self, write: bool):
+        # a write transaction takes the write lock up front, rather than failing part way if another process has it
+        self.db.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        try:
+            yield
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+
+    def get_many(self, style: str, keys: Iterable[TileKey]) -> Dict[TileKey, bytes]:
+        """Those of the tiles that are in the store, read in a single transaction"""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+
+        def read():
+            for i in range(0, len(keys), BATCH):
+                batch = keys[i:i + BATCH]
+                rows = self.db.execute(
+                    "WITH wanted (z, x, y) AS (VALUES " + ",".join(["(?, ?, ?)"] * len(batch)) + ") "
+                    "SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles JOIN wanted "
+                    "ON style = ? AND zoom_level = z AND tile_column = x AND tile_row = y",
+                    [v for key in batch for v in key] + [style]
+                )
+                found.update(((z, x, y), data) for z, x, y, data in rows)
+
+            if self.max_size is not None and found:
+                self._touch(style, found.keys())
+
+        with self._transaction(write=self.max_size is not None):
+            read()
+
+        return found
+
+    def _touch(self, style: str, keys: Iterable[TileKey]):
+        now = time.time_ns()
+        self.db.executemany(
+            "UPDATE tiles SET used = ? WHERE style = ? AND zoom_level = ? AND tile_column = ? AND tile_row = ?",
+            [(now, style, z, x, y) for z, x, y in keys]
+        )
+
+    def put_many(self, style: str, tiles: Iterable[Tuple[TileKey, bytes]]) -> int:
+        """Store the tiles, replacing any already there, in a single transaction"""
+        now = time.time_ns()
+        rows = [(style, z, x, y, data, len(data), now) for (z, x, y), data in tiles if data]
+        if rows:
+            with self._transaction(write=True):
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO tiles (style, zoom_level, tile_column, tile_row, tile_data, size, used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._evict()
+        return len(rows)
+
+    def size(self) -> int:
+        """Bytes of tile data stored"""
+        return self.db.execute("SELECT value FROM totals WHERE name = 'size'").fetchone()[0]
+
+    def count(self, style: Optional[str] = None) -> int:
+        if style is None:
+            return self.db.execute("SELECT COUNT(*) FROM tiles").fetchone()[0]
+        return self.db.execute("SELECT COUNT(*) FROM tiles WHERE style = ?", (style,)).fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def _evict(self) -> int:
+        if self.max_size is None:
+            return 0
+
+        excess = self.size() - self.max_size
+        if excess <= 0:
+            return 0
+
+        doomed = []
+        for rowid, size in self.db.execute("SELECT rowid, size FROM tiles ORDER BY used, rowid"):
+            doomed.append((rowid,))
+            excess -= size
+            if excess <= 0:
+                break
+
+        self.db.executemany("DELETE FROM tiles WHERE rowid = ?", doomed)
+        return len(doomed)
+
+    def import_mbtiles(self, path: Path, style: str) -> int:
+        """Add all the tiles of an MBTiles file (replacing any already there) as the given style"""
+        if not path.exists():
+            raise IOError(f"No MBTiles file at {path}")
+
+        self.db.execute("ATTACH DATABASE ? AS source", (str(path),))
+        try:
+            with self._transaction(write=True):
+                imported = self.db.execute(
+                    "INSERT OR REPLACE INTO tiles (style, zoom_level, tile_column, tile_row, tile_data, size, used) "
+                    "SELECT ?, zoom_level, tile_column, (1 << zoom_level) - 1 - tile_row, tile_data, "
+                    "LENGTH(tile_data), ? FROM source.tiles",
+                    (style, time.time_ns())
+                ).rowcount
+                self._evict()
+            return imported
+        finally:
+            self.db.execute("DETACH DATABASE source")
+
+    def export_mbtiles(self, path: Path, style: str, keys: Optional[Iterable[TileKey]] = None) -> int:
+        """Write the tiles of a style (or just those of them with the given keys) to an MBTiles file"""
+        if keys is None:
+            rows = self.db.execute(
+                "SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles WHERE style = ?", (style,)
+            ).fetchall()
+        else:
+            rows = [(z, x, y, data) for (z, x, y), data in self.get_many(style, keys).items()]
+
+        tiles: List[Tuple[int, int, int, bytes]] = [(z, x, _flip(z, y), data) for z, x, y, data in rows]
+
+        self.db.execute("ATTACH DATABASE ? AS export", (str(path),))
+        try:
+            self.db.executescript(MBTILES_SCHEMA.format(db="export"))
+            with self._transaction(write=True):
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO export.tiles (zoom_level, tile_column, tile_row, tile_data) "
+                    "VALUES (?, ?, ?, ?)",
+                    tiles
+                )
+                metadata = {"name": style, "format": _format(tiles[0][3]) if tiles else "png"}
+                if tiles:
+                    zooms = [t[0] for t in tiles]
+                    metadata.update(minzoom=str(min(zooms)), maxzoom=str(max(zooms)))
+                self.db.executemany("INSERT OR REPLACE INTO export.metadata (name, value) VALUES (?, ?)",
+                                    metadata.items())
+        finally:
+            self.db.execute("DETACH DATABASE export")
+
+        return len(tiles)
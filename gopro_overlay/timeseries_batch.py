@@ -0,0 +1,320 @@
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+from geographiclib.geodesic import Geodesic
+
+from . import timeseries_process
+from .columns import ColumnStore, EntryView, NumericColumn
+from .gpmf import GPS_FIXED_VALUES, GPSFix
+from .point import Point
+from .smoothing import Kalman
+from .units import units
+
+# Whole-column versions of the processors in timeseries_process, for a FrameMeta.
+#
+# Each gives the same values as the per-entry processor it stands in for, but works on the arrays in the
+# FrameMeta's ColumnStore, rather than entry by entry. Where the data isn't in the shape expected
+# (say, a metric in unusual units, or missing points), the per-entry processor is used instead.
+
+Where = Callable[[ColumnStore], np.ndarray]
+
+
+def _gpsfix_in(store: ColumnStore, values) -> np.ndarray:
+    column = store.numeric("gpsfix")
+    if column is not None and column.quantity is None:
+        return column.present & np.isin(column.values, list(values))
+    return np.array([store.value("gpsfix", row) in values for row in range(len(store))], dtype=bool)
+
+
+def everywhere(store: ColumnStore) -> np.ndarray:
+    return np.ones(len(store), dtype=bool)
+
+
+def locked_2d(store: ColumnStore) -> np.ndarray:
+    return _gpsfix_in(store, GPS_FIXED_VALUES)
+
+
+def locked_3d(store: ColumnStore) -> np.ndarray:
+    return _gpsfix_in(store, {GPSFix.LOCK_3D.value})
+
+
+def _store(fm) -> ColumnStore:
+    fm.check_modified()
+    return fm.store
+
+
+def _pair_rows(store: ColumnStore, skip: int, where: Where) -> np.ndarray:
+    count = len(store) - skip
+    if count <= 0:
+        return np.zeros(0, dtype=np.int64)
+    mask = where(store)
+    return np.flatnonzero(mask[:count] & mask[skip:skip + count])
+
+
+def _process(store: ColumnStore, rows: np.ndarray, processor):
+    for row in rows.tolist():
+        entry = EntryView(store, row)
+        updates = processor(entry)
+        if updates:
+            entry.update(**updates)
+
+
+def _process_pairs(store: ColumnStore, rows: np.ndarray, skip: int, processor, update_b=False):
+    for row in rows.tolist():
+        entry_a, entry_b = EntryView(store, row), EntryView(store, row + skip)
+        updates = processor(entry_a, entry_b, skip)
+        if updates:
+            (entry_b if update_b else entry_a).update(**updates)
+
+
+def _unit_of(column: NumericColumn):
+    return None if column.quantity is None else column.quantity(1, column.units).units
+
+
+def _in_units(column: Optional[NumericColumn], unit) -> bool:
+    return column is not None and column.quantity is not None and column.units == unit._units
+
+
+def _points(store: ColumnStore, key: str, rows: np.ndarray) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    column = store.columns.get(key, None)
+    if column is None:
+        return None if len(rows) else (np.zeros(0), np.zeros(0))
+    points = [column.get(row) for row in rows.tolist()]
+    if any(type(p) is not Point for p in points):
+        return None
+    return (
+        np.array([p.lat for p in points], dtype=np.float64),
+        np.array([p.lon for p in points], dtype=np.float64)
+    )
+
+
+def _copy(store: ColumnStore, key: str, new: str, source: np.ndarray, dest: np.ndarray):
+    column = store.columns.get(key, None)
+    if column is None:
+        store.clear(new, dest)
+    elif isinstance(column, NumericColumn):
+        present = column.present[source]
+        store.assign(new, dest[present], column.values[source][present], _unit_of(column))
+        store.clear(new, dest[~present])
+    else:
+        for s, d in zip(source.tolist(), dest.tolist()):
+            store.set(new, d, column.get(s))
+
+
+def inverse(lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Distance (metres) and initial azimuth (degrees) along the WGS84 geodesic between pairs of points
+
+    Uses Vincenty's method over the whole array, which agrees with geographiclib to well under a millimetre,
+    and geographiclib itself for the pairs Vincenty can't do (coincident or nearly antipodal points)
+    """
+    a, f = Geodesic.WGS84.a, Geodesic.WGS84.f
+    b = (1 - f) * a
+
+    delta = lon2 - lon1
+    delta = np.where(delta > 180, delta - 360, np.where(delta < -180, delta + 360, delta))
+    L = np.radians(delta)
+
+    U1 = np.arctan((1 - f) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - f) * np.tan(np.radians(lat2)))
+    sin_u1, cos_u1 = np.sin(U1), np.cos(U1)
+    sin_u2, cos_u2 = np.sin(U2), np.cos(U2)
+
+    lam = L
+    converged = np.zeros(len(L), dtype=bool)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for _ in range(200):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = cos_u1 * cos_u2 * sin_lam / sin_sigma
+            cos2_alpha = 1 - sin_alpha ** 2
+            cos_2sigma_m = np.where(cos2_alpha != 0, cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha, 0.0)
+            C = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+
+            previous = lam
+            lam = L + (1 - C) * f * sin_alpha * (
+                    sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+
+            converged = np.abs(lam - previous) < 1e-12
+            if converged.all():
+                break
+
+        u2 = cos2_alpha * (a * a - b * b) / (b * b)
+        A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+        B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+        delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (
+                cos_sigma * (-1 + 2 * cos_2sigma_m ** 2) -
+                B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+
+    s12 = b * A * (sigma - delta_sigma)
+    azi1 = np.degrees(np.arctan2(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam))
+
+    hard = ~converged | (sin_sigma == 0) | ~np.isfinite(s12)
+    for i in np.flatnonzero(hard).tolist():
+        result = Geodesic.WGS84.Inverse(lat1[i], lon1[i], lat2[i], lon2[i])
+        s12[i], azi1[i] = result["s12"], result["azi1"]
+
+    return s12, azi1
+
+
+def process_ses(fm, new: str, key: str = "point", alpha=0.4, where: Where = everywhere):
+    """Exponential smoothing of points, as timeseries_process.process_ses"""
+    store = _store(fm)
+    rows = np.flatnonzero(where(store))
+
+    points = _points(store, key, rows)
+    if points is None:
+        _process(store, rows, timeseries_process.process_ses(new, lambda e: getattr(e, key), alpha=alpha))
+        return
+
+    if len(rows) == 0:
+        return
+
+    lats, lons = points
+    keep = 1 - alpha
+
+    # the first point is its own forecast
+    store.set(new, int(rows[0]), store.value(key, int(rows[0])))
+    forecast = previous = (float(lats[0]), float(lons[0]))
+
+    for row, lat, lon in zip(rows[1:].tolist(), lats[1:].tolist(), lons[1:].tolist()):
+        forecast = (previous[0] * alpha + forecast[0] * keep, previous[1] * alpha + forecast[1] * keep)
+        store.set(new, row, Point(forecast[0], forecast[1]))
+        previous = (lat, lon)
+
+
+def calculate_speeds(fm, skip=1, where: Where = everywhere):
+    store = _store(fm)
+    rows = _pair_rows(store, skip, where)
+    others = rows + skip
+
+    a, b = _points(store, "point", rows), _points(store, "point", others)
+    if a is None or b is None:
+        _process_pairs(store, rows, skip, timeseries_process.calculate_speeds())
+        return
+
+    dist, azi = inverse(a[0], a[1], b[0], b[1])
+    time = store.dts.seconds_between(rows, others)
+
+    moving = time > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        speed = np.where(moving, dist / time, 0.0)
+
+    k = Kalman()
+    smoothed = np.array([k.update(s) for s in speed.tolist()], dtype=np.float64)
+    # smoothed speeds take the units of the first speed
+    smoothed_unit = units.m / units.s if len(moving) == 0 or moving[0] else units.mps
+
+    store.assign("cspeed", rows, smoothed, smoothed_unit)
+    store.assign("cspeed.k", rows, smoothed, smoothed_unit)
+    store.assign("cspeed.raw", rows[moving], speed[moving], units.m / units.s)
+    store.assign("cspeed.raw", rows[~moving], np.zeros(np.count_nonzero(~moving), dtype=np.int64), units.mps)
+    store.assign("dist", rows, dist / skip, units.m)
+    store.assign("time", rows, time, units.seconds)
+    store.assign("azi", rows, azi, units.degree)
+    store.assign("cog", rows, np.where(azi >= 0, 0 + azi, 360 + azi), units.degree)
+
+
+def calculate_accel(fm, skip=1, where: Where = everywhere):
+    store = _store(fm)
+    rows = _pair_rows(store, skip, where)
+    others = rows + skip
+
+    speed = store.numeric("speed")
+    if speed is None and "speed" in store.columns or speed is not None and speed.quantity is None:
+        _process_pairs(store, rows, skip, timeseries_process.calculate_accel(), update_b=True)
+        return
+
+    time = store.dts.seconds_between(rows, others)
+
+    if speed is None:
+        known = np.zeros(len(rows), dtype=bool)
+    else:
+        va, vb = speed.values[rows], speed.values[others]
+        known = speed.present[rows] & speed.present[others] & (va != 0) & (vb != 0) & (time != 0)
+
+    if np.any(known):
+        unit = (speed.quantity(1, speed.units) / units.Quantity(1, units.seconds)).units
+        store.assign("accel", others[known], (vb[known] - va[known]) / time[known], unit)
+    store.assign("accel", others[~known], np.zeros(np.count_nonzero(~known), dtype=np.int64), units.mps)
+
+
+def calculate_odo(fm, where: Where = everywhere):
+    store = _store(fm)
+    rows = np.flatnonzero(where(store))
+
+    dist = store.numeric("dist")
+    if dist is None and "dist" in store.columns or dist is not None and not _in_units(dist, units.m):
+        _process(store, rows, timeseries_process.calculate_odo())
+        return
+
+    if dist is None:
+        increments = np.zeros(len(rows), dtype=np.float64)
+    else:
+        increments = np.where(dist.present, dist.values, 0).astype(np.float64)[rows]
+
+    store.assign("codo", rows, np.cumsum(increments), units.m)
+
+
+def calculate_gradient(fm, skip=1, where: Where = everywhere):
+    store = _store(fm)
+    rows = _pair_rows(store, skip, where)
+
+    alt = store.numeric("alt")
+    if alt is None:
+        if "alt" in store.columns:
+            _process_pairs(store, rows, skip, timeseries_process.calculate_gradient())
+        return
+
+    if not _in_units(alt, units.m):
+        _process_pairs(store, rows, skip, timeseries_process.calculate_gradient())
+        return
+
+    others = rows + skip
+    rising = alt.present[rows] & alt.present[others] & (alt.values[rows] != 0) & (alt.values[others] != 0)
+    rows, others = rows[rising], others[rising]
+
+    a, b = _points(store, "point", rows), _points(store, "point", others)
+    if a is None or b is None:
+        _process_pairs(store, rows, skip, timeseries_process.calculate_gradient())
+        return
+
+    dist, _ = inverse(a[0], a[1], b[0], b[1])
+
+    far = dist > 1.0
+    rows, others, dist = rows[far], others[far], dist[far]
+
+    gain = alt.values[others] - alt.values[rows]
+    grad = (gain / dist) * 100.0
+    good = np.abs(grad) < 45
+
+    store.assign("cgrad", rows[good], grad[good], units.dimensionless)
+    store.assign("bad_grad", rows[~good], grad[~good], units.dimensionless)
+    store.assign("grad_gain", rows, gain, units.m)
+    store.assign("grad_dist", rows, dist, units.m)
+    _copy(store, "packet", "grad_other_packet", others, rows)
+    _copy(store, "packet_index", "grad_other_packet_index", others, rows)
+
+
+def process_kalman(fm, new: str, key: str):
+    store = _store(fm)
+
+    column = store.numeric(key)
+    if column is None:
+        if key in store.columns:
+            _process(store, np.arange(len(store)), timeseries_process.process_kalman(new, lambda e: getattr(e, key)))
+        return
+
+    rows = np.flatnonzero(column.present)
+    k = Kalman()
+    smoothed = np.array([k.update(v) for v in column.values[rows].tolist()], dtype=np.float64)
+    store.assign(new, rows, smoothed, _unit_of(column))
+
+
+def filter_locked(fm):
+    store = _store(fm)
+    rows = np.flatnonzero(~locked_2d(store))
+    for field in timeseries_process.locked_fields:
+        store.clear(field, rows)
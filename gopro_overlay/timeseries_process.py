@@ -103,12 +103,14 @@ def calculate_odo():
     return accept
 
 
-def filter_locked():
-    fields = ["speed", "cspeed", "accel", "azi", "cog", "time", "dist", "grad", "cgrad", "alt"]
+# metrics that are meaningless without a GPS lock
+locked_fields = ["speed", "cspeed", "accel", "azi", "cog", "time", "dist", "grad", "cgrad", "alt"]
+
 
+def filter_locked():
     def accept(e):
         if e.gpsfix not in GPS_FIXED_VALUES:
-            return {f: None for f in fields}
+            return {f: None for f in locked_fields}
 
     return accept
 
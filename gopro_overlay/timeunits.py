@@ -2,6 +2,8 @@ import datetime
 
 
 class Timeunit:
+    __slots__ = ("us",)
+
     def __init__(self, us):
         self.us = int(us)
 
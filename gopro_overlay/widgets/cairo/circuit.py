@@ -5,9 +5,9 @@ from typing import Callable, Tuple
 import cairo
 
 from gopro_overlay.framemeta import FrameMeta
-from gopro_overlay.journey import Journey
 from gopro_overlay.point import Point, Coordinate
 from gopro_overlay.rdp import rdp
+from gopro_overlay.route import Route, route_of
 from gopro_overlay.widgets.cairo.cairo import set_source, saved, CairoWidget, CairoCache, CairoComposite
 
 
@@ -36,25 +36,25 @@ class CairoCircuitPath(CairoWidget):
 
     def __init__(
             self,
-            journey_fn: Callable[[], Journey],
+            route_fn: Callable[[], Route],
             scale_fn: Callable[[Point], Tuple[float, float]],
             line: Line = Line(fill=white, outline=black, width=0.01),
     ):
-        self.journey = journey_fn
+        self.route = route_fn
         self.scale = scale_fn
         self.line = line
 
+        self._start = None
         self._points = None
 
     def draw(self, context: cairo.Context):
-        journey = self.journey()
-
         with saved(context):
-            start = journey.locations[0]
-            context.move_to(*(self.scale(start)))
-
             if self._points is None:
-                self._points = rdp([self.scale(p) for p in journey.locations[1:]], epsilon=self.line.width / 8)
+                locations = self.route().locations
+                self._start = self.scale(locations[0])
+                self._points = rdp([self.scale(p) for p in locations[1:]], epsilon=self.line.width / 8)
+
+            context.move_to(*self._start)
 
             [context.line_to(*p) for p in self._points]
 
@@ -99,14 +99,14 @@ class CairoCircuit(CairoWidget):
             loc: Line = Line(fill=blue, outline=white, width=0.015),
     ):
         self.framemeta = framemeta
-        self._journey = None
+        self._route = None
         self._size = None
         self._mid = None
 
         self.widget = CairoComposite([
             CairoCache(
                 CairoCircuitPath(
-                    self.journey,
+                    self.route,
                     self.scale,
                     line
                 )
@@ -118,11 +118,10 @@ class CairoCircuit(CairoWidget):
             )
         ])
 
-    def journey(self):
-        if self._journey is None:
-            self._journey = Journey()
-            self.framemeta.process(self._journey.accept)
-            bbox = self._journey.bounding_box
+    def route(self) -> Route:
+        if self._route is None:
+            self._route = route_of(self.framemeta)
+            bbox = self._route.bounding_box
             size = bbox.size() * 1.1
 
             self._size = max(size.x, size.y)
@@ -131,7 +130,7 @@ class CairoCircuit(CairoWidget):
                 x=((bbox.max.lat - bbox.min.lat) / 2) + bbox.min.lat,
                 y=((bbox.max.lon - bbox.min.lon) / 2) + bbox.min.lon
             )
-        return self._journey
+        return self._route
 
     def scale(self, point):
         x = ((point.lat - self._mid.x) / self._size)
@@ -1,9 +1,16 @@
+import numpy as np
 from PIL import Image, ImageDraw
 
 from .map import draw_marker
 from .widgets import Widget
 
 
+def _packed(colour) -> np.uint32:
+    """RGBA colour as a single pixel value, so whole areas can be filled with one numpy operation"""
+    rgba = tuple(colour) if len(colour) == 4 else (*colour, 255)
+    return np.array(rgba, dtype=np.uint8).view(np.uint32)[0]
+
+
 class SimpleChart(Widget):
 
     def __init__(
@@ -30,53 +37,62 @@ class SimpleChart(Widget):
         self.view = None
         self.image = None
 
-    def draw(self, image: Image, draw: ImageDraw):
-        view = self.value()
+    def _render(self, data) -> Image:
+        size = (len(data), self.height)
 
-        if self.view and self.view.version == view.version:
-            pass
-        else:
-            self.view = view
-            data = view.data
-            size = (len(data), self.height)
-            self.image = Image.new("RGBA", size, self.bg)
-            draw = ImageDraw.Draw(self.image)
+        values = [v for v in data if v is not None]
+        max_val = max(values, default=0)
+        min_val = min(values, default=0)
 
-            values = [i for i in data if i is not None]
-            max_val = max(values, default=0)
-            min_val = min(values, default=0)
+        range_val = max_val - min_val
 
-            range_val = max_val - min_val
+        if range_val == 0:
+            range_val = 1
 
-            if range_val == 0:
-                range_val = 1
+        scale_y = size[1] / (range_val * 1.1)
 
-            scale_y = size[1] / (range_val * 1.1)
+        def y_pos(val):
+            return size[1] - 1 - (val - min_val) * scale_y
 
-            def y_pos(val):
-                return size[1] - 1 - (val - min_val) * scale_y
+        xs = np.flatnonzero(np.array([v is not None for v in data], dtype=bool))
+        ys = y_pos(np.array(values, dtype=np.float64))
 
-            filtered = [(x, y) for x, y in enumerate(data) if y is not None]
+        if self.filled and len(xs):
+            # (0,0) is top left - each column is filled from its value down to the bottom, all in one go
+            tops = np.full(size[0], size[1], dtype=np.int64)
+            tops[xs] = np.clip(ys.astype(np.int64), 0, size[1] - 1)
+            filled = np.arange(size[1])[:, None] >= tops[None, :]
+            pixels = np.where(filled, _packed(self.fill), _packed(self.bg))
+            image = Image.fromarray(pixels.view(np.uint8).reshape(size[1], size[0], 4), mode="RGBA")
+        else:
+            image = Image.new("RGBA", size, self.bg)
+
+        draw = ImageDraw.Draw(image)
+
+        draw.line(list(zip(xs.tolist(), ys.tolist())), width=2, fill=self.line)
 
-            if self.filled:
-                for x, y in filtered:
-                    # (0,0) is top left
-                    points = ((x, size[1] - 1), (x, y_pos(y)))
+        if self.font:
+            draw.text((10, 4), f"{max_val:.0f}", font=self.font, fill=self.text, stroke_width=2,
+                      stroke_fill=(0, 0, 0), anchor="lt")
+            draw.text((10, self.height - 10), f"{min_val:.0f}", font=self.font, fill=self.text, stroke_width=2,
+                      stroke_fill=(0, 0, 0), anchor="lb")
 
-                    draw.line(points, width=1, fill=self.fill)
+        marker_val = data[int(size[0] / 2)]
+        if marker_val:
+            draw_marker(draw, (size[0] / 2, y_pos(marker_val)), 4, fill=(255, 0, 0))
 
-            points = [(x, y_pos(y)) for x, y in filtered]
+        return image
 
-            draw.line(points, width=2, fill=self.line)
+    def advance(self):
+        """Keep up with a frame that isn't drawn - views can depend on those asked for before"""
+        self.value()
 
-            if self.font:
-                draw.text((10, 4), f"{max_val:.0f}", font=self.font, fill=self.text, stroke_width=2,
-                          stroke_fill=(0, 0, 0), anchor="lt")
-                draw.text((10, self.height - 10), f"{min_val:.0f}", font=self.font, fill=self.text, stroke_width=2,
-                          stroke_fill=(0, 0, 0), anchor="lb")
+    def draw(self, image: Image, draw: ImageDraw):
+        view = self.value()
 
-            marker_val = data[int(size[0] / 2)]
-            if marker_val:
-                draw_marker(draw, (size[0] / 2, y_pos(marker_val)), 4, fill=(255, 0, 0))
+        if self.view is None or self.view.version != view.version:
+            if self.view is None or self.view.data != view.data:
+                self.image = self._render(view.data)
+            self.view = view
 
         image.alpha_composite(self.image, (0, 0))
@@ -274,7 +274,8 @@ class CustomCalcWidget(Widget):
 
         return stats
 
-    def draw(self, image: Image, draw: ImageDraw):
+    def _evaluate(self):
+        """Évalue l'expression pour l'entrée actuelle, en mettant à jour le state"""
         # Récupérer les données actuelles
         e = self.entry()
 
@@ -343,6 +344,15 @@ class CustomCalcWidget(Widget):
         # Mettre à jour le state
         self.state['last_value'] = value
 
+        return value
+
+    def advance(self):
+        """Suit une image qui n'est pas dessinée - l'expression peut dépendre des valeurs précédentes"""
+        self._evaluate()
+
+    def draw(self, image: Image, draw: ImageDraw):
+        value = self._evaluate()
+
         # Render selon le template
         if self.template == "text":
             self._render_text(draw, value)
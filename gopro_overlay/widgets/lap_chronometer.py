@@ -44,6 +44,9 @@ class LapChronometer(Widget):
         if timeseries:
             print("🔍 Pré-calcul du nombre total de tours...")
             for entry in timeseries.items():
+                # Départ du chrono = première entrée, comme au premier dessin - le rendu peut commencer n'importe où
+                if self.start_time is None:
+                    self.start_time = entry.dt
                 try:
                     lap = getattr(entry, 'lap', None)
                     if lap and hasattr(lap, 'magnitude'):
@@ -53,6 +56,10 @@ class LapChronometer(Widget):
                     else:
                         continue
 
+                    # Début de chaque tour, indépendant des images déjà dessinées
+                    if lap not in self.beacon_markers:
+                        self.beacon_markers[lap] = (entry.dt - self.start_time).total_seconds()
+
                     laptype = getattr(entry, 'laptype', None)
                     if laptype and hasattr(laptype, 'magnitude'):
                         laptype = str(laptype.magnitude)
@@ -84,7 +91,8 @@ class LapChronometer(Widget):
         millis = int((seconds % 1) * 1000)
         return f"{minutes}:{secs:02d}.{millis:03d}"
 
-    def draw(self, image: Image, draw):
+    def _update(self):
+        """Met à jour l'état d'après l'entrée actuelle - renvoie le tour, son type et le temps écoulé dans le tour"""
         e = self.entry()
 
         # Initialiser start_time au premier appel
@@ -139,6 +147,15 @@ class LapChronometer(Widget):
         # Temps écoulé dans le tour
         elapsed_time = current_time - lap_start_time
 
+        return current_lap, laptype, elapsed_time
+
+    def advance(self):
+        """Suit une image qui n'est pas dessinée, pour que l'état soit celui d'un rendu de toutes les images"""
+        self._update()
+
+    def draw(self, image: Image, draw):
+        current_lap, laptype, elapsed_time = self._update()
+
         # Position de base
         base_x = self.at.x
         base_y = self.at.y
@@ -49,7 +49,8 @@ class LapTimesTable(Widget):
         # Dictionnaire pour tracker la vitesse max de chaque tour
         self.lap_max_speeds = {}
 
-    def draw(self, image: Image, draw):
+    def _update(self):
+        """Met à jour les tours vus d'après l'entrée actuelle"""
         e = self.entry()
 
         # Récupérer le tour actuel
@@ -145,6 +146,13 @@ class LapTimesTable(Widget):
             best_lap_num = min(timed_laps, key=lambda x: timed_laps[x]['time'])
             self.best_lap = best_lap_num
 
+    def advance(self):
+        """Suit une image qui n'est pas dessinée, pour que les tours vus soient ceux d'un rendu de toutes les images"""
+        self._update()
+
+    def draw(self, image: Image, draw):
+        self._update()
+
         # Sélection intelligente des tours à afficher
         all_laps = sorted(self.lap_times_cache.keys())
 
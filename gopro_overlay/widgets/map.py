@@ -1,16 +1,18 @@
 import math
-from typing import Callable
+from typing import Callable, Iterable, List, Set, Optional
 
 import geotiler
+import numpy as np
 from PIL import ImageDraw, Image
 
 from gopro_overlay.dimensions import Dimension
 from gopro_overlay.framemeta import FrameMeta
-from gopro_overlay.journey import Journey
+from gopro_overlay.geo_render import TileKey, map_tiles, tiles_around, TileMosaic, map_origin
 from gopro_overlay.log import log
 from gopro_overlay.point import Point
 from gopro_overlay.privacy import NoPrivacyZone
-from gopro_overlay.rdp import rdp
+from gopro_overlay.rdp import rdp_indices
+from gopro_overlay.route import Route, route_of
 from gopro_overlay.widgets.widgets import Widget
 
 
@@ -94,26 +96,26 @@ class JourneyMap(Widget):
         self.map = None
         self.image = None
 
-    def _init_maybe(self):
-        if self.map is None:
-            journey = Journey()
+    def _map(self, route: Route) -> geotiler.Map:
+        bbox = route.bounding_box
+        map = geotiler.Map(extent=(bbox.min.lon, bbox.min.lat, bbox.max.lon, bbox.max.lat),
+                           size=(self.size, self.size))
 
-            self.timeseries.process(journey.accept)
+        if map.zoom > 18:
+            map.zoom = 18
 
-            bbox = journey.bounding_box
-            self.map = geotiler.Map(extent=(bbox.min.lon, bbox.min.lat, bbox.max.lon, bbox.max.lat),
-                                    size=(self.size, self.size))
+        return map
 
-            if self.map.zoom > 18:
-                self.map.zoom = 18
+    def map_tiles(self, locations: List[Point]) -> Set[TileKey]:
+        return map_tiles(self._map(route_of(self.timeseries)))
 
-            plots = rdp(
-                points=[
-                    self.map.rev_geocode((location.lon, location.lat))
-                    for location in journey.locations if not self.privacy_zone.encloses(location)
-                ],
-                epsilon=1
-            )
+    def _init_maybe(self):
+        if self.map is None:
+            route = route_of(self.timeseries)
+
+            self.map = self._map(route)
+
+            plots = route.outside(self.privacy_zone).pixels(self.map, epsilon=1)
 
             image = self.renderer(self.map)
 
@@ -166,35 +168,113 @@ class MovingMap(Widget):
         self.perceptible = PerceptibleMovementCheck(always_redraw)
         self.border = MaybeRoundedBorder(size=size, corner_radius=corner_radius, opacity=opacity)
         self.cached = None
+        # the map, and its rotation, to be drawn when next wanted - where it moved in a frame that wasn't drawn
+        self.pending = None
+        # renderers that can give tiles by themselves let the map be cut from a mosaic, kept as the map moves
+        self.mosaic = TileMosaic(renderer.tiles, zoom) if hasattr(renderer, "tiles") else None
+        # geotiler would otherwise load its default provider from disk for every new Map
+        self.provider = getattr(renderer, "provider", "osm")
+
+    def map_tiles(self, locations: List[Point]) -> Set[TileKey]:
+        located = [p for p in locations if p.lat is not None and p.lon is not None]
+        return tiles_around(
+            lons=np.array([p.lon for p in located], dtype=np.float64),
+            lats=np.array([p.lat for p in located], dtype=np.float64),
+            zoom=self.zoom,
+            size=self.hypotenuse,
+            margin=self.mosaic.margin if self.mosaic is not None else 0,
+        )
+
+    def _rotation(self) -> Optional[float]:
+        azimuth = self.azimuth()
+        if azimuth and self.rotate:
+            azi = azimuth.to("degree").magnitude
+            return 0 + azi if azi >= 0 else 360 + azi
+        return None
 
-    def _redraw(self, map):
+    def _redraw(self, map, angle: Optional[float]):
         image = self.renderer(map)
 
         draw = ImageDraw.Draw(image)
         draw_marker(draw, (self.half_width_height, self.half_width_height), 6)
-        azimuth = self.azimuth()
-        if azimuth and self.rotate:
-            azi = azimuth.to("degree").magnitude
-            angle = 0 + azi if azi >= 0 else 360 + azi
+        if angle is not None:
             image = image.rotate(angle, resample=Image.BILINEAR)
 
         crop = image.crop(self.bounds)
 
         return self.border.rounded(crop)
 
-    def draw(self, image: Image, draw: ImageDraw):
+    def _redraw_from_mosaic(self, map, angle: Optional[float]):
+        left, top = map_origin(map)
+        mosaic, (x, y) = self.mosaic.view(left, top, self.hypotenuse)
+
+        # only the part of the mosaic that could be seen is rotated - rotating it around its centre, and cropping
+        # it to size, as happens when the map is drawn from scratch, in one go.
+        if angle is not None:
+            region = mosaic.crop((x, y, x + self.hypotenuse, y + self.hypotenuse))
+            centre, offset = self.half_width_height, self.bounds[0]
+            radians = -math.radians(angle)
+            a, b = math.cos(radians), math.sin(radians)
+            crop = region.transform(
+                (self.size, self.size), Image.AFFINE,
+                (a, b, centre + (a + b) * (offset - centre), -b, a, centre + (a - b) * (offset - centre)),
+                resample=Image.BILINEAR
+            )
+        else:
+            x, y = x + int(self.bounds[0]), y + int(self.bounds[1])
+            crop = mosaic.crop((x, y, x + self.size, y + self.size))
+
+        draw_marker(ImageDraw.Draw(crop), (self.half_width_height - self.bounds[0],) * 2, 6)
+
+        return self.border.rounded(crop)
+
+    def _follow(self) -> bool:
+        """Follow the location - once it has moved perceptibly, the map to draw there is pending. False if there's no
+        location to follow"""
         location = self.location()
-        if location.lon is not None and location.lat is not None:
+        if location.lon is None or location.lat is None:
+            return False
 
-            map = geotiler.Map(center=(location.lon, location.lat), zoom=self.zoom,
-                               size=(self.hypotenuse, self.hypotenuse))
+        map = geotiler.Map(center=(location.lon, location.lat), zoom=self.zoom,
+                           size=(self.hypotenuse, self.hypotenuse), provider=self.provider)
 
-            if self.perceptible.moved(map, location):
-                self.cached = self._redraw(map)
+        if self.perceptible.moved(map, location):
+            self.pending = (map, self._rotation())
+        return True
+
+    def advance(self):
+        """Keep up with a frame that isn't drawn - the map it would have drawn is only drawn when next wanted"""
+        self._follow()
+
+    def draw(self, image: Image, draw: ImageDraw):
+        if self._follow():
+            if self.pending is not None:
+                map, angle = self.pending
+                if self.mosaic is not None:
+                    self.cached = self._redraw_from_mosaic(map, angle)
+                else:
+                    self.cached = self._redraw(map, angle)
+                self.pending = None
 
             image.alpha_composite(self.cached, self.at.tuple())
 
 
+def prefetch(renderer, widgets: Iterable[Widget], locations: List[Point]):
+    """Fetch all the tiles the map widgets will want along the route, before drawing starts, so it needn't wait"""
+    if not hasattr(renderer, "prefetch"):
+        return
+
+    tiles = set()
+    for widget in widgets:
+        if hasattr(widget, "map_tiles"):
+            tiles.update(widget.map_tiles(locations))
+
+    if tiles:
+        log(f"Fetching {len(tiles)} map tiles for the route")
+        fetched = renderer.prefetch(tiles)
+        log(f"... done - {fetched} weren't already in memory")
+
+
 def view_window(size, d):
     def f(n):
         start = max(0, min(d - size, n - int(size / 2)))
@@ -217,11 +297,8 @@ class MovingJourneyMap(Widget):
         self.cached_map_image = None
         self.cached_map = None
 
-    def _redraw(self):
-        journey = Journey()
-        self.timeseries.process(journey.accept)
-
-        bbox = journey.bounding_box
+    def _map(self, route: Route) -> geotiler.Map:
+        bbox = route.bounding_box
 
         map = geotiler.Map(
             extent=(
@@ -233,6 +310,14 @@ class MovingJourneyMap(Widget):
 
         # add self.size / 2 to each side of the map, so adding self.size overall
         map.size = (map.size[0] + self.size), (map.size[1] + self.size)
+        return map
+
+    def map_tiles(self, locations: List[Point]) -> Set[TileKey]:
+        return map_tiles(self._map(route_of(self.timeseries)))
+
+    def _redraw(self):
+        route = route_of(self.timeseries)
+        map = self._map(route)
 
         log(f"{self.__class__.__name__} Rendering backing map ({map.size}) (can be slow)")
 
@@ -240,10 +325,7 @@ class MovingJourneyMap(Widget):
 
         log(f"... done")
 
-        plots = [
-            map.rev_geocode((location.lon, location.lat))
-            for location in journey.locations if not self.privacy_zone.encloses(location)
-        ]
+        plots = route.outside(self.privacy_zone).pixels(map)
 
         draw = ImageDraw.Draw(map_image)
         draw.line(plots, fill=(255, 0, 0), width=4)
@@ -303,18 +385,22 @@ class Circuit(Widget):
 
     def draw(self, image: Image, draw: ImageDraw):
         if self.image is None:
-            journey = Journey()
-            self.framemeta.process(journey.accept)
+            route = route_of(self.framemeta)
 
-            self.bbox = journey.bounding_box
+            self.bbox = route.bounding_box
             self.size = self.bbox.size() * 1.1
 
             self.image = Image.new("RGBA", self.dimensions.tuple(), (0, 0, 0, 0))
             draw = ImageDraw.Draw(self.image)
 
-            points = [self.scale(p) for p in journey.locations if not self.privacy_zone.encloses(p)]
+            visible = route.outside(self.privacy_zone)
+            # as scale(), for all the points at once
+            points = np.stack([
+                ((visible.lats - self.bbox.min.lat) / self.size.x) * self.dimensions.x + self.dimensions.x / 20,
+                ((visible.lons - self.bbox.min.lon) / self.size.y) * self.dimensions.y + self.dimensions.y / 20,
+            ], axis=1).astype(np.int64)
 
-            self.outline.draw(draw, rdp(points, 1))
+            self.outline.draw(draw, [(x, y) for x, y in points[rdp_indices(points, 1)].tolist()])
 
         location = self.location()
         frame = self.image.copy()
@@ -0,0 +1,49 @@
+import contextlib
+from typing import Tuple, Optional, Dict, List
+
+from PIL import Image
+
+
+class ImagePool:
+    """Images to reuse between frames, rather than allocating a new one each time
+
+    Images are cleared to the requested fill when they are borrowed, so borrowers can treat them as new.
+    """
+
+    def __init__(self, keep: int = 4):
+        self.keep = keep
+        self.free: Dict[Tuple[str, Tuple[int, int]], List[Image.Image]] = {}
+        self.allocated = 0
+        self.reused = 0
+
+    def borrow(self, size: Tuple[int, int], fill: Optional[Tuple] = None, mode: str = "RGBA") -> Image.Image:
+        fill = fill if fill is not None else (0, 0, 0, 0) if mode == "RGBA" else 0
+        available = self.free.get((mode, size))
+
+        if available:
+            image = available.pop()
+            image.paste(fill, (0, 0, size[0], size[1]))
+            self.reused += 1
+            return image
+
+        self.allocated += 1
+        return Image.new(mode, size, fill)
+
+    def give_back(self, image: Image.Image):
+        available = self.free.setdefault((image.mode, image.size), [])
+        if len(available) < self.keep:
+            available.append(image)
+
+    @contextlib.contextmanager
+    def image(self, size: Tuple[int, int], fill: Optional[Tuple] = None, mode: str = "RGBA"):
+        image = self.borrow(size, fill, mode)
+        try:
+            yield image
+        finally:
+            self.give_back(image)
+
+    def __str__(self):
+        return f"ImagePool(Allocated: {self.allocated}, Reused: {self.reused})"
+
+
+default_pool = ImagePool()
@@ -2,7 +2,7 @@ from typing import Any
 
 from gopro_overlay.log import log
 from gopro_overlay.timing import PoorTimer
-from gopro_overlay.widgets.widgets import Widget
+from gopro_overlay.widgets.widgets import Widget, is_static
 
 
 class ProfiledWidget(Widget):
@@ -15,6 +15,9 @@ class ProfiledWidget(Widget):
         with self.timer.timing(doprint=False):
             self.widget.draw(image, draw)
 
+    def is_static(self) -> bool:
+        return is_static(self.widget)
+
 
 class WidgetProfiler:
 
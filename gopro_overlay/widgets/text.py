@@ -1,17 +1,137 @@
-from typing import Callable, Any, Tuple
+import dataclasses
+import weakref
+from collections import OrderedDict
+from typing import Callable, Any, Tuple, Dict, Optional
 
-from PIL import Image, ImageDraw
+import numpy as np
+from PIL import Image, ImageDraw, ImageChops
 
 from gopro_overlay.point import Coordinate
 from gopro_overlay.widgets.widgets import Widget
 
 
+@dataclasses.dataclass(frozen=True)
+class Glyph:
+    """Masks of one character, of its stroke and of its body, placed relative to the pen on the baseline"""
+    x: int
+    y: int
+    outline: np.ndarray
+    body: np.ndarray
+
+
+@dataclasses.dataclass(frozen=True)
+class Masks:
+    at: Coordinate
+    outline: Image.Image
+    body: Image.Image
+
+
+class GlyphAtlas:
+    """
+    Each character of a font drawn once, so that strings can be put together from the glyphs at the font's
+    (kerned) advances, rather than being rasterised from scratch, with their stroke, every time they change.
+
+    Masks are drawn the same way as ImageDraw.text would - all the strokes first, then all the bodies on top - so
+    colours are only applied when the string is drawn, and one atlas serves every colour of a font.
+    """
+
+    def __init__(self, font, stroke_width: int):
+        self.font = font
+        self.stroke_width = stroke_width
+        self.glyphs: Dict[str, Optional[Glyph]] = {}
+
+    def supports(self, anchor: str, direction: str) -> bool:
+        return direction == "ltr" and anchor[0] in "lmr" and anchor[1] in "asd"
+
+    def _mask(self, c: str, stroke_width: int, size: Tuple[int, int], at: Coordinate) -> Image.Image:
+        # draw the mask just as ImageDraw.text draws it - the stroke has its own mask, it isn't text + border
+        mask, offset = self.font.getmask2(c, "L", stroke_width=stroke_width, anchor="ls")
+        image = Image.new("L", size)
+        ImageDraw.Draw(image).draw.draw_bitmap((at.x + offset[0], at.y + offset[1]), mask, 255)
+        return image
+
+    def _glyph(self, c: str) -> Optional[Glyph]:
+        # getbbox can be a pixel or two short of what is drawn, so draw with a margin, then trim to what was
+        margin = self.stroke_width + 2
+        x0, y0, x1, y1 = self.font.getbbox(c, stroke_width=self.stroke_width, anchor="ls")
+        x0, y0, x1, y1 = x0 - margin, y0 - margin, x1 + margin, y1 + margin
+
+        size, at = (x1 - x0, y1 - y0), Coordinate(-x0, -y0)
+        outline = self._mask(c, self.stroke_width, size, at)
+        body = self._mask(c, 0, size, at)
+
+        drawn = ImageChops.lighter(outline, body).getbbox()
+        if drawn is None:
+            return None
+
+        return Glyph(
+            x0 + drawn[0], y0 + drawn[1],
+            np.asarray(outline.crop(drawn)),
+            np.asarray(body.crop(drawn))
+        )
+
+    def glyph(self, c: str) -> Optional[Glyph]:
+        try:
+            return self.glyphs[c]
+        except KeyError:
+            glyph = self.glyphs[c] = self._glyph(c)
+            return glyph
+
+    def masks(self, text: str, anchor: str) -> Optional[Masks]:
+        placed = []
+        for index, c in enumerate(text):
+            glyph = self.glyph(c)
+            if glyph is not None:
+                placed.append((int(self.font.getlength(text[:index])) + glyph.x, glyph.y, glyph))
+
+        if not placed:
+            return None
+
+        left = min(x for x, _, _ in placed)
+        top = min(y for _, y, _ in placed)
+        right = max(x + g.outline.shape[1] for x, _, g in placed)
+        bottom = max(y + g.outline.shape[0] for _, y, g in placed)
+
+        outline = np.zeros((bottom - top, right - left), dtype=np.uint8)
+        body = np.zeros_like(outline)
+        for x, y, glyph in placed:
+            h, w = glyph.outline.shape
+            region = (slice(y - top, y - top + h), slice(x - left, x - left + w))
+            np.maximum(outline[region], glyph.outline, out=outline[region])
+            np.maximum(body[region], glyph.body, out=body[region])
+
+        # where the font would put the anchor, relative to the start of the baseline
+        ax, ay, _, _ = self.font.getbbox(text, stroke_width=self.stroke_width, anchor=anchor)
+        bx, by, _, _ = self.font.getbbox(text, stroke_width=self.stroke_width, anchor="ls")
+
+        return Masks(
+            at=Coordinate(left + ax - bx, top + ay - by),
+            outline=Image.fromarray(outline, mode="L"),
+            body=Image.fromarray(body, mode="L"),
+        )
+
+
+_atlases: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def glyph_atlas(font, stroke_width: int) -> GlyphAtlas:
+    """The atlas for this font and stroke, shared by all the widgets that use them"""
+    by_stroke = _atlases.setdefault(font, {})
+    atlas = by_stroke.get(stroke_width, None)
+    if atlas is None:
+        atlas = by_stroke[stroke_width] = GlyphAtlas(font, stroke_width)
+    return atlas
+
+
 class CachingText(Widget):
+    """Text whose recent values are kept as ready-drawn images - suits values that repeat, or change slowly"""
+
     def __init__(self, at: Coordinate, value: Callable, font,
                  align="left", direction="ltr",
                  fill=None,
                  stroke=(0, 0, 0),
                  stroke_width=2,
+                 cache_size=256,
                  ):
         self.at = at
         self.value = value
@@ -21,50 +141,72 @@ class CachingText(Widget):
         self.fill = fill if fill else (255, 255, 255)
         self.stroke = stroke
         self.stroke_width = stroke_width
-        self.cache = {}
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.atlas = glyph_atlas(font, stroke_width)
 
-    def draw(self, image: Image, draw: ImageDraw):
+    def _render(self, text: str) -> Optional[Dict[str, Any]]:
+        if self.atlas.supports(self.anchor, self.direction):
+            masks = self.atlas.masks(text, self.anchor)
+            if masks is None:
+                return None
+            backing_image = Image.new(mode="RGBA", size=masks.outline.size)
+            backing_draw = ImageDraw.Draw(backing_image)
+            if self.stroke_width > 0:
+                backing_draw.bitmap((0, 0), masks.outline, fill=self.stroke)
+            backing_draw.bitmap((0, 0), masks.body, fill=self.fill)
+            return {
+                "at": masks.at,
+                "image": backing_image
+            }
 
-        text = self.value()
+        x0, y0, x1, y1 = self.font.getbbox(
+            text=text,
+            stroke_width=self.stroke_width,
+            anchor=self.anchor,
+            direction=None if self.direction == "ltr" else self.direction
+        )
 
-        if text is None:
-            raise ValueError("Refusing to draw text with value of 'None'")
+        if x0 < 0:
+            x1 = x1 + abs(x0)
+        if y0 < 0:
+            y1 = y1 + abs(x0)
 
-        cached = self.cache.get(text, None)
+        backing_image = Image.new(mode="RGBA", size=(x1, y1))
+        backing_draw = ImageDraw.Draw(backing_image)
+
+        backing_draw.text(
+            (abs(x0), 0),
+            text,
+            anchor=self.anchor,
+            direction=None if self.direction == "ltr" else self.direction,
+            font=self.font,
+            fill=self.fill,
+            stroke_width=self.stroke_width,
+            stroke_fill=self.stroke
+        )
+        return {
+            "at": Coordinate(x0 if x0 < 0 else 0, y0 if y0 < 0 else 0),
+            "image": backing_image
+        }
 
-        if cached is None:
-            x0, y0, x1, y1 = self.font.getbbox(
-                text=text,
-                stroke_width=self.stroke_width,
-                anchor=self.anchor,
-                direction=None if self.direction == "ltr" else self.direction
-            )
+    def draw(self, image: Image, draw: ImageDraw):
 
-            if x0 < 0:
-                x1 = x1 + abs(x0)
-            if y0 < 0:
-                y1 = y1 + abs(x0)
+        text = self.value()
 
-            backing_image = Image.new(mode="RGBA", size=(x1, y1))
-            backing_draw = ImageDraw.Draw(backing_image)
+        if text is None:
+            raise ValueError("Refusing to draw text with value of 'None'")
 
-            backing_draw.text(
-                (abs(x0), 0),
-                text,
-                anchor=self.anchor,
-                direction=None if self.direction == "ltr" else self.direction,
-                font=self.font,
-                fill=self.fill,
-                stroke_width=self.stroke_width,
-                stroke_fill=self.stroke
-            )
-            cached = {
-                "at": Coordinate(x0 if x0 < 0 else 0, y0 if y0 < 0 else 0),
-                "image": backing_image
-            }
-            self.cache[text] = cached
+        if text in self.cache:
+            self.cache.move_to_end(text)
+            cached = self.cache[text]
+        else:
+            cached = self.cache[text] = self._render(text)
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
 
-        image.alpha_composite(cached["image"], (self.at + cached["at"]).tuple())
+        if cached is not None:
+            image.alpha_composite(cached["image"], (self.at + cached["at"]).tuple())
 
 
 class Text(Widget):
@@ -85,11 +227,23 @@ class Text(Widget):
         self.fill = fill if fill else (255, 255, 255)
         self.stroke = stroke if stroke else (0, 0, 0)
         self.stroke_width = stroke_width
+        self.atlas = glyph_atlas(font, stroke_width)
 
     def draw(self, image: Image, draw: ImageDraw):
+        text = self.value()
+
+        if self.atlas.supports(self.anchor, self.direction):
+            masks = self.atlas.masks(text, self.anchor)
+            if masks is not None:
+                at = (self.at + masks.at).tuple()
+                if self.stroke_width > 0:
+                    draw.bitmap(at, masks.outline, fill=(0, 0, 0))
+                draw.bitmap(at, masks.body, fill=self.fill)
+            return
+
         draw.text(
             self.at.tuple(),
-            self.value(),
+            text,
             anchor=self.anchor,
             direction=None if self.direction == "ltr" else self.direction,
             font=self.font,
@@ -2,7 +2,7 @@ import functools
 import math
 import os
 from importlib.resources import files, as_file
-from typing import Tuple, List
+from typing import Tuple, List, Iterator
 
 from PIL import Image, ImageDraw
 
@@ -10,17 +10,42 @@ from gopro_overlay import icons
 from gopro_overlay.dimensions import Dimension
 from gopro_overlay.functional import compose
 from gopro_overlay.point import Coordinate
+from gopro_overlay.widgets.pool import ImagePool, default_pool
 
 
 class Widget:
     def draw(self, image: Image, draw: ImageDraw):
         raise NotImplemented("not implemented")
 
+    def is_static(self) -> bool:
+        """Will this widget draw exactly the same thing every frame?"""
+        return False
+
+
+def is_static(widget) -> bool:
+    return widget.is_static() if hasattr(widget, "is_static") else False
+
 
 class EmptyDrawable(Widget):
     def draw(self, image: Image, draw: ImageDraw):
         pass
 
+    def is_static(self) -> bool:
+        return True
+
+
+class Static(Widget):
+    """Declare that a widget draws the same thing every frame, so it only needs to be drawn once"""
+
+    def __init__(self, widget):
+        self.widget = widget
+
+    def draw(self, image: Image, draw: ImageDraw):
+        self.widget.draw(image, draw)
+
+    def is_static(self) -> bool:
+        return True
+
 
 class Composite(Widget):
 
@@ -31,6 +56,9 @@ class Composite(Widget):
         for w in self.widgets:
             w.draw(image, draw)
 
+    def is_static(self) -> bool:
+        return all(is_static(w) for w in self.widgets)
+
 
 class Drawable(Widget):
     def __init__(self, at, drawable):
@@ -40,6 +68,9 @@ class Drawable(Widget):
     def draw(self, image: Image, draw: ImageDraw):
         image.alpha_composite(self.drawable, self.at.tuple())
 
+    def is_static(self) -> bool:
+        return True
+
 
 def icon(file, at, transform=lambda x: x) -> Widget:
     if os.path.exists(file):
@@ -107,6 +138,9 @@ class DrawTranslate:
     def text(self, xy, text, **kwargs):
         self.draw.text(xy=self._txy(xy), text=text, **kwargs)
 
+    def bitmap(self, xy, bitmap, **kwargs):
+        self.draw.bitmap(self._txy(xy), bitmap, **kwargs)
+
     def rounded_rectangle(self, xy, *args, **kwargs):
         self.draw.rounded_rectangle([self._txy(pair) for pair in xy], *args, **kwargs)
 
@@ -150,6 +184,9 @@ class Translate(Widget):
 
         self.widget.draw(ivp, dvp)
 
+    def is_static(self) -> bool:
+        return is_static(self.widget)
+
 
 class Frame(Widget):
     """
@@ -163,8 +200,10 @@ class Frame(Widget):
                  outline: Tuple = None,
                  fill: Tuple = None,
                  child: Widget = EmptyDrawable(),
-                 fade_out: int = 0) -> None:
+                 fade_out: int = 0,
+                 pool: ImagePool = default_pool) -> None:
         self.child = child
+        self.pool = pool
         self.corner_radius = corner_radius
         self.fill = fill
         self.outline = outline
@@ -208,21 +247,24 @@ class Frame(Widget):
     def draw(self, image: Image, draw: ImageDraw):
         self._maybe_init()
 
-        rect = Image.new('RGBA', (self.dimensions.x, self.dimensions.y), self.fill)
-        rect_draw = ImageDraw.Draw(rect)
+        with self.pool.image((self.dimensions.x, self.dimensions.y), self.fill) as rect:
+            rect_draw = ImageDraw.Draw(rect)
 
-        self.child.draw(rect, rect_draw)
+            self.child.draw(rect, rect_draw)
 
-        if self.outline is not None:
-            rect_draw.rounded_rectangle(
-                ((0, 0), (self.dimensions.x - 1, self.dimensions.y - 1)),
-                radius=self.corner_radius,
-                outline=self.outline
-            )
+            if self.outline is not None:
+                rect_draw.rounded_rectangle(
+                    ((0, 0), (self.dimensions.x - 1, self.dimensions.y - 1)),
+                    radius=self.corner_radius,
+                    outline=self.outline
+                )
 
-        rect.putalpha(self.mask)
+            rect.putalpha(self.mask)
 
-        image.alpha_composite(rect, (0, 0))
+            image.alpha_composite(rect, (0, 0))
+
+    def is_static(self) -> bool:
+        return is_static(self.child)
 
 
 class FrameSupplier:
@@ -240,15 +282,107 @@ class SimpleFrameSupplier(FrameSupplier):
         return Image.new("RGBA", (self._dimensions.x, self._dimensions.y), self._background)
 
 
+class StaticLayer:
+    """A run of static widgets, drawn once, and kept as just the tiles that have something in them"""
+
+    tile_size = 128
+
+    def __init__(self, widgets: List[Widget]):
+        self.widgets = widgets
+        self.size = None
+        self.tiles = []
+
+    def _render(self, size: Tuple[int, int]):
+        layer = Image.new("RGBA", size, (0, 0, 0, 0))
+        draw = ImageDraw.Draw(layer)
+        for w in self.widgets:
+            w.draw(layer, draw)
+
+        self.tiles = []
+        for y in range(0, size[1], self.tile_size):
+            for x in range(0, size[0], self.tile_size):
+                tile = layer.crop((x, y, min(x + self.tile_size, size[0]), min(y + self.tile_size, size[1])))
+                bbox = tile.getbbox()
+                if bbox is not None:
+                    self.tiles.append(((x + bbox[0], y + bbox[1]), tile.crop(bbox)))
+        self.size = size
+
+    def draw(self, image: Image, draw: ImageDraw):
+        if self.size != image.size:
+            self._render(image.size)
+
+        for xy, tile in self.tiles:
+            image.alpha_composite(tile, xy)
+
+
+def _flatten(widget, offset: Coordinate):
+    """Pull apart Composites and Translates, so static and dynamic widgets can be separated, keeping draw order"""
+    if is_static(widget):
+        yield True, widget, offset
+    elif type(widget) is Composite:
+        for w in widget.widgets:
+            yield from _flatten(w, offset)
+    elif type(widget) is Translate:
+        yield from _flatten(widget.widget, offset + widget.at)
+    else:
+        yield False, widget, offset
+
+
+def walk(widget) -> Iterator[Widget]:
+    """This widget, and all the widgets held inside it, by Composites, Translates, Frames and the like"""
+    yield widget
+    for name in ("widget", "child"):
+        inner = getattr(widget, name, None)
+        if isinstance(inner, Widget):
+            yield from walk(inner)
+    for inner in getattr(widget, "widgets", ()):
+        if isinstance(inner, Widget):
+            yield from walk(inner)
+
+
+def _positioned(widget, offset: Coordinate):
+    return widget if offset == Coordinate(0, 0) else Translate(offset, widget)
+
+
 class Scene:
+    """Draws a list of widgets onto each frame.
+
+    Runs of static widgets are drawn just once, into cached layers, which are composited in their place between the
+    dynamic widgets - only the parts of each layer that have something in them are composited each frame.
+    """
 
     def __init__(self, widgets: List[Widget]):
         self._widgets = widgets
+        self._layers = self._layer(widgets)
+
+    @staticmethod
+    def _layer(widgets: List[Widget]) -> List[Widget]:
+        layers = []
+        statics = []
+
+        for w in widgets:
+            for static, widget, offset in _flatten(w, Coordinate(0, 0)):
+                if static:
+                    statics.append(_positioned(widget, offset))
+                else:
+                    if statics:
+                        layers.append(StaticLayer(statics))
+                        statics = []
+                    layers.append(_positioned(widget, offset))
+
+        if statics:
+            layers.append(StaticLayer(statics))
+
+        return layers
+
+    def widgets(self) -> Iterator[Widget]:
+        for w in self._widgets:
+            yield from walk(w)
 
     def draw(self, image: Image.Image) -> Image.Image:
         draw = ImageDraw.Draw(image)
 
-        for w in self._widgets:
+        for w in self._layers:
             w.draw(image, draw)
 
         return image
@@ -9,13 +9,13 @@ README = (HERE / "README-PYPI.md").read_text()
 requires = [
     "pillow==10.1.0",
     "pint==0.22",
+    "numpy==1.26.4",
     "geotiler==0.15",
     "gpxpy==1.6.1",
     "fitdecode==0.10.0",
     "geographiclib==1.52",
     "progressbar2==4.2.0",
     "requests==2.31.0",
-    "sqlitedict==2.1.0",
 ]
 
 test_requirements = [
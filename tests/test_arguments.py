@@ -144,6 +144,37 @@ def test_buffers():
     assert do_args("--double-buffer").double_buffer
 
 
+def test_buffer_depth():
+    assert do_args().buffer_depth == 1
+    assert do_args("--double-buffer").buffer_depth == 2
+    assert do_args("--buffer-depth", "6").buffer_depth == 6
+    assert do_args("--double-buffer", "--buffer-depth", "4").buffer_depth == 4
+    with pytest.raises(SystemExit):
+        do_args("--buffer-depth", "0")
+    with pytest.raises(SystemExit):
+        do_args("--workers", "2", "--buffer-depth", "3")
+
+
+def test_workers():
+    assert do_args().workers == 1
+    assert do_args("--workers", "8").workers == 8
+    with pytest.raises(SystemExit):
+        do_args("--workers", "0")
+    with pytest.raises(SystemExit):
+        do_args("--workers", "2", "--double-buffer")
+    with pytest.raises(SystemExit):
+        do_args("--workers", "2", "--profiler")
+
+
+def test_skip_unchanged_frames():
+    assert not do_args().skip_unchanged_frames
+    assert do_args("--skip-unchanged-frames").skip_unchanged_frames
+    with pytest.raises(SystemExit):
+        do_args("--skip-unchanged-frames", "--double-buffer")
+    with pytest.raises(SystemExit):
+        do_args("--skip-unchanged-frames", "--workers", "2")
+
+
 def test_ffmpeg():
     assert do_args().ffmpeg_dir is None
     assert do_args("--ffmpeg-dir", "c:/blah/blah").ffmpeg_dir == Path("c:/blah/blah")
@@ -5,7 +5,7 @@ from multiprocessing.shared_memory import SharedMemory
 import pytest
 from PIL import Image, ImageDraw
 
-from gopro_overlay.buffering import Frame
+from gopro_overlay.buffering import Frame, RingBuffer, SingleBuffer
 from gopro_overlay.dimensions import Dimension
 from tests.approval import approve_image
 
@@ -52,3 +52,69 @@ def test_drawing_frame_custom_background(shm, quit_flag):
 
         frame.draw(doit)
         return frame.copy()
+
+
+def test_ring_buffer_writes_frames_in_order(tmp_path):
+    small = Dimension(4, 4)
+    output = tmp_path / "frames.raw"
+
+    with open(output, "wb") as writer:
+        with RingBuffer(small, (0, 0, 0, 0), writer, depth=3) as buffer:
+            for i in range(20):
+                buffer.draw(lambda image: image.putpixel((0, 0), (i, 0, 0, 255)))
+        stats = buffer.stats()
+
+    data = output.read_bytes()
+    frame_size = small.x * small.y * 4
+    assert len(data) == frame_size * 20
+    assert [data[i * frame_size] for i in range(20)] == list(range(20))
+
+    assert stats.frames == 20
+    assert sum(stats.occupancy) == 20
+    # how many drawn frames were still waiting to be written, as each was drawn - from empty, to all 3 slots full
+    assert len(stats.occupancy) == 4
+
+
+def test_ring_buffer_clears_slots_after_writing(tmp_path):
+    small = Dimension(2, 2)
+    output = tmp_path / "frames.raw"
+
+    with open(output, "wb") as writer:
+        with RingBuffer(small, (0, 0, 0, 0), writer, depth=2) as buffer:
+            buffer.draw(lambda image: image.putpixel((0, 0), (255, 255, 255, 255)))
+            for _ in range(3):
+                buffer.draw(lambda image: None)
+
+    data = output.read_bytes()
+    assert data[0:4] == bytes([255, 255, 255, 255])
+    assert data[16:] == bytes(48)
+
+
+def test_ring_buffer_depth_must_be_positive():
+    with pytest.raises(ValueError):
+        RingBuffer(Dimension(2, 2), (0, 0, 0, 0), None, depth=0)
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.frames = []
+        self.written = []
+
+    def write(self, data):
+        self.written.append(data)
+        self.frames.append(bytes(data))
+
+
+def test_single_buffer_writes_image_memory_without_copying():
+    small = Dimension(2, 2)
+    writer = RecordingWriter()
+
+    with SingleBuffer(small, (0, 0, 255, 255), writer) as buffer:
+        buffer.draw(lambda image: image.alpha_composite(Image.new("RGBA", (1, 1), (255, 0, 0, 255)), (1, 1)))
+        buffer.draw(lambda image: ImageDraw.Draw(image).point((0, 0), (0, 255, 0, 255)))
+
+    assert writer.frames == [
+        bytes([0, 0, 255, 255] * 3 + [255, 0, 0, 255]),
+        bytes([0, 255, 0, 255] + [0, 0, 255, 255] * 3),
+    ]
+    assert all(isinstance(data, memoryview) for data in writer.written)
@@ -0,0 +1,187 @@
+import datetime
+import random
+
+import numpy as np
+
+from gopro_overlay.columns import ColumnStore, NumericColumn, ObjectColumn, DatetimeColumn, EntryView, quantity_maker
+from gopro_overlay import fake
+from gopro_overlay.entry import Entry
+from gopro_overlay.framemeta import FrameMeta
+from gopro_overlay.point import Point
+from gopro_overlay.timeunits import timeunits, Timeunit
+from gopro_overlay.units import units
+from tests.test_timeseries import datetime_of
+
+
+def store_of(*entries: Entry) -> ColumnStore:
+    return ColumnStore.from_entries(list(range(len(entries))), list(entries))
+
+
+def test_quantities_are_stored_as_numbers_with_units_once():
+    store = store_of(
+        Entry(datetime_of(0), speed=units.Quantity(1.5, units.mps), packet=units.Quantity(1)),
+        Entry(datetime_of(1), speed=units.Quantity(2.5, units.mps), packet=units.Quantity(2)),
+    )
+
+    assert isinstance(store.columns["speed"], NumericColumn)
+    assert store.columns["speed"].values.dtype == np.float64
+    assert store.columns["packet"].values.dtype == np.int64
+
+    assert store.value("speed", 1) == units.Quantity(2.5, units.mps)
+    assert store.value("speed", 1).units == units.mps
+    assert store.value("packet", 1).magnitude == 2
+    assert type(store.value("packet", 1).magnitude) is int
+
+
+def test_plain_numbers_stay_plain():
+    store = store_of(Entry(datetime_of(0), lat=1.0, gpsfix=3))
+    assert store.value("lat", 0) == 1.0
+    assert store.value("gpsfix", 0) == 3
+    assert type(store.value("gpsfix", 0)) is int
+
+
+def test_missing_values_are_none():
+    store = store_of(
+        Entry(datetime_of(0), hr=units.Quantity(100, units.bpm)),
+        Entry(datetime_of(1)),
+    )
+    assert store.value("hr", 1) is None
+    assert store.value("nothing", 0) is None
+    assert store.items(1) == {}
+
+
+def test_mixed_values_fall_back_to_objects():
+    store = store_of(
+        Entry(datetime_of(0), alt=units.Quantity(1, units.m), point=Point(1, 2)),
+        Entry(datetime_of(1), alt=units.Quantity(1, units.feet)),
+    )
+    assert isinstance(store.columns["alt"], ObjectColumn)
+    assert isinstance(store.columns["point"], ObjectColumn)
+    assert store.value("alt", 1) == units.Quantity(1, units.feet)
+    assert store.value("point", 0) == Point(1, 2)
+
+
+def test_updates_convert_column_when_needed():
+    store = store_of(
+        Entry(datetime_of(0), alt=units.Quantity(1, units.m)),
+        Entry(datetime_of(1), alt=units.Quantity(2, units.m)),
+    )
+
+    store.set("alt", 0, units.Quantity(1.5, units.m))
+    assert store.value("alt", 0) == units.Quantity(1.5, units.m)
+    assert store.value("alt", 1) == units.Quantity(2, units.m)
+
+    store.set("alt", 1, units.Quantity(3, units.feet))
+    assert store.value("alt", 1) == units.Quantity(3, units.feet)
+    assert store.value("alt", 0) == units.Quantity(1.5, units.m)
+
+    store.set("alt", 0, None)
+    assert store.value("alt", 0) is None
+
+    store.set("new", 1, "thing")
+    assert store.value("new", 1) == "thing"
+    assert store.value("new", 0) is None
+
+
+def test_datetimes_round_trip():
+    tz = datetime.timezone(datetime.timedelta(hours=2))
+    values = [
+        datetime.datetime(2022, 7, 9, 7, 9, 31, 123456, tzinfo=tz),
+        datetime.datetime(1960, 1, 1, 0, 0, 0, 1, tzinfo=tz),
+    ]
+    column = DatetimeColumn.build(values)
+    assert column.micros is not None
+    assert [column.get(0), column.get(1)] == values
+    assert column.get(0).tzinfo is tz
+
+    mixed = DatetimeColumn.build([datetime_of(0), datetime.datetime(2022, 1, 1)])
+    assert mixed.objects is not None
+    assert mixed.get(1) == datetime.datetime(2022, 1, 1)
+
+
+def test_entry_views_update_framemeta():
+    fm = FrameMeta()
+    fm.add(timeunits(seconds=1), Entry(datetime_of(1), speed=units.Quantity(1, units.mps)))
+    fm.add(timeunits(seconds=0), Entry(datetime_of(0), speed=units.Quantity(0, units.mps)))
+
+    fm.process(lambda e: {"dist": e.speed * units.Quantity(1, units.s)})
+
+    assert fm.get(timeunits(seconds=1)).dist == units.Quantity(1, units.m)
+    assert fm.frames[timeunits(seconds=0)].dt == datetime_of(0)
+    assert fm.framelist == [timeunits(seconds=0), timeunits(seconds=1)]
+    assert fm[-1].speed == units.Quantity(1, units.mps)
+
+
+def test_adding_after_reading_keeps_existing_data():
+    fm = FrameMeta()
+    fm.add(timeunits(seconds=0), Entry(datetime_of(0), a=1))
+    assert len(fm) == 1
+    fm.get(timeunits(seconds=0)).update(b=2)
+
+    fm.add(timeunits(seconds=1), Entry(datetime_of(1), a=3))
+    assert len(fm) == 2
+    assert fm.get(timeunits(seconds=0)).items == {"a": 1, "b": 2}
+    assert fm.get(timeunits(seconds=1)).items == {"a": 3}
+
+
+def test_clone_is_independent():
+    fm = FrameMeta()
+    fm.add(timeunits(seconds=0), Entry(datetime_of(0), a=1))
+
+    clone = fm.clone()
+    clone.get(timeunits(seconds=0)).update(a=2)
+
+    assert fm.get(timeunits(seconds=0)).a == 1
+    assert clone.get(timeunits(seconds=0)).a == 2
+
+
+def test_quantities_are_made_as_pint_makes_them():
+    make = quantity_maker(units.Quantity, units.mps._units)
+
+    made = make(2.5)
+    assert type(made) is units.Quantity
+    assert vars(made) == vars(units.Quantity(2.5, units.mps))
+    assert made + units.Quantity(1, units.mps) == units.Quantity(3.5, units.mps)
+    assert made.to("kph").magnitude == 9.0
+
+    assert quantity_maker(units.Quantity, units.mps._units) is make
+
+
+def test_entry_views_read_columns_directly():
+    store = store_of(
+        Entry(datetime_of(0), speed=units.Quantity(1.5, units.mps), point=Point(1, 2)),
+        Entry(datetime_of(1), speed=None, point=Point(3, 4)),
+    )
+    view = EntryView(store, 0)
+
+    assert view.speed == units.Quantity(1.5, units.mps)
+    assert view.point == Point(1, 2)
+    assert view.missing is None
+    assert EntryView(store, 1).speed is None
+    assert not hasattr(view, "_other")
+
+
+def test_adding_after_reading_is_same_as_adding_all_at_once():
+    source = fake.fake_framemeta(datetime.timedelta(seconds=30), step=datetime.timedelta(seconds=0.5),
+                                 rng=random.Random(3))
+    entries = [(Timeunit(us), source.store.entry(row)) for row, us in enumerate(source.store.times.tolist())]
+    entries[7][1].update(extra="text", speed=None)
+    entries[20][1].update(speed=units.Quantity(3, units.kph))
+
+    at_once = FrameMeta()
+    for t, e in entries:
+        at_once.add(t, e)
+
+    in_parts = FrameMeta()
+    # later times first, then earlier ones in between, then some times again
+    for part in [entries[30:], entries[::2], entries[1::2], entries[10:12]]:
+        for t, e in part:
+            in_parts.add(t, e)
+        assert len(in_parts) > 0
+
+    assert in_parts.framelist == at_once.framelist
+    for row in range(len(at_once)):
+        assert in_parts[row].dt == at_once[row].dt
+        assert in_parts[row].items == at_once[row].items
+    assert isinstance(in_parts.store.columns["hr"], NumericColumn)
+    assert in_parts.store.dts.micros is not None
@@ -1,3 +1,4 @@
+import pickle
 from datetime import timedelta
 
 from gopro_overlay.entry import Entry
@@ -26,3 +27,15 @@ def test_interpolating_quantity():
     e2 = Entry(datetime_of(10), alt=metres(20))
 
     assert e1.interpolate(e2, datetime_of(1)).alt == metres(11)
+
+
+def test_entries_are_compact_and_pickle():
+    entry = Entry(datetime_of(0), alt=metres(10), hr=None)
+
+    assert not hasattr(entry, "__dict__")
+    assert entry.items == {"alt": metres(10)}
+    assert entry.hr is None
+
+    copied = pickle.loads(pickle.dumps(entry))
+    assert copied.dt == entry.dt
+    assert copied.alt == metres(10)
@@ -11,8 +11,9 @@ from PIL import Image
 from gopro_overlay import functional
 from gopro_overlay.dimensions import Dimension
 from gopro_overlay.ffmpeg import FFMPEG
-from gopro_overlay.ffmpeg_gopro import FFMPEGGoPro
-from gopro_overlay.ffmpeg_overlay import FFMPEGOverlay, FFMPEGOptions, FFMPEGOverlayVideo
+from gopro_overlay.ffmpeg_gopro import FFMPEGGoPro, ProbeCache
+from gopro_overlay.ffmpeg_overlay import FFMPEGOverlay, FFMPEGOptions, FFMPEGOverlayVideo, FFMPEGSegment, \
+    FFMPEGJoinSegments
 from gopro_overlay.timeunits import timeunits
 from tests.test_timeseries import datetime_of
 
@@ -156,6 +157,131 @@ def test_parsing_stream_information_from_dji():
     assert streams.data is None
 
 
+def counting_invoke(*responses: Invocation):
+    invoke = fake_invoke(*responses)
+    invocations = []
+
+    def invoked(given_args: List[str]):
+        invocations.append(given_args)
+        return invoke(given_args)
+
+    return invoked, invocations
+
+
+def test_stream_information_is_only_probed_once():
+    def stat(file):
+        return stat_result([000, 1234, 123, 1, 1000, 1000, 9876, 10, 20, 30])
+
+    invoke, invocations = counting_invoke(
+        Invocation(
+            args=["ffprobe", "-hide_banner", "-print_format", "json", "-show_streams", "whatever"],
+            stdout=ffprobe_output_dji
+        ),
+    )
+
+    ffmpeg_gopro = FFMPEGGoPro(FFMPEG(invoke_fn=invoke))
+
+    first = ffmpeg_gopro.find_recording(Path("whatever"), stat=stat)
+    second = ffmpeg_gopro.find_recording(Path("whatever"), stat=stat)
+
+    assert first == second
+    assert len(invocations) == 1
+
+    def changed(file):
+        return stat_result([000, 1234, 123, 1, 1000, 1000, 9876, 10, 21, 30])
+
+    ffmpeg_gopro.find_recording(Path("whatever"), stat=changed)
+    assert len(invocations) == 2
+
+
+def test_stream_information_is_kept_on_disk(tmp_path):
+    def stat(file):
+        return stat_result([000, 1234, 123, 1, 1000, 1000, 9876, 10, 20, 30])
+
+    invoke, invocations = counting_invoke(
+        Invocation(
+            args=["ffprobe", "-hide_banner", "-print_format", "json", "-show_streams", "whatever"],
+            stdout=ffprobe_output_dji
+        ),
+    )
+
+    location = tmp_path / "ffprobe.json"
+
+    first = FFMPEGGoPro(FFMPEG(invoke_fn=invoke), probes=ProbeCache(location)).find_recording(Path("whatever"), stat=stat)
+    second = FFMPEGGoPro(FFMPEG(invoke_fn=invoke), probes=ProbeCache(location)).find_recording(Path("whatever"), stat=stat)
+
+    assert (first.video, first.audio, first.data) == (second.video, second.audio, second.data)
+    assert len(invocations) == 1
+
+
+def test_finding_many_recordings(tmp_path):
+    files = [tmp_path / f"GH0{i}0001.MP4" for i in range(5)]
+    for f in files:
+        f.write_bytes(b"")
+
+    invoke, invocations = counting_invoke(*[
+        Invocation(
+            args=["ffprobe", "-hide_banner", "-print_format", "json", "-show_streams", str(f)],
+            stdout=ffprobe_output_dji
+        ) for f in files
+    ])
+
+    recordings = FFMPEGGoPro(FFMPEG(invoke_fn=invoke)).find_recordings(files, workers=3)
+
+    assert [r.location for r in recordings] == files
+    assert len(invocations) == 5
+
+
+def test_probes_found_together_are_saved_once(tmp_path):
+    files = [tmp_path / f"GH0{i}0001.MP4" for i in range(5)]
+    for f in files:
+        f.write_bytes(b"")
+
+    invoke, invocations = counting_invoke(*[
+        Invocation(
+            args=["ffprobe", "-hide_banner", "-print_format", "json", "-show_streams", str(f)],
+            stdout=ffprobe_output_dji
+        ) for f in files
+    ])
+
+    location = tmp_path / "ffprobe.json"
+    probes = ProbeCache(location)
+    saves = []
+    save = probes._save
+    probes._save = lambda: (saves.append(len(probes.pending)), save())
+
+    FFMPEGGoPro(FFMPEG(invoke_fn=invoke), probes=probes).find_recordings(files, workers=3)
+
+    assert saves == [5]
+    assert len(ProbeCache(location)._read()) == 5
+
+
+def test_saved_probes_keep_those_of_others_and_drop_stale(tmp_path):
+    kept, changed, deleted = tmp_path / "kept.MP4", tmp_path / "changed.MP4", tmp_path / "deleted.MP4"
+    for f in (kept, changed, deleted):
+        f.write_bytes(b"")
+
+    location = tmp_path / "ffprobe.json"
+    ours, theirs = ProbeCache(location), ProbeCache(location)
+
+    assert ours.get("anything") is None
+    theirs.put(ProbeCache.key(kept, os.stat(kept)), {"file": "kept"})
+    theirs.put(ProbeCache.key(changed, os.stat(changed)), {"file": "changed"})
+    theirs.put(ProbeCache.key(deleted, os.stat(deleted)), {"file": "deleted"})
+
+    changed.write_bytes(b"longer")
+    deleted.unlink()
+    elsewhere = "/no/such/card/GH010001.MP4|1|2.0"
+
+    with ours.batch():
+        ours.put(elsewhere, {"file": "elsewhere"})
+        ours.put(ProbeCache.key(changed, os.stat(changed)), {"file": "changed again"})
+        assert ProbeCache(location)._read() == theirs.probes
+
+    saved = {probe["file"] for probe in ProbeCache(location)._read().values()}
+    assert saved == {"kept", "changed again", "elsewhere"}
+
+
 class FakePopen:
     def __init__(self):
         self.stdin = BytesIO()
@@ -283,6 +409,113 @@ def test_ffmpeg_overlay_execute_options():
     ]
 
 
+def test_ffmpeg_overlay_execute_skip_unchanged():
+    fake = FakeExecution()
+
+    ffmpeg = FFMPEGOverlayVideo(
+        ffmpeg=FFMPEG(),
+        input=Path("input"),
+        output=Path("output"),
+        overlay_size=Dimension(3, 4),
+        execution=fake,
+        creation_time=datetime_of(1231233223.12344),
+        skip_unchanged=True
+    )
+
+    with ffmpeg.generate() as writer:
+        writer.write(b"\x00" * 48)
+        writer.write(b"\x00" * 48)
+
+    assert writer.frames == 2
+    assert writer.sent == 1
+
+    assert fake.args == [
+        "ffmpeg",
+        "-y",
+        "-hide_banner",
+        "-loglevel", "info",
+        "-i", "input",  # input 0
+        "-f", "matroska",  # timestamped frames, with size & pixel format
+        "-i", "-",  # input 1
+        "-filter_complex", "[0:v][1:v]overlay",
+        "-vcodec", "libx264",
+        "-preset", "veryfast",
+        '-metadata', 'creation_time=2009-01-06T09:13:43.123440+00:00',
+        "output"
+    ]
+
+
+def test_ffmpeg_segment_execute():
+    fake = FakeExecution()
+
+    ffmpeg = FFMPEGSegment(
+        ffmpeg=FFMPEG(),
+        output=Path("segment.mov"),
+        overlay_size=Dimension(3, 4),
+        execution=fake,
+    )
+
+    with ffmpeg.generate():
+        pass
+
+    assert fake.args == [
+        "ffmpeg",
+        "-hide_banner",
+        "-y",
+        "-loglevel", "info",
+        "-f", "rawvideo",
+        "-framerate", "10.0",
+        "-s", "3x4",
+        "-pix_fmt", "rgba",
+        "-i", "-",
+        "-vcodec", "qtrle",  # lossless, keeps alpha
+        "segment.mov"
+    ]
+
+
+def test_ffmpeg_join_segments_overlay():
+    join = FFMPEGJoinSegments(
+        ffmpeg=FFMPEG(),
+        output=Path("output"),
+        creation_time=datetime_of(1231233223.12344)
+    )
+
+    assert join.command(Path("list.txt")) == [
+        "-hide_banner",
+        "-y",
+        "-hide_banner",
+        "-loglevel", "info",
+        "-f", "concat", "-safe", "0", "-i", "list.txt",
+        "-r", "30",
+        "-vcodec", "libx264",
+        "-preset", "veryfast",
+        '-metadata', 'creation_time=2009-01-06T09:13:43.123440+00:00',
+        "output"
+    ]
+
+
+def test_ffmpeg_join_segments_onto_video():
+    join = FFMPEGJoinSegments(
+        ffmpeg=FFMPEG(),
+        output=Path("output"),
+        input=Path("input"),
+        creation_time=datetime_of(1231233223.12344)
+    )
+
+    assert join.command(Path("list.txt")) == [
+        "-y",
+        "-hide_banner",
+        "-loglevel", "info",
+        "-i", "input",
+        "-f", "concat", "-safe", "0", "-i", "list.txt",
+        "-filter_complex", "[0:v][1:v]overlay",
+        "-vcodec", "libx264",
+        "-preset", "veryfast",
+        '-metadata', 'creation_time=2009-01-06T09:13:43.123440+00:00',
+        "output"
+    ]
+
+
 mydir = Path(os.path.dirname(__file__))
 top = mydir.parent
 clip = top / "render" / "clip.MP4"
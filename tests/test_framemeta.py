@@ -6,7 +6,7 @@ from gopro_overlay import fake
 from gopro_overlay.entry import Entry
 from gopro_overlay.framemeta import FrameMeta, Window
 from gopro_overlay.point import Point
-from gopro_overlay.timeunits import timeunits
+from gopro_overlay.timeunits import timeunits, Timeunit
 from gopro_overlay.units import units
 from tests.test_timeseries import datetime_of
 
@@ -120,6 +120,31 @@ def test_taking_a_view():
     assert view.version == 2
 
 
+def test_moving_view_only_fetches_new_samples():
+    fm = fake.fake_framemeta(timedelta(minutes=10), step=timedelta(seconds=1))
+
+    fetched = []
+
+    def key(e):
+        fetched.append(e)
+        return e.alt
+
+    window = Window(fm, timeunits(minutes=1), samples=100, key=key, missing=0)
+    tick = window.tick
+
+    first = window.view(timeunits(minutes=5)).data
+    assert len(fetched) == 100
+
+    moved = window.view(timeunits(minutes=5) + tick * 3).data
+    assert len(fetched) == 103
+    assert moved[:97] == first[3:]
+
+    slots = len(window.ring_times)
+    for i in range(1000):
+        window.view(timeunits(minutes=5) + tick * i)
+    assert len(window.ring_times) == slots
+
+
 def test_missing_window_entries():
     ts = fake.fake_framemeta(timedelta(minutes=10), step=timedelta(seconds=1))
 
@@ -169,3 +194,163 @@ def test_bugfix_timedelta_too_small_infinite():
     # 30s / 512 < 100ms which was causing hang
     window = Window(fm, timeunits(seconds=30), samples=512, key=lambda e: e.lat, missing=0)
     view = window.view(fm.min)
+
+
+def test_cursor_gets_same_entries_as_get():
+    fm = fake.fake_framemeta(timedelta(minutes=2), step=timedelta(seconds=1))
+    cursor = fm.cursor()
+
+    forwards = [timeunits(millis=ms) for ms in range(-500, 125_000, 100)]
+    jumps = [timeunits(seconds=s) for s in [100, 3, 3, 50.5, 0, 119.9, 1]]
+
+    for t in forwards + jumps:
+        assert cursor.get(t).dt == fm.get(t).dt
+
+
+def test_cursor_follows_changes_to_framemeta():
+    fm = FrameMeta()
+    fm.add(timeunits(seconds=0), Entry(datetime_of(0), lat=1.0))
+    fm.add(timeunits(seconds=2), Entry(datetime_of(2), lat=3.0))
+
+    cursor = fm.cursor()
+    assert cursor.get(timeunits(seconds=1)).lat == 1.0
+
+    fm.add(timeunits(seconds=1), Entry(datetime_of(1), lat=2.0))
+    assert cursor.get(timeunits(seconds=1)).lat == 2.0
+
+
+def test_cursor_interpolates():
+    fm = FrameMeta()
+    fm.add(timeunits(seconds=0), Entry(datetime_of(0), lat=1.0, speed=units.Quantity(2, units.mps),
+                                       point=Point(lat=1.0, lon=2.0), hr=units.Quantity(100, units.bpm)))
+    fm.add(timeunits(seconds=1), Entry(datetime_of(1), lat=2.0, speed=units.Quantity(4, units.mps),
+                                       point=Point(lat=2.0, lon=4.0)))
+
+    cursor = fm.cursor()
+
+    entry = cursor.interpolated(timeunits(seconds=0.25))
+    assert entry.dt == datetime_of(0.25)
+    assert entry.lat == 1.25
+    assert entry.speed == units.Quantity(2.5, units.mps)
+    assert entry.point == Point(lat=1.25, lon=2.5)
+    assert entry.hr is None
+
+    expected = fm[0].interpolate(fm[1], datetime_of(0.75))
+    assert cursor.interpolated(timeunits(seconds=0.75)).items == expected.items
+
+    assert cursor.interpolated(timeunits(seconds=1)).lat == 2.0
+    assert cursor.interpolated(timeunits(seconds=5)).lat == 2.0
+    assert cursor.interpolated(timeunits(seconds=-1)).lat == 1.0
+
+
+def test_resampled_has_an_entry_for_each_step():
+    fm = fake.fake_framemeta(timedelta(minutes=2), step=timedelta(seconds=1))
+    step = timeunits(millis=100)
+
+    resampled = fm.resampled(step)
+
+    assert resampled.framelist == list(fm.stepper(step).steps())
+    assert resampled.get(timeunits(seconds=10)).dt == fm.get(timeunits(seconds=10)).dt
+
+
+def test_resampled_entries_are_interpolated():
+    fm = FrameMeta()
+    fm.add(timeunits(seconds=0), Entry(datetime_of(0), lat=1.0, speed=units.Quantity(2.0, units.mps),
+                                       point=Point(lat=1.0, lon=2.0), hr=units.Quantity(100, units.bpm),
+                                       gpsfix=2, packet=units.Quantity(0, units.number),
+                                       packet_index=units.Quantity(3, units.number)))
+    fm.add(timeunits(seconds=1), Entry(datetime_of(1), lat=2.0, speed=units.Quantity(4.0, units.mps),
+                                       point=Point(lat=2.0, lon=4.0), hr=units.Quantity(110, units.bpm),
+                                       gpsfix=3, packet=units.Quantity(1, units.number),
+                                       packet_index=units.Quantity(4, units.number)))
+
+    resampled = fm.resampled(timeunits(millis=250))
+    assert len(resampled) == 5
+
+    entry = resampled.get(timeunits(millis=250))
+    assert entry.dt == datetime_of(0.25)
+    assert entry.lat == 1.25
+    assert entry.speed == units.Quantity(2.5, units.mps)
+    assert entry.hr == units.Quantity(102.5, units.bpm)
+    assert entry.point == Point(lat=1.25, lon=2.5)
+
+    # counts and flags are kept from the entry before
+    assert entry.gpsfix == 2
+    assert entry.packet == units.Quantity(0, units.number)
+    assert entry.packet_index == units.Quantity(3, units.number)
+    assert type(entry.packet_index.magnitude) is int
+
+    expected = fm.cursor().interpolated(timeunits(millis=750))
+    assert resampled.get(timeunits(millis=750)).items == {
+        **expected.items,
+        "gpsfix": 2,
+        "packet": units.Quantity(0, units.number),
+        "packet_index": units.Quantity(3, units.number),
+    }
+    assert resampled.get(timeunits(seconds=1)).items == fm.get(timeunits(seconds=1)).items
+
+
+def test_resampled_headings_go_the_short_way_round():
+    fm = FrameMeta()
+    fm.add(timeunits(seconds=0), Entry(datetime_of(0), cog=units.Quantity(359.0, units.degree),
+                                       azi=units.Quantity(-179.0, units.degree)))
+    fm.add(timeunits(seconds=1), Entry(datetime_of(1), cog=units.Quantity(1.0, units.degree),
+                                       azi=units.Quantity(179.0, units.degree)))
+
+    resampled = fm.resampled(timeunits(millis=250))
+
+    assert resampled.get(timeunits(millis=250)).cog.magnitude == 359.5
+    assert resampled.get(timeunits(millis=500)).cog.magnitude == 0.0
+    assert resampled.get(timeunits(millis=750)).cog.magnitude == 0.5
+    assert abs(resampled.get(timeunits(millis=500)).azi.magnitude) == 180.0
+    assert resampled.get(timeunits(millis=750)).azi.magnitude == 179.5
+    assert resampled.get(timeunits(millis=500)).azi.units == units.degree
+
+
+def test_resampled_keeps_entry_before_across_gaps():
+    fm = FrameMeta()
+    fm.add(timeunits(seconds=1), Entry(datetime_of(1), lat=1.0, alt=units.Quantity(10.0, units.m)))
+    fm.add(timeunits(seconds=2), Entry(datetime_of(2), lat=2.0))
+    fm.add(timeunits(seconds=20), Entry(datetime_of(20), lat=20.0))
+
+    resampled = fm.resampled(timeunits(seconds=0.5))
+
+    # before the start
+    assert resampled.get(timeunits(seconds=0)).lat == 1.0
+    # missing from the next entry
+    assert resampled.get(timeunits(seconds=1.5)).alt == units.Quantity(10.0, units.m)
+    # too far apart
+    assert resampled.get(timeunits(seconds=10)).lat == 2.0
+    assert resampled.get(timeunits(seconds=10)).dt == datetime_of(2)
+    assert resampled.get(timeunits(seconds=20)).lat == 20.0
+
+
+def test_stepping_and_views_need_no_timeunit_arithmetic(monkeypatch):
+    fm = fake.fake_framemeta(timedelta(minutes=10), step=timedelta(seconds=1))
+    stepper = fm.stepper(timeunits(millis=100))
+    window = Window(fm, timeunits(minutes=1), samples=100, key=lambda e: e.alt, missing=0)
+    end, tick = fm.max.us, window.tick.us
+
+    def no_arithmetic(*args):
+        raise AssertionError("Timeunit arithmetic while stepping")
+
+    with monkeypatch.context() as m:
+        for name in ["__add__", "__sub__", "__mul__", "__rmul__", "__truediv__", "__abs__",
+                     "__lt__", "__le__", "__gt__", "__ge__", "align"]:
+            m.setattr(Timeunit, name, no_arithmetic)
+
+        micros = stepper.micros()
+        views = [window.view_at(us) for us in micros]
+
+    assert micros == range(0, end + 1, 100_000)
+    assert len(stepper) == len(micros)
+
+    # the view only moves on once a tick has passed
+    assert tick == 600_000
+    assert views[0] is views[5]
+    assert views[6] is not views[5]
+    assert window.version == len(micros[::6])
+
+    last = views[-1].data
+    times = range(window.last_time - 30_000_000, window.last_time + 30_000_000, tick)
+    assert last == [fm.get(Timeunit(us)).alt if us <= end else 0 for us in times]
@@ -1,4 +1,20 @@
-from gopro_overlay.geo import attrs_for_style, available_map_styles
+import http.server
+import io
+import threading
+
+import geotiler
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageChops
+from geotiler.provider import MapProvider
+
+from gopro_overlay.geo import attrs_for_style, available_map_styles, store_caching_renderer, memory_caching_renderer
+from gopro_overlay.geo_render import map_tiles, tiles_around, BudgetCache, ImageTileCache, MB, TileMosaic
+from gopro_overlay.point import Point, Coordinate
+from gopro_overlay.tile_store import TileStore
+from gopro_overlay.units import units
+from gopro_overlay.widgets.map import MovingMap, prefetch
+from gopro_overlay.widgets.widgets import Composite, Translate, walk
 
 
 
@@ -18,4 +34,228 @@ def test_attrs_for_style():
 
 def test_example_style_attrs():
     assert attrs_for_style("tf-cycle")["url"] == "https://{subdomain}.tile.thunderforest.com/cycle/{z}/{x}/{y}.{ext}?apikey={api_key}"
-    assert attrs_for_style("geo-osm-carto")["url"] == "https://maps.geoapify.com/v1/tile/osm-carto/{z}/{x}/{y}.png?apiKey={api_key}"
\ No newline at end of file
+    assert attrs_for_style("geo-osm-carto")["url"] == "https://maps.geoapify.com/v1/tile/osm-carto/{z}/{x}/{y}.png?apiKey={api_key}"
+
+class TileServer:
+    """Stands in for a map tile provider, counting the tiles asked for"""
+
+    def __init__(self):
+        requests = self.requests = []
+
+        def tile_for(path: str) -> bytes:
+            # a different tile for each path, with some detail, so misplaced tiles would show
+            z, x, y = [int(p) for p in path.split(".")[0].split("/")[1:]]
+            image = Image.new("RGBA", (256, 256), ((x * 37) % 256, (y * 91) % 256, z * 10, 255))
+            ImageDraw.Draw(image).line([(0, 0), (255, 200)], fill=(255, 255, 255), width=5)
+            buffer = io.BytesIO()
+            image.save(buffer, format="PNG")
+            return buffer.getvalue()
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                requests.append(self.path)
+                tile = tile_for(self.path)
+                self.send_response(200)
+                self.send_header("Content-Type", "image/png")
+                self.send_header("Content-Length", str(len(tile)))
+                self.end_headers()
+                self.wfile.write(tile)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def provider(self) -> MapProvider:
+        return MapProvider({"url": f"http://127.0.0.1:{self.server.server_port}/{{z}}/{{x}}/{{y}}.png", "limit": 2})
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+route = [Point(51.5 + i * 0.0005, -0.12 + i * 0.0007) for i in range(100)]
+
+
+def test_tiles_around_cover_rendered_map():
+    for point in route[::10]:
+        map = geotiler.Map(center=(point.lon, point.lat), zoom=16, size=(362, 362))
+        assert map_tiles(map) <= tiles_around(np.array([point.lon]), np.array([point.lat]), zoom=16, size=362)
+
+
+def test_prefetched_route_renders_without_fetching(tmp_path):
+    with TileServer() as server, TileStore(tmp_path / "tiles.sqlite") as store:
+        renderer = store_caching_renderer(server.provider(), store, "test", ImageTileCache())
+
+        widget = MovingMap(at=Coordinate(0, 0), location=lambda: location, azimuth=lambda: None,
+                           renderer=renderer, size=256, zoom=16)
+
+        prefetch(renderer, walk(Composite(Translate(Coordinate(10, 10), widget))), route)
+
+        fetched = len(server.requests)
+        assert fetched > 0
+        assert len(set(server.requests)) == fetched
+        assert store.count("test") == fetched
+
+        image = Image.new("RGBA", (256, 256))
+        for location in route:
+            widget.draw(image, ImageDraw.Draw(image))
+
+        assert len(server.requests) == fetched
+
+
+def test_stored_tiles_are_not_fetched_again(tmp_path):
+    with TileServer() as server, TileStore(tmp_path / "tiles.sqlite") as store:
+        map = geotiler.Map(center=(route[0].lon, route[0].lat), zoom=16, size=(256, 256))
+
+        first = store_caching_renderer(server.provider(), store, "test", ImageTileCache())(map)
+        fetched = len(server.requests)
+        assert fetched > 0
+
+        again = store_caching_renderer(server.provider(), store, "test", ImageTileCache())(map)
+        assert len(server.requests) == fetched
+        assert ImageChops.difference(first, again).getbbox() is None
+
+
+def test_prefetch_ignores_plain_renderers():
+    def renderer(map, **kwargs):
+        raise AssertionError("shouldn't render")
+
+    widget = MovingMap(at=Coordinate(0, 0), location=lambda: route[0], azimuth=lambda: None, renderer=renderer)
+    prefetch(renderer, [widget], route)
+
+
+def test_budget_cache_drops_least_recently_used():
+    budget = BudgetCache(10, size=len)
+    budget.put("a", b"1234")
+    budget.put("b", b"1234")
+    assert budget.get("a") == b"1234"
+
+    budget.put("c", b"1234")
+
+    assert "b" not in budget
+    assert budget.get("a") is not None
+    assert budget.get("c") is not None
+    assert budget.used == 8
+    assert budget.evictions == 1
+
+
+def draw_route(widget):
+    image = Image.new("RGBA", (256, 256))
+    for location in route:
+        widget.location = lambda: location
+        widget.draw(image, ImageDraw.Draw(image))
+
+
+def test_tiles_stay_within_budget_without_fetching_again():
+    tile = 256 * 256 * 4
+    images = ImageTileCache(budget=12 * tile, compressed_budget=10 * MB)
+
+    with TileServer() as server:
+        renderer = memory_caching_renderer(server.provider(), images)
+        # drawing each frame from scratch, rather than from a mosaic, asks the cache for every tile each frame
+        widget = MovingMap(at=Coordinate(0, 0), location=None, azimuth=lambda: None, renderer=lambda m: renderer(m),
+                           size=256, zoom=17, always_redraw=True)
+
+        prefetch(renderer, [widget], route)
+        fetched = len(server.requests)
+
+        assert len(images.decoded) == 0
+        assert len(images.compressed) == fetched
+
+        draw_route(widget)
+
+    assert len(server.requests) == fetched
+    assert images.decoded.used <= 12 * tile
+    assert images.evictions > 0
+    assert images.misses == fetched
+    assert images.decodes >= fetched
+    assert images.hits > 0
+
+
+def test_tiles_can_be_decoded_when_prefetched():
+    images = ImageTileCache(compressed_budget=None)
+
+    with TileServer() as server:
+        renderer = memory_caching_renderer(server.provider(), images)
+        widget = MovingMap(at=Coordinate(0, 0), location=None, azimuth=lambda: None, renderer=renderer, size=256,
+                           zoom=16)
+
+        prefetch(renderer, [widget], route)
+        assert len(images.decoded) == len(server.requests)
+
+        draw_route(widget)
+
+    assert images.misses == len(server.requests)
+    assert images.decodes == 0
+
+
+def test_mosaic_only_fetches_tiles_coming_into_view():
+    fetched = []
+
+    def tiles(zoom, coords):
+        fetched.extend(coords)
+        return {c: Image.new("RGBA", (256, 256), (c[0] % 256, c[1] % 256, 0, 255)) for c in coords}
+
+    mosaic = TileMosaic(tiles, zoom=10)
+
+    image, (x, y) = mosaic.view(1000, 1000, 362)
+    assert len(fetched) == 3 * 3
+    assert image.getpixel((x, y)) == (1000 // 256, 1000 // 256, 0, 255)
+
+    fetched.clear()
+    image, (x, y) = mosaic.view(1100, 1050, 362)
+    assert fetched == []
+    assert image.getpixel((x + 300, y)) == (1400 // 256, 1050 // 256, 0, 255)
+
+    image, (x, y) = mosaic.view(1300, 1050, 362)
+    assert fetched == [(6, 4), (6, 5)]
+    assert image.getpixel((x + 361, y + 361)) == ((1300 + 361) // 256, (1050 + 361) // 256, 0, 255)
+
+
+def test_mosaic_with_margin_keeps_spare_tiles():
+    fetched = []
+
+    def tiles(zoom, coords):
+        fetched.extend(coords)
+        return {c: Image.new("RGBA", (256, 256)) for c in coords}
+
+    mosaic = TileMosaic(tiles, zoom=10, margin=1)
+    mosaic.view(1000, 1000, 362)
+    assert len(fetched) == 5 * 5
+
+    fetched.clear()
+    mosaic.view(1300, 1050, 362)
+    assert fetched == []
+    assert tiles_around(np.array([0.0]), np.array([0.0]), zoom=10, size=362, margin=1) >= \
+           tiles_around(np.array([0.0]), np.array([0.0]), zoom=10, size=362)
+
+
+@pytest.mark.parametrize("azimuth", [None, 0, 30, -100, 180])
+def test_moving_map_from_mosaic_is_same_as_from_scratch(azimuth):
+    heading = lambda: units.Quantity(azimuth, units.degree) if azimuth is not None else None
+
+    def drawn(map_widget, location):
+        map_widget.location = lambda: location
+        image = Image.new("RGBA", (256, 256))
+        map_widget.draw(image, ImageDraw.Draw(image))
+        # the marker is drawn after rotation now, so is a little sharper
+        ImageDraw.Draw(image).rectangle((128 - 8, 128 - 8, 128 + 8, 128 + 8), fill=(0, 0, 0, 0))
+        return image
+
+    with TileServer() as server:
+        renderer = memory_caching_renderer(server.provider(), ImageTileCache())
+
+        mosaic = MovingMap(at=Coordinate(0, 0), location=None, azimuth=heading, renderer=renderer, zoom=16)
+        scratch = MovingMap(at=Coordinate(0, 0), location=None, azimuth=heading, renderer=lambda m: renderer(m),
+                            zoom=16)
+        assert mosaic.mosaic is not None
+        assert scratch.mosaic is None
+
+        for location in route[::5]:
+            assert ImageChops.difference(drawn(mosaic, location), drawn(scratch, location)).getbbox() is None
@@ -1,6 +1,7 @@
 import datetime
 import inspect
 import os
+import struct
 from array import array
 from pathlib import Path
 from typing import Tuple
@@ -83,6 +84,47 @@ def test_load_hero6_raw():
     assert len(devc) == 14
 
 
+def test_load_memory_mapped_raw():
+    meta = GPMD.load(path_of_meta("hero6+ble.raw"))
+    assert len(meta) == 2
+    assert meta[1].with_type("DVNM")[0].interpret() == "SENSORB6"
+    assert meta.accept(CountingVisitor()).count == load("hero6+ble.raw").accept(CountingVisitor()).count
+
+
+def test_items_are_views_onto_the_data():
+    data = bytearray(path_of_meta("hero6.raw").read_bytes())
+    meta = GPMD.parse(data)
+
+    dvnm = meta[0].with_type("DVNM")[0]
+    assert isinstance(dvnm.rawdata, memoryview)
+    assert dvnm.rawdata.obj is data
+
+
+class StreamNamesVisitor:
+
+    def __init__(self):
+        self.names = []
+
+    def vic_DEVC(self, item, contents):
+        return self
+
+    def vic_STRM(self, item, contents):
+        if "GPS5" in contents:
+            return self
+
+    def vi_STNM(self, item):
+        self.names.append(item.interpret())
+
+    def v_end(self):
+        pass
+
+
+def test_visiting_only_enters_wanted_streams():
+    meta = load("hero5.raw")
+    visitor = meta.accept(StreamNamesVisitor())
+    assert visitor.names == ["GPS (Lat., Long., Alt., 2D speed, 3D speed)"]
+
+
 def test_debugging_visitor_at_least_doesnt_blow_up():
     meta = load("hero6.raw")
     meta.accept(DebuggingVisitor())
@@ -468,3 +510,26 @@ class CountingVisitor:
 
 def test_interpreting_strings():
     assert interpret_item(GPMDItem("SIUN", 143, 4, 1, 12, bytes([0x6d, 0x2f, 0x73, 0xb2]))) == "m/s²"
+
+
+def test_interpreting_xyz_samples_all_at_once():
+    raw = struct.pack(">hhhhhh", 100, -200, 300, 400, 500, -600)
+    samples = interpret_item(GPMDItem("ACCL", ord("s"), 6, 2, 12, raw), scale=(100,))
+
+    assert len(samples) == 2
+    assert samples.array.shape == (2, 3)
+    assert samples[0] == XYZ(x=1.0, y=-2.0, z=3.0)
+    assert list(samples) == [XYZ(x=1.0, y=-2.0, z=3.0), XYZ(x=4.0, y=5.0, z=-6.0)]
+
+
+def test_interpreting_mixed_type_samples():
+    raw = struct.pack(">lllllllHH", 331264969, -1173273542, -20184, 167, 190, 8000, 1234, 606, 3)
+    [point] = interpret_item(
+        GPMDItem("GPS9", ord("?"), 32, 1, 32, raw),
+        scale=(10000000, 10000000, 1000, 1000, 100, 1, 1000, 100, 1),
+        types=list("lllllllSS")
+    )
+    assert point.lat == 33.1264969
+    assert point.lon == -117.3273542
+    assert point.dop == 6.06
+    assert point.fix == 3.0
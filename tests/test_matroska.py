@@ -0,0 +1,114 @@
+import struct
+from io import BytesIO
+
+import pytest
+
+from gopro_overlay.dimensions import Dimension
+from gopro_overlay import matroska
+from gopro_overlay.matroska import UnchangedFrameSkippingWriter, encode_size
+
+size = Dimension(2, 2)
+
+
+def frame(value: int) -> bytes:
+    return bytes([value]) * (size.x * size.y * 4)
+
+
+def read_vint(data, pos, keep_marker=False):
+    first = data[pos]
+    length = 8 - first.bit_length() + 1
+    value = int.from_bytes(data[pos:pos + length], "big")
+    if not keep_marker:
+        value &= (1 << (7 * length)) - 1
+    return value, pos + length
+
+
+def elements(data, pos=0, end=None):
+    end = len(data) if end is None else end
+    while pos < end:
+        element_id, pos = read_vint(data, pos, keep_marker=True)
+        size, pos = read_vint(data, pos)
+        if size == (1 << 56) - 1:
+            yield element_id, None, pos
+            continue
+        yield element_id, data[pos:pos + size], pos
+        pos += size
+
+
+def blocks(data):
+    """(timestamp, payload) of each SimpleBlock - clusters & segment are unknown size, so appear inline"""
+    cluster_ms = None
+    for element_id, payload, pos in elements(data):
+        if element_id == matroska.CLUSTER_TIMESTAMP:
+            cluster_ms = int.from_bytes(payload, "big")
+        elif element_id == matroska.SIMPLE_BLOCK:
+            track, relative, flags = struct.unpack(">BhB", payload[:4])
+            assert track == 0x81
+            assert flags == 0x80
+            yield cluster_ms + relative, payload[4:]
+
+
+def test_encode_size():
+    assert encode_size(0) == b"\x80"
+    assert encode_size(126) == b"\xfe"
+    assert encode_size(127) == b"\x40\x7f"
+    assert encode_size(1000) == b"\x43\xe8"
+
+
+def test_header_describes_track():
+    stream = BytesIO()
+    UnchangedFrameSkippingWriter(stream, Dimension(1920, 1080))
+    data = stream.getvalue()
+
+    ids = [element_id for element_id, _, _ in elements(data)]
+    assert ids[:2] == [matroska.EBML, matroska.SEGMENT]
+    assert b"V_UNCOMPRESSED" in data
+    assert matroska.uint(matroska.PIXEL_WIDTH, 1920) in data
+    assert matroska.uint(matroska.PIXEL_HEIGHT, 1080) in data
+    assert matroska.element(matroska.COLOUR_SPACE, b"RGBA") in data
+
+
+def test_unchanged_frames_are_not_sent():
+    stream = BytesIO()
+    writer = UnchangedFrameSkippingWriter(stream, size)
+
+    for value in [1, 1, 1, 2, 3, 3]:
+        writer.write(frame(value))
+    writer.finish()
+
+    assert list(blocks(stream.getvalue())) == [
+        (0, frame(1)),
+        (300, frame(2)),
+        (400, frame(3)),
+        (500, frame(3)),  # last frame repeated, so stream lasts until the end
+    ]
+    assert writer.frames == 6
+    assert writer.sent == 3
+
+
+def test_last_frame_not_repeated_if_sent():
+    stream = BytesIO()
+    writer = UnchangedFrameSkippingWriter(stream, size)
+
+    writer.write(frame(1))
+    writer.write(frame(2))
+    writer.finish()
+
+    assert [t for t, _ in blocks(stream.getvalue())] == [0, 100]
+
+
+def test_new_clusters_keep_block_timestamps_in_range():
+    stream = BytesIO()
+    writer = UnchangedFrameSkippingWriter(stream, size)
+
+    for i in range(1000):
+        writer.write(frame(i % 256))
+    writer.finish()
+
+    assert [t for t, _ in blocks(stream.getvalue())] == [i * 100 for i in range(1000)]
+
+
+def test_frame_size_is_checked():
+    writer = UnchangedFrameSkippingWriter(BytesIO(), size)
+    with pytest.raises(ValueError):
+        writer.write(b"\x00" * 3)
@@ -0,0 +1,111 @@
+import os
+from pathlib import Path
+
+from gopro_overlay.dimensions import Dimension
+from gopro_overlay.ffmpeg_gopro import DataStream, GoproRecording, VideoStream, AudioStream, filestat
+from gopro_overlay.framemeta import FrameMeta
+from gopro_overlay.framemeta_gpmd import framemeta_from_datafile, LoadFlag
+from gopro_overlay.loading import GoproLoader
+from gopro_overlay.metadata_cache import MetadataCache
+from gopro_overlay.timeunits import timeunits
+from gopro_overlay.units import units
+from tests.test_framedata import file_path_of_test_asset
+
+datastream = DataStream(stream=3, frame_count=707, timebase=1000, frame_duration=1001)
+
+
+def recording_of(path: Path) -> GoproRecording:
+    return GoproRecording(
+        ffmpeg=None,
+        location=path,
+        file=filestat(path),
+        audio=AudioStream(stream=1),
+        video=VideoStream(stream=0, dimension=Dimension(1920, 1080), duration=timeunits(seconds=11.8),
+                          frame_count=354, frame_rate_numerator=30000, frame_rate_denominator=1001),
+        data=datastream
+    )
+
+
+def source_file(tmp_path: Path) -> Path:
+    path = tmp_path / "source.gpmd"
+    path.write_bytes(file_path_of_test_asset("accel/rotation-example.gpmd").read_bytes())
+    return path
+
+
+def assert_same(expected: FrameMeta, actual: FrameMeta):
+    assert expected.framelist == actual.framelist
+    assert expected.packets_per_second() == actual.packets_per_second()
+    for e, a in zip(expected.items(), actual.items()):
+        assert e.dt == a.dt
+        assert repr(e.items) == repr(a.items)
+
+
+def test_roundtrip(tmp_path):
+    source = source_file(tmp_path)
+    framemeta = framemeta_from_datafile(source, units, datastream)
+
+    cache = MetadataCache(tmp_path / "cache", units)
+    assert cache.load(source, None, ffmpeg=None) is None
+
+    cache.save(recording_of(source), None, framemeta)
+
+    recording, loaded = cache.load(source, None, ffmpeg=None)
+
+    assert recording.location == source
+    assert recording.data == datastream
+    assert recording.audio == AudioStream(stream=1)
+    assert recording.video == recording_of(source).video
+
+    assert_same(framemeta, loaded)
+
+
+def test_loaded_metadata_can_be_updated(tmp_path):
+    source = source_file(tmp_path)
+    cache = MetadataCache(tmp_path / "cache", units)
+    cache.save(recording_of(source), None, framemeta_from_datafile(source, units, datastream))
+
+    _, loaded = cache.load(source, None, ffmpeg=None)
+    loaded[0].update(point=None, speed=units.Quantity(3.0, units.mps), cspeed=units.Quantity(2.0, units.mps))
+
+    assert loaded[0].point is None
+    assert loaded[0].speed == units.Quantity(3.0, units.mps)
+    assert loaded[0].cspeed == units.Quantity(2.0, units.mps)
+
+    _, again = cache.load(source, None, ffmpeg=None)
+    assert again[0].point is not None
+    assert again[0].speed == units.Quantity(0.0, units.mps)
+
+
+def test_key_changes_with_file_flags_and_settings(tmp_path):
+    source = source_file(tmp_path)
+    cache = MetadataCache(tmp_path / "cache", units, settings={"dop_max": 10})
+
+    key = cache.key(source, None)
+    assert cache.key(source, None) == key
+    assert cache.key(source, {LoadFlag.ACCL}) != key
+    assert MetadataCache(tmp_path / "cache", units, settings={"dop_max": 20}).key(source, None) != key
+
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert cache.key(source, None) != key
+
+
+class NoFFMPEGGoPro:
+    exe = None
+
+    def find_recording(self, path):
+        raise AssertionError("Should have used cache")
+
+
+def test_loader_uses_cache(tmp_path):
+    source = source_file(tmp_path)
+    cache = MetadataCache(tmp_path / "cache", units)
+    framemeta = framemeta_from_datafile(source, units, datastream)
+    cache.save(recording_of(source), {LoadFlag.CORI}, framemeta)
+
+    loader = GoproLoader(ffmpeg_gopro=NoFFMPEGGoPro(), units=units, flags={LoadFlag.CORI}, cache=cache)
+
+    gopro = loader.load(source)
+
+    assert gopro.recording.video.dimension == Dimension(1920, 1080)
+    assert_same(framemeta, gopro.framemeta)
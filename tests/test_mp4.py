@@ -0,0 +1,138 @@
+import struct
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from gopro_overlay import mp4
+from gopro_overlay.ffmpeg import FFMPEG
+from gopro_overlay.ffmpeg_gopro import FFMPEGGoPro, GoproRecording, DataStream
+
+
+def box(fourcc: bytes, *payload: bytes) -> bytes:
+    content = b"".join(payload)
+    return struct.pack(">I4s", 8 + len(content), fourcc) + content
+
+
+def full_box(fourcc: bytes, *payload: bytes, version=0) -> bytes:
+    return box(fourcc, struct.pack(">I", version << 24), *payload)
+
+
+def table(fourcc: bytes, rows: List[tuple], fmt=">I") -> bytes:
+    return full_box(fourcc, struct.pack(">I", len(rows)), *[struct.pack(fmt, *r) for r in rows])
+
+
+def trak(handler: bytes, codec: bytes, timescale: int, sizes: List[int], chunks: List[int], chunk_offsets: List[int],
+         duration: int, large=False) -> bytes:
+    # chunks = number of samples in each chunk
+    stsc = []
+    for index, count in enumerate(chunks):
+        if not stsc or stsc[-1][1] != count:
+            stsc.append((index + 1, count, 1))
+
+    return box(
+        b"trak",
+        full_box(b"tkhd", bytes(80)),
+        box(
+            b"mdia",
+            full_box(b"mdhd", struct.pack(">IIII", 0, 0, timescale, duration * len(sizes)), bytes(4)),
+            full_box(b"hdlr", bytes(4), handler, bytes(12), b"handler\0"),
+            box(
+                b"minf",
+                box(
+                    b"stbl",
+                    full_box(b"stsd", struct.pack(">I", 1), box(codec, bytes(8))),
+                    table(b"stts", [(len(sizes), duration)], ">II"),
+                    table(b"stsc", stsc, ">III"),
+                    full_box(b"stsz", struct.pack(">II", 0, len(sizes)), *[struct.pack(">I", s) for s in sizes]),
+                    table(b"co64", [(o,) for o in chunk_offsets], ">Q") if large else
+                    table(b"stco", [(o,) for o in chunk_offsets], ">I"),
+                )
+            )
+        )
+    )
+
+
+def mp4_file(path: Path, gpmd_samples: List[bytes], chunks: List[int], large=False) -> Path:
+    ftyp = box(b"ftyp", b"mp41", bytes(4))
+
+    # video chunks and gpmd chunks interleaved in mdat, as a camera would write them
+    mdat = bytearray()
+    start = len(ftyp) + 8
+    video_offsets, gpmd_offsets = [], []
+    samples = iter(gpmd_samples)
+    for count in chunks:
+        video_offsets.append(start + len(mdat))
+        mdat.extend(b"V" * 100)
+        gpmd_offsets.append(start + len(mdat))
+        for _ in range(count):
+            mdat.extend(next(samples))
+
+    moov = box(
+        b"moov",
+        full_box(b"mvhd", bytes(96)),
+        trak(b"vide", b"avc1", 30000, [100] * len(chunks), [1] * len(chunks), video_offsets, 1001),
+        trak(b"meta", b"gpmd", 1000, [len(s) for s in gpmd_samples], chunks, gpmd_offsets, 1001, large=large),
+    )
+
+    path.write_bytes(ftyp + box(b"mdat", bytes(mdat)) + moov)
+    return path
+
+
+samples = [bytes([i]) * (10 + i) for i in range(6)]
+
+
+@pytest.mark.parametrize("large", [False, True])
+def test_finding_tracks(tmp_path, large):
+    path = mp4_file(tmp_path / "file.mp4", samples, chunks=[1, 1, 2, 2], large=large)
+
+    with open(path, "rb") as f:
+        found = mp4.tracks(mp4.read_moov(f))
+
+    assert [(t.index, t.handler, t.codec, t.timescale) for t in found] == [
+        (0, b"vide", b"avc1", 30000),
+        (1, b"meta", b"gpmd", 1000),
+    ]
+    assert found[1].frame_duration() == 1001
+    assert found[1].sizes.tolist() == [len(s) for s in samples]
+
+
+def test_reading_samples_of_track(tmp_path):
+    path = mp4_file(tmp_path / "file.mp4", samples, chunks=[1, 1, 2, 2])
+
+    track = mp4.find_track(path, 1, b"gpmd")
+
+    assert len(track.ranges()) == 4
+    assert mp4.read_track(path, track) == b"".join(samples)
+    assert mp4.read_track(path, track, workers=3) == b"".join(samples)
+
+
+def test_finding_wrong_track(tmp_path):
+    path = mp4_file(tmp_path / "file.mp4", samples, chunks=[1, 1, 2, 2])
+
+    with pytest.raises(ValueError):
+        mp4.find_track(path, 0, b"gpmd")
+
+    with pytest.raises(ValueError):
+        mp4.find_track(path, 2, b"gpmd")
+
+
+def test_not_an_mp4(tmp_path):
+    path = tmp_path / "file.mp4"
+    path.write_bytes(b"hello world, this isn't an mp4")
+
+    with pytest.raises(ValueError):
+        mp4.find_track(path, 1, b"gpmd")
+
+
+def test_recording_loads_data_without_ffmpeg(tmp_path):
+    path = mp4_file(tmp_path / "file.mp4", samples, chunks=[2, 1, 3])
+
+    assert FFMPEGGoPro(FFMPEG()).find_frame_duration(path, 1) == 1001
+
+    recording = GoproRecording(
+        ffmpeg=None, location=path, file=None, audio=None, video=None,
+        data=DataStream(stream=1, frame_count=6, timebase=1000, frame_duration=1001)
+    )
+
+    assert recording.load_data() == b"".join(samples)
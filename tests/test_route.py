@@ -0,0 +1,117 @@
+import math
+import random
+from datetime import timedelta
+
+import geotiler
+import numpy as np
+import pytest
+
+from gopro_overlay import fake
+from gopro_overlay.entry import Entry
+from gopro_overlay.framemeta import FrameMeta
+from gopro_overlay.gpmf import GPSFix
+from gopro_overlay.journey import Journey
+from gopro_overlay.point import Point
+from gopro_overlay.privacy import PrivacyZone, NoPrivacyZone
+from gopro_overlay.rdp import rdp, rdp_indices
+from gopro_overlay.route import route_of
+from gopro_overlay.timeunits import timeunits
+from gopro_overlay.units import units
+from tests.test_timeseries import datetime_of
+
+rng = random.Random(7)
+framemeta = fake.fake_framemeta(timedelta(minutes=2), step=timedelta(seconds=1), rng=rng, point_step=0.0005)
+
+
+def journey_of(fm) -> Journey:
+    journey = Journey()
+    fm.process(journey.accept)
+    return journey
+
+
+def test_route_is_same_as_journey():
+    route = route_of(framemeta)
+    journey = journey_of(framemeta)
+
+    assert route.locations == journey.locations
+    assert route.bounding_box == journey.bounding_box
+
+
+def test_route_is_shared_until_framemeta_changes():
+    fm = FrameMeta()
+    for i in range(5):
+        fm.add(timeunits(seconds=i), Entry(datetime_of(i), gpsfix=GPSFix.LOCK_3D.value, point=Point(51 + i, -1)))
+
+    route = route_of(fm)
+    assert route_of(fm) is route
+
+    fm.add(timeunits(seconds=5), Entry(datetime_of(5), gpsfix=GPSFix.LOCK_3D.value, point=Point(60, -1)))
+    assert len(route_of(fm)) == 6
+
+
+def test_route_without_a_fix_has_bounding_box_of_all_locations():
+    fm = FrameMeta()
+    fm.add(timeunits(seconds=0), Entry(datetime_of(0), gpsfix=GPSFix.NO.value, point=Point(-1, -2)))
+    fm.add(timeunits(seconds=1), Entry(datetime_of(1), gpsfix=GPSFix.NO.value, point=Point(1, 2)))
+
+    route = route_of(fm)
+    assert len(route) == 0
+    assert route.bounding_box == journey_of(fm).bounding_box
+
+
+def test_projection_is_same_as_geotiler():
+    route = route_of(framemeta)
+    bbox = route.bounding_box
+    for map in [
+        geotiler.Map(extent=(bbox.min.lon, bbox.min.lat, bbox.max.lon, bbox.max.lat), size=(256, 256)),
+        geotiler.Map(center=(bbox.min.lon, bbox.min.lat), zoom=16, size=(500, 300)),
+    ]:
+        expected = [map.rev_geocode((p.lon, p.lat)) for p in route.locations]
+        assert np.allclose(route.project(map), expected, atol=1e-6)
+        assert route.project(map) is route.project(map)
+
+
+def test_privacy_zone_hides_locations():
+    route = route_of(framemeta)
+    zone = PrivacyZone(route.locations[0], units.Quantity(50, units.m))
+
+    assert route.outside(NoPrivacyZone()) is route
+
+    outside = route.outside(zone)
+    assert outside.locations == [p for p in route.locations if not zone.encloses(p)]
+    assert 0 < len(outside) < len(route)
+    assert route.outside(zone) is outside
+
+
+def test_rdp_is_as_before():
+    def recursive_rdp(points, epsilon):
+        if len(points) <= 2:
+            return points
+        start, end = points[0], points[-1]
+        dmax, index = 0.0, 0
+        for i in range(1, len(points) - 1):
+            d = abs((end[0] - start[0]) * (start[1] - points[i][1]) - (start[0] - points[i][0]) * (end[1] - start[1])) \
+                / math.dist(start, end) if start != end else math.dist(points[i], start)
+            if d > dmax:
+                index, dmax = i, d
+        if dmax >= epsilon:
+            return recursive_rdp(points[:index + 1], epsilon)[:-1] + recursive_rdp(points[index:], epsilon)
+        return [start, end]
+
+    walk = [tuple(p) for p in np.cumsum(np.random.default_rng(seed=7).normal(size=(300, 2)), axis=0).tolist()]
+    for epsilon in [0.5, 1, 5]:
+        assert rdp(walk, epsilon) == recursive_rdp(walk, epsilon)
+
+    assert rdp([(0, 0), (5, 5)], 1) == [(0, 0), (5, 5)]
+    assert rdp([(0, 0), (1, 0.1), (2, 0), (0, 0)], 0.5) == [(0, 0), (2, 0), (0, 0)]
+
+
+@pytest.mark.parametrize("epsilon", [0.0001, 1])
+def test_rdp_of_long_track(epsilon):
+    # deep enough that recursion would hit the limit
+    angles = np.linspace(0, 200 * np.pi, 100_000)
+    spiral = np.stack([angles * np.cos(angles), angles * np.sin(angles)], axis=1)
+
+    kept = rdp_indices(spiral, epsilon)
+    assert kept[0] == 0 and kept[-1] == len(spiral) - 1
+    assert np.all(np.diff(kept) > 0)
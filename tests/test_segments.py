@@ -0,0 +1,129 @@
+import random
+from datetime import timedelta
+
+import pytest
+from PIL import Image
+
+from gopro_overlay import fake
+from gopro_overlay.layout import Overlay
+from gopro_overlay.layout_xml import layout_from_xml
+from gopro_overlay.privacy import NoPrivacyZone
+from gopro_overlay.segments import split_steps, Segment
+from gopro_overlay.timeunits import timeunits
+from gopro_overlay.units import units
+from tests.font import load_test_font
+
+
+def test_split_evenly():
+    segments = split_steps(100, 4)
+    assert [(s.start, s.end) for s in segments] == [(0, 25), (25, 50), (50, 75), (75, 100)]
+    assert [s.number for s in segments] == [0, 1, 2, 3]
+    assert sum(len(s) for s in segments) == 100
+
+
+def test_split_remainder_goes_to_first_segments():
+    segments = split_steps(10, 3)
+    assert [len(s) for s in segments] == [4, 3, 3]
+    assert segments[-1].end == 10
+
+
+def test_warmup_is_clamped_to_start_of_timeline():
+    segments = split_steps(100, 4, warmup=30)
+    assert [s.warmup for s in segments] == [0, 0, 20, 45]
+
+
+def test_more_segments_than_steps():
+    segments = split_steps(2, 8)
+    assert len(segments) == 2
+    assert [len(s) for s in segments] == [1, 1]
+
+
+def test_segment_wants_and_warming():
+    segment = Segment(number=1, warmup=5, start=10, end=20)
+    assert not segment.warming(4)
+    assert segment.warming(5)
+    assert segment.warming(9)
+    assert not segment.warming(10)
+    assert not segment.wants(9)
+    assert segment.wants(10)
+    assert segment.wants(19)
+    assert not segment.wants(20)
+
+
+def test_need_at_least_one_segment():
+    with pytest.raises(ValueError):
+        split_steps(10, 0)
+
+
+def test_segment_frames_are_drawn_from_warmup_and_output_from_start():
+    segment = Segment(number=1, warmup=3, start=5, end=8)
+    assert list(segment.frames(range(20))) == [
+        (3, False), (4, False), (5, True), (6, True), (7, True)
+    ]
+
+
+def moving_map_renderer(map):
+    """Draws a map in a colour of its own, so a map drawn anywhere else - even slightly - would look different"""
+    lon, lat = map.center
+    return Image.new("RGBA", map.size, (int(lon * 1e6) % 256, int(lat * 1e6) % 256, 128, 255))
+
+
+joins_layout = """
+<layout>
+    <component type="moving_map" name="moving_map" size="200" zoom="16"/>
+    <component type="chart" name="chart" x="0" y="220" seconds="30" samples="64" metric="alt" height="64"/>
+    <component type="lap_chronometer" name="lap_chronometer" x="220" y="0"/>
+    <component type="lap_times_table" name="lap_times_table" x="220" y="120" size="12"/>
+</layout>
+"""
+
+
+def test_segmented_render_is_the_same_as_serial_render():
+    rng = random.Random(12345)
+    # moves are often too small to be seen on the map, so it is drawn from wherever it last moved perceptibly
+    framemeta = fake.fake_framemeta(timedelta(seconds=40), step=timedelta(seconds=1), rng=rng, point_step=0.00001)
+    rows = iter(range(len(framemeta)))
+
+    def laps(e):
+        lap = 1 + next(rows) // 7
+        return {
+            "azi": units.Quantity(rng.uniform(-180, 180), units.degree),
+            "lap": units.Quantity(lap, units.number),
+            "laptype": "TIMED",
+            "laptime": units.Quantity(60 + rng.random(), units.second),
+            "laptime_str": f"1:0{lap}",
+        }
+
+    framemeta.process(laps)
+
+    font = load_test_font()
+    frames = framemeta.resampled(timeunits(seconds=0.1))
+    steps = list(framemeta.stepper(timeunits(seconds=0.1)).steps())
+
+    def overlay():
+        return Overlay(
+            framemeta=frames,
+            create_widgets=layout_from_xml(joins_layout, moving_map_renderer, framemeta, font, NoPrivacyZone())
+        )
+
+    def drawn(o, dt):
+        return o.draw(dt, Image.new("RGBA", (640, 360), (0, 0, 0, 0))).tobytes()
+
+    serial = overlay()
+    expected = [drawn(serial, dt) for dt in steps]
+
+    segments = split_steps(len(steps), 4, warmup=len(steps))
+    actual = []
+    for segment in segments:
+        segmented = overlay()
+        for dt, wanted in segment.frames(steps):
+            if wanted:
+                actual.append(drawn(segmented, dt))
+            else:
+                segmented.advance(dt)
+
+    assert len(actual) == len(expected)
+    differing = [index for index, (a, e) in enumerate(zip(actual, expected)) if a != e]
+    joins = [segment.start for segment in segments[1:]]
+    assert [index for index in differing if index in joins] == []
+    assert differing == []
@@ -0,0 +1,112 @@
+import sqlite3
+
+import pytest
+
+from gopro_overlay.tile_store import TileStore
+
+
+def tile(z, x, y, size=100) -> bytes:
+    return bytes([z, x % 256, y % 256]) * (size // 3)
+
+
+def test_tiles_are_kept_by_style_and_key(tmp_path):
+    with TileStore(tmp_path / "tiles.sqlite") as store:
+        assert store.put_many("osm", [((16, x, 5), tile(16, x, 5)) for x in range(10)]) == 10
+        store.put_many("cycle", [((16, 1, 5), b"cycle")])
+
+        found = store.get_many("osm", [(16, x, 5) for x in range(5, 15)])
+        assert found == {(16, x, 5): tile(16, x, 5) for x in range(5, 10)}
+
+        assert store.get_many("cycle", [(16, 1, 5), (16, 2, 5)]) == {(16, 1, 5): b"cycle"}
+        assert store.count("osm") == 10
+        assert len(store) == 11
+
+
+def test_many_tiles_in_one_read(tmp_path):
+    keys = [(16, x, y) for x in range(40) for y in range(40)]
+    with TileStore(tmp_path / "tiles.sqlite") as store:
+        store.put_many("osm", [(k, tile(*k)) for k in keys])
+        assert store.get_many("osm", keys + keys[:10]) == {k: tile(*k) for k in keys}
+
+
+def test_empty_tiles_are_not_stored(tmp_path):
+    with TileStore(tmp_path / "tiles.sqlite") as store:
+        assert store.put_many("osm", [((1, 0, 0), b""), ((1, 1, 0), None)]) == 0
+        assert len(store) == 0
+
+
+def test_readers_see_tiles_written_by_another_connection(tmp_path):
+    with TileStore(tmp_path / "tiles.sqlite") as writer, TileStore(tmp_path / "tiles.sqlite") as reader:
+        writer.put_many("osm", [((16, 1, 1), b"one")])
+        assert reader.get_many("osm", [(16, 1, 1)]) == {(16, 1, 1): b"one"}
+
+        # a read in progress doesn't hold up a write
+        reader.db.execute("BEGIN")
+        reader.db.execute("SELECT COUNT(*) FROM tiles").fetchone()
+        writer.put_many("osm", [((16, 2, 1), b"two")])
+        reader.db.execute("COMMIT")
+
+        assert reader.count() == 2
+        assert reader.db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_least_recently_used_tiles_are_dropped_over_max_size(tmp_path):
+    with TileStore(tmp_path / "tiles.sqlite", max_size=1000) as store:
+        store.put_many("osm", [((16, x, 0), tile(16, x, 0, size=300)) for x in range(3)])
+        assert store.size() == 900
+
+        store.get_many("osm", [(16, 0, 0)])
+        store.put_many("osm", [((16, 3, 0), tile(16, 3, 0, size=300))])
+
+        assert store.size() <= 1000
+        assert set(store.get_many("osm", [(16, x, 0) for x in range(4)])) == {(16, 0, 0), (16, 2, 0), (16, 3, 0)}
+
+
+def test_size_is_kept_up_to_date_rather_than_added_up(tmp_path):
+    path = tmp_path / "tiles.sqlite"
+
+    def added_up():
+        return int(sqlite3.connect(str(path)).execute("SELECT TOTAL(size) FROM tiles").fetchone()[0])
+
+    with TileStore(path, max_size=2000) as store:
+        store.put_many("osm", [((16, x, 0), tile(16, x, 0, size=300)) for x in range(4)])
+        store.put_many("osm", [((16, 0, 0), tile(16, 0, 0, size=600))])
+        store.put_many("osm", [((16, x, 1), tile(16, x, 1, size=300)) for x in range(4)])
+        assert store.size() == added_up() <= 2000
+
+    # a store from before the size was kept has it added up once when opened
+    db = sqlite3.connect(str(path))
+    db.executescript("DROP TRIGGER tiles_added; DROP TRIGGER tiles_removed; DROP TRIGGER tiles_resized; DROP TABLE totals;")
+    db.close()
+
+    with TileStore(path) as store:
+        assert store.size() == added_up() > 0
+
+
+def test_export_and_import_mbtiles(tmp_path):
+    keys = [(z, x, y) for z in (1, 2) for x in range(2) for y in range(2)]
+    exported = tmp_path / "region.mbtiles"
+
+    with TileStore(tmp_path / "tiles.sqlite") as store:
+        store.put_many("osm", [(k, tile(*k)) for k in keys])
+        assert store.export_mbtiles(exported, "osm", keys=[k for k in keys if k[0] == 2] + [(2, 3, 3)]) == 4
+
+    mbtiles = sqlite3.connect(str(exported))
+    metadata = dict(mbtiles.execute("SELECT name, value FROM metadata"))
+    assert metadata["name"] == "osm"
+    assert metadata["minzoom"] == metadata["maxzoom"] == "2"
+    # MBTiles rows count from the south
+    assert mbtiles.execute(
+        "SELECT tile_data FROM tiles WHERE zoom_level = 2 AND tile_column = 1 AND tile_row = 3"
+    ).fetchone()[0] == tile(2, 1, 0)
+    mbtiles.close()
+
+    with TileStore(tmp_path / "other.sqlite") as other:
+        assert other.import_mbtiles(exported, "seeded") == 4
+        assert other.get_many("seeded", keys) == {k: tile(*k) for k in keys if k[0] == 2}
+
+
+def test_import_missing_mbtiles(tmp_path):
+    with TileStore(tmp_path / "tiles.sqlite") as store:
+        with pytest.raises(IOError):
+            store.import_mbtiles(tmp_path / "missing.mbtiles", "osm")
@@ -0,0 +1,151 @@
+import datetime
+import random
+
+import numpy as np
+import pytest
+from geographiclib.geodesic import Geodesic
+
+from gopro_overlay import fake, timeseries_batch, timeseries_process
+from gopro_overlay.entry import Entry
+from gopro_overlay.framemeta import FrameMeta
+from gopro_overlay.gpmf import GPS_FIXED_VALUES, GPSFix
+from gopro_overlay.point import Point
+from gopro_overlay.timeunits import timeunits
+from gopro_overlay.units import units
+from tests.test_timeseries import datetime_of
+
+
+def test_inverse_agrees_with_geographiclib():
+    rng = np.random.default_rng(42)
+    lat1 = rng.uniform(-80, 80, 1000)
+    lon1 = rng.uniform(-180, 180, 1000)
+    lat2 = lat1 + rng.uniform(-0.01, 0.01, 1000)
+    lon2 = lon1 + rng.uniform(-0.01, 0.01, 1000)
+
+    dist, azi = timeseries_batch.inverse(lat1, lon1, lat2, lon2)
+
+    for i in range(1000):
+        expected = Geodesic.WGS84.Inverse(lat1[i], lon1[i], lat2[i], lon2[i])
+        assert dist[i] == pytest.approx(expected["s12"], abs=1e-6)
+        assert azi[i] == pytest.approx(expected["azi1"], abs=1e-6)
+
+
+def test_inverse_of_same_point_and_across_antimeridian():
+    dist, azi = timeseries_batch.inverse(
+        np.array([51.0, 10.0]), np.array([0.0, 179.9995]),
+        np.array([51.0, 10.0]), np.array([0.0, -179.9995])
+    )
+    assert list(dist) == pytest.approx([0.0, Geodesic.WGS84.Inverse(10.0, 179.9995, 10.0, -179.9995)["s12"]])
+    assert azi[0] == Geodesic.WGS84.Inverse(51.0, 0.0, 51.0, 0.0)["azi1"]
+    assert azi[1] == pytest.approx(90.0, abs=0.01)
+
+
+def framemeta_for_processing(seconds=60) -> FrameMeta:
+    rng = random.Random(7)
+    fm = fake.fake_framemeta(length=datetime.timedelta(seconds=seconds), step=datetime.timedelta(seconds=1 / 18),
+                             rng=rng, point_step=0.0001)
+    for index, entry in enumerate(fm.items()):
+        entry.update(
+            gpsfix=rng.choice([0, 2, 3, 3, 3]),
+            packet=units.Quantity(index // 18, units.number),
+            packet_index=units.Quantity(index % 18, units.number),
+        )
+        if index % 25 == 0:
+            entry.update(speed=units.Quantity(0, units.mps))
+    return fm
+
+
+def process_per_entry(fm: FrameMeta):
+    locked_2d = lambda e: e.gpsfix in GPS_FIXED_VALUES
+    locked_3d = lambda e: e.gpsfix == GPSFix.LOCK_3D.value
+
+    fm.process(timeseries_process.process_ses("point", lambda i: i.point, alpha=0.45), filter_fn=locked_2d)
+    fm.process_deltas(timeseries_process.calculate_speeds(), skip=18 * 3, filter_fn=locked_2d)
+    fm.process(timeseries_process.calculate_odo(), filter_fn=locked_2d)
+    fm.process_accel(timeseries_process.calculate_accel(), skip=18 * 3)
+    fm.process_deltas(timeseries_process.calculate_gradient(), skip=18 * 3, filter_fn=locked_3d)
+    fm.process(timeseries_process.process_kalman("speed", lambda e: e.speed))
+    fm.process(timeseries_process.filter_locked())
+
+
+def process_batch(fm: FrameMeta):
+    timeseries_batch.process_ses(fm, "point", "point", alpha=0.45, where=timeseries_batch.locked_2d)
+    timeseries_batch.calculate_speeds(fm, skip=18 * 3, where=timeseries_batch.locked_2d)
+    timeseries_batch.calculate_odo(fm, where=timeseries_batch.locked_2d)
+    timeseries_batch.calculate_accel(fm, skip=18 * 3)
+    timeseries_batch.calculate_gradient(fm, skip=18 * 3, where=timeseries_batch.locked_3d)
+    timeseries_batch.process_kalman(fm, "speed", "speed")
+    timeseries_batch.filter_locked(fm)
+
+
+def assert_same_entries(expected: FrameMeta, actual: FrameMeta):
+    assert len(expected) == len(actual)
+    for e, a in zip(expected.items(), actual.items()):
+        expected_items, actual_items = e.items, a.items
+        assert expected_items.keys() == actual_items.keys()
+        for key, value in expected_items.items():
+            other = actual_items[key]
+            if isinstance(value, Point):
+                assert (other.lat, other.lon) == (value.lat, value.lon)
+            elif isinstance(value, units.Quantity) and not hasattr(value.magnitude, "x"):
+                assert other.units == value.units, key
+                assert type(other.magnitude) == type(value.magnitude), key
+                assert other.magnitude == pytest.approx(value.magnitude, rel=1e-6, abs=1e-4), key
+
+
+def test_batch_processing_gives_same_values_as_per_entry_processing():
+    fm = framemeta_for_processing()
+    expected, actual = fm.clone(), fm.clone()
+
+    process_per_entry(expected)
+    process_batch(actual)
+
+    assert_same_entries(expected, actual)
+
+
+def test_batch_smoothing_is_exact():
+    fm = framemeta_for_processing()
+    expected, actual = fm.clone(), fm.clone()
+
+    expected.process(timeseries_process.process_ses("point", lambda i: i.point, alpha=0.45))
+    expected.process(timeseries_process.process_kalman("speed", lambda e: e.speed))
+    timeseries_batch.process_ses(actual, "point", "point", alpha=0.45)
+    timeseries_batch.process_kalman(actual, "speed", "speed")
+
+    for e, a in zip(expected.items(), actual.items()):
+        assert a.point == e.point
+        assert a.speed == e.speed
+
+
+def test_batch_odometer_only_counts_locked_entries():
+    fm = FrameMeta()
+    fm.add(timeunits(seconds=0), Entry(datetime_of(0), gpsfix=3, dist=units.Quantity(10.0, units.m)))
+    fm.add(timeunits(seconds=1), Entry(datetime_of(1), gpsfix=0, dist=units.Quantity(15.0, units.m)))
+    fm.add(timeunits(seconds=2), Entry(datetime_of(2), gpsfix=2))
+    fm.add(timeunits(seconds=3), Entry(datetime_of(3), gpsfix=3, dist=units.Quantity(5.0, units.m)))
+
+    timeseries_batch.calculate_odo(fm, where=timeseries_batch.locked_2d)
+
+    assert [e.codo for e in fm.items()] == [
+        units.Quantity(10.0, units.m), None, units.Quantity(10.0, units.m), units.Quantity(15.0, units.m)
+    ]
+
+
+def test_batch_odometer_uses_per_entry_processor_for_other_units():
+    fm = FrameMeta()
+    fm.add(timeunits(seconds=0), Entry(datetime_of(0), dist=units.Quantity(1.0, units.km)))
+    fm.add(timeunits(seconds=1), Entry(datetime_of(1), dist=units.Quantity(1.0, units.km)))
+
+    timeseries_batch.calculate_odo(fm)
+
+    assert fm[1].codo == units.Quantity(2000.0, units.m)
+
+
+def test_batch_speeds_without_points_leaves_entries_alone():
+    fm = FrameMeta()
+    fm.add(timeunits(seconds=0), Entry(datetime_of(0), gpsfix=3))
+    fm.add(timeunits(seconds=1), Entry(datetime_of(1), gpsfix=3))
+
+    timeseries_batch.calculate_speeds(fm, skip=5, where=timeseries_batch.locked_2d)
+
+    assert fm[0].cspeed is None
@@ -1,5 +1,5 @@
 import pytest
-from PIL import Image, ImageDraw
+from PIL import Image, ImageDraw, ImageChops
 
 from gopro_overlay.dimensions import Dimension
 from gopro_overlay.gpmf import GPSFix
@@ -11,8 +11,9 @@ from gopro_overlay.units import units
 from gopro_overlay.widgets.gps import GPSLock
 from gopro_overlay.widgets.info import ComparativeEnergy
 from gopro_overlay.widgets.map import OutLine
-from gopro_overlay.widgets.text import CachingText, Text
-from gopro_overlay.widgets.widgets import simple_icon, Scene, Composite, Translate, Widget, SimpleFrameSupplier
+from gopro_overlay.widgets.text import CachingText, Text, anchors, glyph_atlas
+from gopro_overlay.widgets.widgets import simple_icon, Scene, Composite, Translate, Widget, SimpleFrameSupplier, \
+    Static, Frame, is_static
 from tests.widgets import test_widgets_setup
 from tests.approval import approve_image
 from tests.testenvironment import is_make
@@ -221,3 +222,132 @@ def time_rendering(name, widgets, dimensions: Dimension = Dimension(x=600, y=300
 
     print(timer)
     return draw
+
+
+class Counting(Widget):
+    def __init__(self, widget):
+        self.widget = widget
+        self.count = 0
+
+    def draw(self, image, draw):
+        self.count += 1
+        self.widget.draw(image, draw)
+
+
+def test_static_widgets():
+    label = CachingText(Coordinate(0, 0), lambda: "Label", font)
+    assert not is_static(label)
+    assert is_static(Static(label))
+    assert is_static(simple_icon(Coordinate(0, 0), "gauge-1.png"))
+    assert is_static(Translate(Coordinate(10, 10), Composite(Static(label), Composite())))
+    assert not is_static(Translate(Coordinate(10, 10), Composite(Static(label), label)))
+    assert is_static(Frame(Dimension(10, 10), child=Static(label)))
+    assert not is_static(Frame(Dimension(10, 10), child=label))
+
+
+def test_scene_draws_static_widgets_once():
+    static = Counting(CachingText(Coordinate(50, 50), lambda: "Static", font))
+    dynamic = Counting(Text(Coordinate(50, 100), lambda: "Dynamic", font))
+
+    scene = Scene([Translate(Coordinate(5, 5), Composite(Static(static), dynamic))])
+    supplier = SimpleFrameSupplier(Dimension(300, 200))
+
+    for _ in range(5):
+        scene.draw(supplier.drawing_frame())
+
+    assert static.count == 1
+    assert dynamic.count == 5
+
+
+@pytest.mark.parametrize("background", [(0, 0, 0, 0), (0, 0, 255, 128)])
+def test_scene_with_static_layers_draws_same_as_direct(background):
+    def widgets():
+        return [
+            Static(CachingText(Coordinate(20, 20), lambda: "Under", font)),
+            Text(Coordinate(30, 25), lambda: "Dynamic", font, fill=(255, 0, 0)),
+            Translate(Coordinate(100, 100), Composite(
+                simple_icon(Coordinate(0, 0), "gauge-1.png", invert=False),
+                Static(CachingText(Coordinate(10, 10), lambda: "Over", font)),
+            )),
+            Frame(Dimension(50, 50), fill=(0, 255, 0), opacity=0.5),
+        ]
+
+    supplier = SimpleFrameSupplier(Dimension(300, 200), background)
+
+    direct = supplier.drawing_frame()
+    direct_draw = ImageDraw.Draw(direct)
+    for w in widgets():
+        w.draw(direct, direct_draw)
+
+    layered = Scene(widgets()).draw(supplier.drawing_frame())
+
+    # compositing a pre-drawn layer can round differently to drawing each widget in turn
+    def flattened(image):
+        return Image.alpha_composite(Image.new("RGBA", image.size, (0, 0, 0, 255)), image).convert("RGB")
+
+    difference = ImageChops.difference(flattened(layered), flattened(direct))
+    assert max(high for low, high in difference.getextrema()) <= 2
+
+
+def drawn_by_pillow(text, align, fill, stroke, stroke_width, size=(300, 100)):
+    image = Image.new("RGBA", size, (0, 0, 0, 0))
+    ImageDraw.Draw(image).text((150, 50), text, anchor=anchors[align], font=font, fill=fill,
+                               stroke_width=stroke_width, stroke_fill=stroke)
+    return image
+
+
+def drawn_by_widget(widget, size=(300, 100)):
+    image = Image.new("RGBA", size, (0, 0, 0, 0))
+    widget.draw(image, ImageDraw.Draw(image))
+    return image
+
+
+@pytest.mark.parametrize("align", ["left", "centre", "right"])
+@pytest.mark.parametrize("stroke_width", [0, 2])
+@pytest.mark.parametrize("value", ["12.34 km/h", "-1.05", "AVWAY", "00:01:23.45", "°T,j", " "])
+def test_text_from_glyphs_looks_the_same_as_pillow_text(value, align, stroke_width):
+    fill, stroke = (255, 255, 0), (0, 0, 0)
+    expected = drawn_by_pillow(value, align, fill, stroke, stroke_width)
+
+    text = Text(Coordinate(150, 50), lambda: value, font, align=align, fill=fill, stroke_width=stroke_width)
+    assert ImageChops.difference(drawn_by_widget(text), expected).getbbox() is None
+
+    caching = CachingText(Coordinate(150, 50), lambda: value, font, align=align, fill=fill, stroke=stroke,
+                          stroke_width=stroke_width)
+    assert ImageChops.difference(drawn_by_widget(caching), expected).getbbox() is None
+
+
+def test_glyphs_are_drawn_once_per_font_and_stroke():
+    atlas = glyph_atlas(font, 2)
+    assert glyph_atlas(font, 2) is atlas
+    assert glyph_atlas(font, 3) is not atlas
+
+    text = Text(Coordinate(150, 50), lambda: "1011", font)
+    drawn_by_widget(text)
+
+    glyph = atlas.glyphs["1"]
+    drawn_by_widget(Text(Coordinate(150, 50), lambda: "111", font))
+    assert atlas.glyphs["1"] is glyph
+
+
+def test_caching_text_only_keeps_recent_values():
+    values = iter([f"{v:.2f}" for v in range(100)] + ["99.00"])
+    text = CachingText(Coordinate(150, 50), lambda: next(values), font, cache_size=10)
+
+    for _ in range(100):
+        drawn_by_widget(text)
+
+    assert list(text.cache.keys()) == [f"{v:.2f}" for v in range(90, 100)]
+
+    drawn_by_widget(text)
+    assert list(text.cache.keys())[-1] == "99.00"
+    assert len(text.cache) == 10
+
+
+def test_scene_widgets_include_those_inside_others():
+    inner = Text(Coordinate(0, 0), lambda: "Inner", font)
+    framed = CachingText(Coordinate(0, 0), lambda: "Framed", font)
+    outer = Composite(Translate(Coordinate(10, 10), Static(inner)), Frame(Dimension(50, 50), child=framed))
+
+    assert list(Scene([outer]).widgets()) == [outer, outer.widgets[0], outer.widgets[0].widget, inner,
+                                              outer.widgets[1], framed]
@@ -2,6 +2,7 @@ import itertools
 from pathlib import Path
 
 import pytest
+from PIL import Image, ImageDraw
 
 from gopro_overlay.dimensions import Dimension
 from gopro_overlay.ffmpeg import FFMPEG
@@ -167,6 +168,37 @@ def test_render_moving_chart():
     ])
 
 
+def test_filled_chart_fills_each_column_below_its_value():
+    # scale is 2px per unit, so 0 -> 21, 10 -> 1, 5 -> 11
+    view = View(data=[None] * 10 + [0] * 10 + [10] * 10 + [5] * 10, version=1)
+    chart = SimpleChart(value=lambda: view, filled=True, height=22, bg=(0, 0, 0, 0), fill=(1, 2, 3, 4),
+                        line=(9, 9, 9, 9))
+
+    image = Image.new("RGBA", (40, 22))
+    chart.draw(image, ImageDraw.Draw(image))
+
+    def column(x):
+        return "".join({(1, 2, 3, 4): "#", (9, 9, 9, 9): "L"}.get(image.getpixel((x, y)), ".") for y in range(22))
+
+    assert column(5) == "." * 22
+    assert column(14) == "." * 21 + "L"
+    assert column(27) == "." + "LL" + "#" * 19
+    assert column(35) == "." * 11 + "LL" + "#" * 9
+
+
+def test_chart_is_only_redrawn_when_data_changes():
+    views = iter([View([1, 2, 3], 1), View([1, 2, 3], 2), View([1, 2, 4], 3)])
+    chart = SimpleChart(value=lambda: next(views))
+
+    image = Image.new("RGBA", (3, 64))
+    chart.draw(image, ImageDraw.Draw(image))
+    first = chart.image
+    chart.draw(image, ImageDraw.Draw(image))
+    assert chart.image is first
+    chart.draw(image, ImageDraw.Draw(image))
+    assert chart.image is not first
+
+
 def load_test_file(inputpath):
     if not inputpath.exists():
         pytest.xfail("contrib file not exist")
@@ -0,0 +1,61 @@
+from PIL import Image, ImageDraw
+
+from gopro_overlay.dimensions import Dimension
+from gopro_overlay.widgets.pool import ImagePool
+from gopro_overlay.widgets.widgets import Frame, Widget
+
+
+def test_images_are_reused_and_cleared():
+    pool = ImagePool()
+
+    with pool.image((4, 4), (255, 0, 0, 255)) as image:
+        ImageDraw.Draw(image).point((0, 0), (0, 255, 0, 255))
+        first = image
+
+    with pool.image((4, 4)) as image:
+        assert image is first
+        assert set(image.getdata()) == {(0, 0, 0, 0)}
+
+    assert pool.allocated == 1
+    assert pool.reused == 1
+
+
+def test_images_only_reused_for_same_size_and_mode():
+    pool = ImagePool()
+
+    pool.give_back(pool.borrow((4, 4)))
+
+    assert pool.borrow((4, 5)).size == (4, 5)
+    assert pool.borrow((4, 4), mode="L").mode == "L"
+    assert pool.allocated == 3
+    assert pool.reused == 0
+
+
+def test_pool_keeps_limited_number_of_images():
+    pool = ImagePool(keep=2)
+
+    for image in [pool.borrow((2, 2)) for _ in range(5)]:
+        pool.give_back(image)
+
+    assert len(pool.free[("RGBA", (2, 2))]) == 2
+
+
+def test_frame_borrows_from_pool():
+    class Child(Widget):
+        def __init__(self):
+            self.seen = []
+
+        def draw(self, image, draw):
+            self.seen.append(image)
+
+    pool = ImagePool()
+    child = Child()
+    frame = Frame(Dimension(10, 10), fill=(0, 0, 0, 255), child=child, pool=pool)
+    image = Image.new("RGBA", (20, 20))
+
+    for _ in range(3):
+        frame.draw(image, ImageDraw.Draw(image))
+
+    assert child.seen[0] is child.seen[1] is child.seen[2]
+    assert pool.allocated == 1
+    assert pool.reused == 2